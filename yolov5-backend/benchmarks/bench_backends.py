@@ -0,0 +1,89 @@
+"""So sánh độ trễ và độ chính xác giữa các backend inference trên một thư mục frame đã ghi.
+
+Backend đầu tiên được dùng làm chuẩn; các backend sau được so bằng precision/recall (cùng lớp, IoU >= 0.5).
+Chạy từ thư mục gốc repo:
+    python -m yolov5-backend.benchmarks.bench_backends --frames recorded_frames/ \\
+        --backend torch:best.pt --backend onnxruntime:best.onnx --backend onnxruntime-int8:best.onnx \\
+        --img-size 640 --img-size 416 --threads 4
+"""
+import argparse
+import statistics
+import time
+from typing import List
+import numpy as np
+from .. import config
+from ..inference_backends import load_backend
+from .bench_detection import load_frames
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU giữa mọi cặp box của a (N, 4) và b (M, 4)."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_counts(pred: np.ndarray, ref: np.ndarray, iou_threshold: float = 0.5):
+    """Đếm số box khớp (greedy theo confidence) giữa pred và ref cùng lớp."""
+    if not len(pred) or not len(ref):
+        return 0
+    iou = box_iou(pred[:, :4], ref[:, :4])
+    iou[pred[:, 5][:, None] != ref[:, 5][None, :]] = 0
+    matched = 0
+    used = set()
+    for i in np.argsort(-pred[:, 4]):
+        j = int(np.argmax(iou[i]))
+        if iou[i, j] >= iou_threshold and j not in used:
+            used.add(j)
+            matched += 1
+    return matched
+
+
+def run_backend(spec: str, img_size: int, threads: int, frames: List[np.ndarray], conf: float):
+    name, model_path = spec.split(":", 1)
+    backend, load_time, first_time = load_backend(name, model_path, img_size, threads)
+    backend.set_thresholds(conf, config.YOLO_IOU_THRESHOLD)
+    latencies, outputs = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        outputs.append(backend.infer_batch([frame])[0])
+        latencies.append(time.perf_counter() - start)
+    return f"{name}@{backend.img_size}", load_time, first_time, latencies, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", default="", help="Thư mục ảnh .jpg/.png; để trống dùng ảnh ngẫu nhiên")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--backend", action="append", required=True, help="<tên backend>:<đường dẫn model>")
+    parser.add_argument("--img-size", type=int, action="append")
+    parser.add_argument("--threads", type=int, default=config.YOLO_THREADS)
+    parser.add_argument("--conf", type=float, default=config.YOLO_CONF_THRESHOLD)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.count)
+    reference = None
+    print(f"{'backend':>24} {'load s':>7} {'first ms':>9} {'mean ms':>8} {'p95 ms':>7} {'fps':>6} "
+          f"{'precision':>9} {'recall':>7}")
+    for spec in args.backend:
+        for img_size in args.img_size or [config.YOLO_IMG_SIZE]:
+            label, load_time, first_time, latencies, outputs = run_backend(
+                spec, img_size, args.threads, frames, args.conf)
+            if reference is None:
+                reference = outputs
+            matched = sum(match_counts(p, r) for p, r in zip(outputs, reference))
+            predicted = sum(len(p) for p in outputs)
+            expected = sum(len(r) for r in reference)
+            precision = matched / predicted if predicted else 1.0
+            recall = matched / expected if expected else 1.0
+            p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            mean = statistics.mean(latencies)
+            print(f"{label:>24} {load_time:7.2f} {first_time * 1000:9.1f} {mean * 1000:8.1f} {p95 * 1000:7.1f} "
+                  f"{1 / mean:6.1f} {precision:9.3f} {recall:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
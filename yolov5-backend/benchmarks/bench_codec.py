@@ -0,0 +1,126 @@
+"""Chi phí giải mã / mã hoá JPEG mỗi frame: đường cũ (imdecode đủ độ phân giải + imencode mọi frame gửi WebSocket)
+so với JpegCodec (giải mã thu nhỏ theo DCT về gần kích thước đầu vào model, gửi lại nguyên JPEG của ESP32 khi
+frame không có box nào được vẽ, buffer resize dùng lại).
+
+Ảnh tổng hợp giống camera (gradient, vật thể, nhiễu) ở các độ phân giải --sizes; --drawn là tỉ lệ frame có box
+(không gửi lại được JPEG gốc). In ms/frame và bộ nhớ cấp phát (tracemalloc) mỗi frame.
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_codec
+                           python -m yolov5-backend.benchmarks.bench_codec --sizes 1600x1200 --scale 0.5
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import tracemalloc
+from typing import List
+import cv2
+import numpy as np
+from .. import config
+from ..esp32_interface import decode_frame
+from ..frame_bus import FramePacket
+from ..image_codec import JpegCodec
+from ..inference_worker import parse_frame_size
+from ..websocket_handler import StreamOptions, WebSocketHandler, encode_jpeg
+
+
+class SessionStub:
+    """build_payloads chỉ đọc options của session."""
+
+    def __init__(self, options: StreamOptions):
+        self.options = options
+
+
+def synthesize_jpegs(width: int, height: int, count: int, seed: int = 0) -> List[bytes]:
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None].repeat(height, 0).repeat(3, 2)
+    jpegs = []
+    for i in range(count):
+        frame = gradient.copy()
+        x = int(width * (0.1 + 0.6 * i / count))
+        cv2.rectangle(frame, (x, height // 2), (x + width // 4, height * 7 // 8), (200, 60, 30), -1)
+        cv2.circle(frame, (width * 9 // 10, height // 10), max(4, height // 25), (30, 30, 220), -1)
+        frame = np.clip(frame + rng.normal(0, 4, frame.shape), 0, 255).astype(np.uint8)
+        jpegs.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return jpegs
+
+
+def fake_detect(frame: np.ndarray, drawn: bool):
+    """Thay YOLO: frame có box thì vẽ một box lên ảnh."""
+    if not drawn:
+        return frame, []
+    height, width = frame.shape[:2]
+    cv2.rectangle(frame, (width // 4, height // 2), (width // 2, height - 1), (0, 255, 0), 2)
+    return frame, [{'label': 'Car', 'x1': width // 4, 'y1': height // 2, 'x2': width // 2, 'y2': height - 1,
+                    'confidence': 0.9}]
+
+
+def legacy_frame(jpeg: bytes, drawn: bool, options: StreamOptions) -> str:
+    frame = decode_frame(jpeg)
+    frame, detections = fake_detect(frame, drawn)
+    return json.dumps({
+        'image': base64.b64encode(encode_jpeg(frame, *options.encoding)).decode('utf-8'),
+        'detections': detections,
+        'ultrasonic_distance': 50
+    })
+
+
+def codec_frame(codec: JpegCodec, handler: WebSocketHandler, jpeg: bytes, drawn: bool, options: StreamOptions):
+    frame, denominator = codec.decode(jpeg)
+    frame, detections = fake_detect(frame, drawn)
+    packet = FramePacket(1, time.time(), frame, detections, 50, jpeg=jpeg if denominator == 1 else None)
+    return handler.build_payloads(packet, [SessionStub(options)])
+
+
+def measure(step, jpegs: List[bytes], drawn: List[bool]):
+    """(ms/frame, KiB cấp phát đỉnh trung bình mỗi frame)."""
+    for jpeg, is_drawn in zip(jpegs[:5], drawn):
+        step(jpeg, is_drawn)
+    start = time.perf_counter()
+    for jpeg, is_drawn in zip(jpegs, drawn):
+        step(jpeg, is_drawn)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    peaks = 0
+    for jpeg, is_drawn in zip(jpegs, drawn):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        step(jpeg, is_drawn)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return elapsed / len(jpegs) * 1000, peaks / len(jpegs) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="640x480,1600x1200", help="các độ phân giải camera cần đo")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--drawn", type=float, default=0.5, help="tỉ lệ frame có box được vẽ")
+    parser.add_argument("--scale", type=float, default=1.0, help="scale của client WebSocket")
+    parser.add_argument("--target", type=int, default=config.JPEG_DECODE_TARGET, help="JPEG_DECODE_TARGET")
+    parser.add_argument("--backend", default=config.JPEG_BACKEND)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    drawn = [rng.random() < args.drawn for _ in range(args.frames)]
+    options = StreamOptions(scale=args.scale)
+    handler = WebSocketHandler(None, asyncio.Event(), None)
+    handler.codec = JpegCodec(backend=args.backend)
+    codec = JpegCodec(decode_target=args.target, backend=args.backend)
+    print(f"backend {codec.backend}, decode target {args.target} px, {args.drawn:.0%} frame có box, "
+          f"scale {args.scale}")
+    print(f"{'camera':>10} {'chế độ':>8} {'ms/frame':>9} {'KiB/frame':>10} {'ảnh model':>10}")
+    for size in args.sizes.split(","):
+        width, height = parse_frame_size(size)
+        jpegs = synthesize_jpegs(width, height, args.frames)
+        decoded, _ = codec.decode(jpegs[0])
+        legacy_ms, legacy_kib = measure(lambda jpeg, d: legacy_frame(jpeg, d, options), jpegs, drawn)
+        codec_ms, codec_kib = measure(lambda jpeg, d: codec_frame(codec, handler, jpeg, d, options), jpegs, drawn)
+        print(f"{size:>10} {'cũ':>8} {legacy_ms:9.2f} {legacy_kib:10.0f} {f'{width}x{height}':>10}")
+        print(f"{size:>10} {'codec':>8} {codec_ms:9.2f} {codec_kib:10.0f} "
+              f"{f'{decoded.shape[1]}x{decoded.shape[0]}':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""So sánh gửi lệnh động cơ: mỗi lần control_robot là một HTTP GET chặn (cũ) với CommandChannel
+bỏ lệnh trùng, gộp lệnh và gửi bất đồng bộ. Dùng ESP32 giả lập có độ trễ.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_command_channel
+"""
+import argparse
+import random
+import time
+from ..esp32_interface import ESP32SyncClient
+from ..esp32_simulator import start_simulator
+
+
+def control_trace(iterations: int, rng):
+    """Chuỗi lệnh giống vòng điều khiển: mỗi vòng gửi "B" hai lần, thỉnh thoảng đổi tốc độ, rẽ hoặc dừng."""
+    speed = 120
+    for _ in range(iterations):
+        roll = rng.random()
+        if roll < 0.05:
+            yield [("R", speed), ("S", speed)]
+            continue
+        if roll < 0.10:
+            yield [("S", speed), ("S", speed)]
+            continue
+        if roll < 0.20:
+            speed = rng.choice((80, 100, 120, 140))
+        yield [("B", speed), ("B", speed)]
+
+
+def run(send, iterations: int, period: float, seed: int):
+    """Phát lại trace với nhịp vòng điều khiển; trả về tổng thời gian vòng điều khiển bị chặn khi gửi lệnh."""
+    blocked = 0.0
+    for batch in control_trace(iterations, random.Random(seed)):
+        t0 = time.perf_counter()
+        for command, speed in batch:
+            send(command, speed)
+        spent = time.perf_counter() - t0
+        blocked += spent
+        time.sleep(max(0.0, period - spent))
+    return blocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--period-ms", type=float, default=100.0)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name in ("blocking GET", "command channel"):
+        simulator = start_simulator(latency=args.latency_ms / 1000)
+        client = ESP32SyncClient(base_url=simulator.base_url)
+        send = client.control_robot if name == "blocking GET" else client.submit_command
+        blocked = run(send, args.iterations, args.period_ms / 1000, args.seed)
+        if name == "command channel":
+            client.commands.flush(timeout=5)
+        print(f"{name:>16}: {len(simulator.commands)} HTTP /command cho {args.iterations} vòng, "
+              f"vòng điều khiển bị chặn {blocked * 1000 / args.iterations:6.2f} ms/vòng")
+        if name == "command channel":
+            print(f"{'':>16}  {client.commands.stats()}")
+        client.close()
+        simulator.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Đo độ trễ phản ứng của vòng điều khiển (từ lúc frame có đèn đỏ được publish tới lệnh "S")
+và thời gian thoát thread khi dừng: vòng lặp cũ sleep(0.5) so với vòng điều khiển theo scheduler.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_control_loop
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+import numpy as np
+from ..frame_bus import FrameBus
+from ..grid_map import OccupancyMap
+from ..perception_filter import PerceptionFilter
+from ..robot_control import RobotController
+
+
+class CommandRecorder:
+    """Thay control_robot: ghi lại thời điểm gửi lệnh "S" thay vì gọi HTTP tới ESP32."""
+
+    def __init__(self):
+        self.stop_sent = threading.Event()
+        self.stop_time = 0.0
+        self.calls = 0
+
+    def __call__(self, command, speed=None):
+        self.calls += 1
+        if command == "S" and not self.stop_sent.is_set():
+            self.stop_time = time.perf_counter()
+            self.stop_sent.set()
+        return True
+
+
+def legacy_run(controller: RobotController):
+    """Cấu trúc vòng lặp cũ: chờ frame, xử lý, rồi time.sleep(0.5); sau khi dừng thì quay mãi với sleep(1)."""
+    while True:
+        if controller.stop_event.is_set() or not controller.robot_running:
+            time.sleep(1)
+            continue
+        packet = controller.frame_bus.wait_for_next(controller.last_frame_seq, timeout=2)
+        if packet is None:
+            continue
+        controller.last_frame_seq = packet.seq
+        command, command_sent = controller.react_to_perception(packet)
+        if not command_sent:
+            controller.control_robot(command, controller.current_speed)
+        time.sleep(0.5)
+
+
+def measure(runner, events: int, fps: float):
+    recorder = CommandRecorder()
+    bus = FrameBus(yolo_detector=None)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    controller = RobotController(None, bus, grid=OccupancyMap((50, 50), set()), control=recorder)
+    # Cửa sổ 1 frame: đo riêng độ trễ của vòng lặp, không tính thời gian xác nhận của bộ lọc
+    controller.perception = PerceptionFilter(window=1)
+    controller.start_navigation((0, 0), (49, 49))
+    thread = threading.Thread(target=runner, args=(controller,), daemon=True)
+    thread.start()
+
+    green = [{'label': 'Green-light', 'x1': 0, 'y1': 0, 'x2': 10, 'y2': 10}]
+    red = [{'label': 'Red-light', 'x1': 0, 'y1': 0, 'x2': 10, 'y2': 10}]
+    latencies = []
+    for _ in range(events):
+        # Vài frame đèn xanh rồi một frame đèn đỏ, đo tới khi lệnh "S" được gửi
+        for _ in range(5):
+            bus.publish(frame, green, 50.0)
+            time.sleep(1 / fps)
+        # Lệch pha ngẫu nhiên so với nhịp sleep(0.5) của vòng lặp cũ
+        time.sleep(random.uniform(0, 0.5))
+        recorder.stop_sent.clear()
+        published = time.perf_counter()
+        bus.publish(frame, red, 50.0)
+        if recorder.stop_sent.wait(3):
+            latencies.append(recorder.stop_time - published)
+
+    t0 = time.perf_counter()
+    controller.stop_navigation()
+    thread.join(timeout=3)
+    shutdown = time.perf_counter() - t0
+    stats = controller.scheduler.stats() if controller.scheduler else None
+    return latencies, shutdown, thread.is_alive(), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--fps", type=float, default=15.0)
+    args = parser.parse_args()
+
+    for name, runner in (("sleep(0.5) loop", legacy_run), ("scheduler loop", RobotController.run)):
+        latencies, shutdown, alive, stats = measure(runner, args.events, args.fps)
+        latencies_ms = sorted(l * 1000 for l in latencies)
+        p95 = latencies_ms[int(0.95 * (len(latencies_ms) - 1))] if latencies_ms else float('nan')
+        print(f"{name:>16}: red-light -> S p50 {statistics.median(latencies_ms):6.1f} ms, p95 {p95:6.1f} ms, "
+              f"max {max(latencies_ms):6.1f} ms; stop -> thread exit "
+              f"{'không thoát (thread mồ côi)' if alive else f'{shutdown * 1000:.1f} ms'}")
+        if stats:
+            print(f"{'':>16}  scheduler: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""So sánh đường xử lý kết quả YOLO: pandas + iterrows (cũ) với đọc thẳng tensor (Detections), và batch vs từng frame.
+
+Chạy từ thư mục gốc repo:
+    python -m yolov5-backend.benchmarks.bench_detection --model best.pt --frames recorded_frames/
+"""
+import argparse
+import glob
+import os
+import time
+from typing import List
+import cv2
+import numpy as np
+from ..yolo_detection import Detections, YOLODetector
+
+
+def legacy_postprocess(results, frame: np.ndarray):
+    """Bản sao đường xử lý cũ của YOLODetector.detect."""
+    detections = results.pandas().xyxy[0]
+    for _, det in detections.iterrows():
+        x1, y1, x2, y2 = int(det['xmin']), int(det['ymin']), int(det['xmax']), int(det['ymax'])
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(frame, det['name'], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+    return [
+        {'label': row['name'], 'x1': row['xmin'], 'y1': row['ymin'], 'x2': row['xmax'], 'y2': row['ymax']}
+        for _, row in detections.iterrows()
+    ]
+
+
+def array_postprocess(detector: YOLODetector, results, frame: np.ndarray):
+    detections = Detections(results.xyxy[0].cpu().numpy(), detector.names)
+    detections = detections.filter(detector.conf_threshold, detector.class_ids)
+    detector.draw(frame, detections)
+    return detections.to_dicts()
+
+
+def load_frames(folder: str, count: int) -> List[np.ndarray]:
+    if folder:
+        paths = sorted(glob.glob(os.path.join(folder, "*.jpg")) + glob.glob(os.path.join(folder, "*.png")))
+        frames = [cv2.imread(p) for p in paths[:count]]
+        if frames:
+            return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def time_ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--frames", default="", help="Thư mục ảnh đã ghi; để trống dùng ảnh ngẫu nhiên")
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    detector = YOLODetector(args.model, backend="torch")
+    frames = load_frames(args.frames, args.batch)
+    results = detector.backend.model(frames[0])
+
+    legacy = time_ms(lambda: legacy_postprocess(results, frames[0].copy()), args.repeat)
+    array = time_ms(lambda: array_postprocess(detector, results, frames[0].copy()), args.repeat)
+    print(f"post-processing per frame: pandas {legacy:7.3f} ms, array {array:7.3f} ms ({legacy / array:4.1f}x)")
+
+    sequential = time_ms(lambda: [detector.infer(f) for f in frames], args.repeat)
+    batched = time_ms(lambda: detector.infer_batch(frames), args.repeat)
+    print(f"{len(frames)} frames inference: one by one {sequential:7.2f} ms, "
+          f"batched {batched:7.2f} ms ({sequential / batched:4.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
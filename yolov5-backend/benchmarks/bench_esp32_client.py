@@ -0,0 +1,80 @@
+"""Đo độ trễ và thông lượng lấy frame + siêu âm: requests.get không pool (cũ) so với ESP32Client keep-alive.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_esp32_client
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import requests
+from ..esp32_interface import ESP32Client, ESP32SyncClient, decode_frame
+from ..esp32_simulator import start_simulator
+
+
+def legacy_fetch(base_url: str):
+    """Giống code cũ: mỗi lần gọi là một kết nối mới, frame rồi siêu âm nối tiếp."""
+    response = requests.get(f"{base_url}/cam.jpg", stream=True, timeout=10)
+    frame = decode_frame(response.content)
+    distance = requests.get(f"{base_url}/ultrasonic", timeout=10).json().get("distance", -1)
+    return frame, distance
+
+
+def measure(fn, iterations: int):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return latencies, iterations / elapsed
+
+
+def report(name: str, latencies, throughput: float):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:>28}: mean {statistics.mean(latencies) * 1000:6.2f} ms, "
+          f"p95 {p95 * 1000:6.2f} ms, {throughput:6.1f} fetch/s")
+
+
+async def concurrent_fetches(base_url: str, clients: int, iterations: int) -> float:
+    """Nhiều coroutine cùng lấy dữ liệu trên một ESP32Client, kiểm tra event loop không bị chặn."""
+    client = ESP32Client(base_url=base_url, max_connections=clients)
+
+    async def worker():
+        for _ in range(iterations):
+            await client.fetch_frame_and_distance()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return clients * iterations / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Độ trễ giả lập mỗi request của ESP32")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_simulator(latency=args.latency_ms / 1000)
+    base_url = server.base_url
+
+    report("requests.get (legacy)", *measure(lambda: legacy_fetch(base_url), args.iterations))
+    legacy_connections = server.connection_count
+
+    sync_client = ESP32SyncClient(base_url=base_url)
+    report("ESP32SyncClient (pooled)", *measure(sync_client.fetch_frame_and_distance, args.iterations))
+    sync_client.close()
+    print(f"TCP connections opened: legacy {legacy_connections}, "
+          f"pooled {server.connection_count - legacy_connections}")
+
+    throughput = asyncio.run(concurrent_fetches(base_url, args.concurrency, args.iterations // args.concurrency))
+    print(f"{'ESP32Client x' + str(args.concurrency) + ' coroutines':>28}: {throughput:6.1f} fetch/s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Đo khả năng mở rộng khi một tiến trình phục vụ nhiều xe: N simulator ESP32, mỗi xe một frame bus và vòng
+điều khiển, dùng chung một detector. So sánh gộp batch (FleetManager mặc định) với không gộp (max_batch=1,
+các xe lần lượt dùng model), in FPS tổng / từng xe, kích thước batch trung bình, RSS và số thread.
+
+Detector giả tốn base + per_frame * số frame mỗi lượt (inference batch rẻ hơn từng frame riêng lẻ);
+--model để dùng model YOLO thật.
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_fleet
+                           python -m yolov5-backend.benchmarks.bench_fleet --robots 1,2,5,10 --seconds 10
+"""
+import argparse
+import tempfile
+import threading
+import time
+from .bench_replay import ColorDetector, synthesize_recording
+from ..esp32_simulator import start_simulator
+from ..fleet import FleetManager
+
+
+class FakeBatchDetector(ColorDetector):
+    """Detector màu giả với chi phí batch: base + per_frame * len(frames)."""
+
+    def __init__(self, base: float, per_frame: float):
+        super().__init__(0.0)
+        self.base = base
+        self.per_frame = per_frame
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        time.sleep(self.base + self.per_frame * len(frames))
+        return [super(FakeBatchDetector, self).detect(frame) for frame in frames]
+
+
+def proc_status(field: str) -> int:
+    """Đọc một trường số từ /proc/self/status (VmRSS tính bằng kB, Threads); 0 nếu không có (không phải Linux)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run_fleet(detector, recording, robots: int, seconds: float, max_batch: int, batch_wait: float,
+              latency: float):
+    simulators = [start_simulator(latency=latency, recording=recording, speed=0, loop=True) for _ in range(robots)]
+    fleet = FleetManager(detector, max_batch=max_batch, batch_wait=batch_wait)
+    for i, simulator in enumerate(simulators):
+        robot = fleet.register(f"car{i + 1}", simulator.base_url, stream_url=simulator.base_url + "/stream")
+        robot.start_navigation((4, 0), (0, 6))
+    # Bỏ qua giai đoạn khởi động (kết nối HTTP đầu tiên, warm-up)
+    time.sleep(min(1.0, seconds / 4))
+    published = {robot_id: robot.frame_bus.frames_published for robot_id, robot in fleet.robots.items()}
+    batches, frames = fleet.detector.batches, fleet.detector.frames
+    start = time.perf_counter()
+    time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    per_robot = [(robot.frame_bus.frames_published - published[robot_id]) / elapsed
+                 for robot_id, robot in fleet.robots.items()]
+    batch_count = fleet.detector.batches - batches
+    mean_batch = (fleet.detector.frames - frames) / batch_count if batch_count else 0.0
+    result = {
+        'fps_total': sum(per_robot),
+        'fps_min': min(per_robot),
+        'fps_max': max(per_robot),
+        'mean_batch': mean_batch,
+        'rss_mb': proc_status("VmRSS") / 1024,
+        'threads': proc_status("Threads") or threading.active_count(),
+        'commands': sum(len(simulator.commands) for simulator in simulators)
+    }
+    fleet.close()
+    for simulator in simulators:
+        simulator.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", default="1,2,5,10", help="danh sách số xe cần đo")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--model", default=None, help="đường dẫn model YOLO; bỏ trống dùng detector giả")
+    parser.add_argument("--base-ms", type=float, default=20.0, help="chi phí cố định mỗi lượt của detector giả")
+    parser.add_argument("--per-frame-ms", type=float, default=4.0, help="chi phí thêm mỗi frame trong batch")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="độ trễ mạng giả lập của ESP32")
+    args = parser.parse_args()
+
+    recording = synthesize_recording(tempfile.mkdtemp(), frames=60)
+    rss_before = proc_status("VmRSS") / 1024
+    if args.model:
+        from ..yolo_detection import YOLODetector
+        detector = YOLODetector(model_path=args.model)
+    else:
+        detector = FakeBatchDetector(args.base_ms / 1000, args.per_frame_ms / 1000)
+    rss_model = proc_status("VmRSS") / 1024
+    print(f"RSS sau import: {rss_before:.0f} MiB, sau khi nạp detector: {rss_model:.0f} MiB")
+
+    print(f"{'xe':>3} {'chế độ':>10} {'fps tổng':>9} {'fps/xe min-max':>15} {'batch tb':>9} {'RSS MiB':>8} "
+          f"{'threads':>8} {'1 tiến trình/xe MiB':>20}")
+    for robots in (int(n) for n in args.robots.split(",")):
+        for mode, max_batch in (("batch", args.max_batch), ("no-batch", 1)):
+            r = run_fleet(detector, recording, robots, args.seconds, max_batch, args.batch_wait_ms / 1000,
+                          args.latency_ms / 1000)
+            print(f"{robots:>3} {mode:>10} {r['fps_total']:9.1f} {r['fps_min']:7.1f}-{r['fps_max']:<7.1f} "
+                  f"{r['mean_batch']:9.2f} {r['rss_mb']:8.0f} {r['threads']:8d} {rss_model * robots:20.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""So sánh số lần gọi inference/giây: hai vòng lặp tự lấy frame (cũ) với một FrameBus dùng chung.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_frame_bus
+"""
+import argparse
+import asyncio
+import threading
+import time
+import numpy as np
+from ..frame_bus import FrameBus
+
+
+class FakeDetector:
+    """Detector giả có thời gian inference cố định, đếm số lần được gọi."""
+
+    def __init__(self, inference_time: float):
+        self.inference_time = inference_time
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def detect(self, frame):
+        time.sleep(self.inference_time)
+        with self._lock:
+            self.calls += 1
+        return frame, [{'label': 'Car', 'x1': 0, 'y1': 0, 'x2': 10, 'y2': 10}]
+
+
+def make_fetchers(fetch_time: float):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    counter = {'frames': 0}
+
+    def fetch_frame():
+        time.sleep(fetch_time)
+        counter['frames'] += 1
+        return frame.copy()
+
+    def fetch_distance():
+        time.sleep(fetch_time / 4)
+        return 50.0
+
+    return fetch_frame, fetch_distance, counter
+
+
+def run_separate_loops(duration: float, inference_time: float, fetch_time: float):
+    """Mô phỏng code cũ: RobotController.run và stream_video mỗi bên tự fetch + detect."""
+    detector = FakeDetector(inference_time)
+    fetch_frame, fetch_distance, counter = make_fetchers(fetch_time)
+    stop = threading.Event()
+    delivered = [0, 0]
+
+    def loop(idx):
+        while not stop.is_set():
+            fetch_distance()
+            detector.detect(fetch_frame())
+            delivered[idx] += 1
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(2)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return detector.calls, counter['frames'], delivered
+
+
+def run_frame_bus(duration: float, inference_time: float, fetch_time: float):
+    """Một producer, một subscriber đồng bộ (control loop) và một subscriber async (WebSocket)."""
+    detector = FakeDetector(inference_time)
+    fetch_frame, fetch_distance, counter = make_fetchers(fetch_time)
+    bus = FrameBus(detector, fetch=lambda: (fetch_frame(), fetch_distance()))
+    stop = threading.Event()
+    delivered = [0, 0]
+
+    def control_loop():
+        last_seq = 0
+        while not stop.is_set():
+            packet = bus.wait_for_next(last_seq, timeout=0.5)
+            if packet is not None:
+                last_seq = packet.seq
+                delivered[0] += 1
+
+    async def streamer():
+        last_seq = 0
+        while True:
+            packet = await bus.next_frame(last_seq)
+            last_seq = packet.seq
+            delivered[1] += 1
+
+    async def run_async():
+        task = asyncio.create_task(streamer())
+        await asyncio.sleep(duration)
+        task.cancel()
+
+    control = threading.Thread(target=control_loop, daemon=True)
+    bus.start()
+    control.start()
+    asyncio.run(run_async())
+    stop.set()
+    bus.stop()
+    control.join()
+    return detector.calls, counter['frames'], delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--inference-ms", type=float, default=30.0)
+    parser.add_argument("--fetch-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    for name, runner in (("separate loops", run_separate_loops), ("frame bus", run_frame_bus)):
+        calls, frames, delivered = runner(args.duration, args.inference_ms / 1000, args.fetch_ms / 1000)
+        print(f"{name:>15}: inference {calls / args.duration:6.1f}/s, "
+              f"ESP32 frame fetch {frames / args.duration:6.1f}/s, "
+              f"control {delivered[0] / args.duration:5.1f} fps, websocket {delivered[1] / args.duration:5.1f} fps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""So sánh inference mọi frame với InferenceScheduler (bỏ frame tĩnh + tracker + ROI) trên các frame đã ghi:
+thời gian CPU, tỉ lệ frame thực sự chạy inference, số frame có đèn đỏ bị bỏ sót và độ lệch trung bình của box Car
+so với inference mọi frame.
+
+Không có --recording thì tạo recording tổng hợp: xe (xanh dương) chạy rồi đứng yên, đèn góc trên đổi
+xanh -> đỏ -> xanh, có nhiễu cảm biến. Detector giả đốt CPU --inference-ms mỗi lượt rồi tìm màu.
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_inference_scheduler
+                           python -m yolov5-backend.benchmarks.bench_inference_scheduler --recording runs/lap1 --model best.pt
+"""
+import argparse
+import tempfile
+import time
+from typing import Dict, List, Optional, Set
+import cv2
+import numpy as np
+from ..inference_scheduler import InferenceScheduler
+from ..recording import Recorder, Recording
+
+RED_PERIODS = ((180, 280),)
+
+
+def synthesize_recording(path: str, frames: int = 400, fps: float = 15.0) -> Recording:
+    recorder = Recorder(path)
+    rng = np.random.default_rng(0)
+    start = time.time()
+    for i in range(frames):
+        frame = np.full((480, 640, 3), 60, dtype=np.uint8)
+        x = 40 + min(i, 100) * 3 if i < 300 else 340 - (i - 300) * 2
+        cv2.rectangle(frame, (x, 300), (x + 160, 420), (255, 0, 0), -1)
+        red = any(a <= i < b for a, b in RED_PERIODS)
+        cv2.circle(frame, (600, 40), 18, (0, 0, 255) if red else (0, 255, 0), -1)
+        noisy = np.clip(frame + rng.normal(0, 2, frame.shape), 0, 255).astype(np.uint8)
+        recorder.record_frame(cv2.imencode('.jpg', noisy, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes(),
+                              start + i / fps)
+    recorder.close()
+    return Recording(path)
+
+
+class BusyColorDetector:
+    """Detector giả: đốt CPU `inference_time` giây rồi tìm vùng màu (xanh dương = Car, đỏ / xanh lá = đèn)."""
+    COLORS = (('Car', (200, 0, 0), (255, 80, 80)), ('Red-light', (0, 0, 200), (80, 80, 255)),
+              ('Green-light', (0, 200, 0), (80, 255, 80)))
+
+    def __init__(self, inference_time: float):
+        self.inference_time = inference_time
+
+    def detect(self, frame):
+        end = time.process_time() + self.inference_time
+        while time.process_time() < end:
+            pass
+        detections = []
+        for label, lower, upper in self.COLORS:
+            ys, xs = np.nonzero(cv2.inRange(frame, lower, upper))
+            if len(xs) > 50:
+                detections.append({'label': label, 'x1': int(xs.min()), 'y1': int(ys.min()), 'x2': int(xs.max()),
+                                   'y2': int(ys.max()), 'confidence': 0.9})
+        return frame, detections
+
+
+def run(detector, recording: Recording):
+    """Trả về (thời gian CPU, nhãn từng frame, box Car từng frame)."""
+    labels: List[Set[str]] = []
+    cars: List[Optional[Dict]] = []
+    start = time.process_time()
+    for i in range(len(recording)):
+        frame = cv2.imdecode(np.frombuffer(recording.frame_jpeg(i), np.uint8), cv2.IMREAD_COLOR)
+        _, detections = detector.detect(frame)
+        labels.append({det['label'] for det in detections})
+        cars.append(next((det for det in detections if det['label'] == 'Car'), None))
+    return time.process_time() - start, labels, cars
+
+
+def car_error(baseline: List[Optional[Dict]], cars: List[Optional[Dict]]) -> float:
+    """Độ lệch trung bình (px) của các cạnh box Car so với inference mọi frame, trên các frame cả hai đều có xe."""
+    errors = [sum(abs(a[k] - b[k]) for k in ('x1', 'y1', 'x2', 'y2')) / 4
+              for a, b in zip(baseline, cars) if a is not None and b is not None]
+    return sum(errors) / len(errors) if errors else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recording", default=None)
+    parser.add_argument("--model", default=None, help="đường dẫn model YOLO; bỏ trống dùng detector giả")
+    parser.add_argument("--inference-ms", type=float, default=30.0)
+    parser.add_argument("--max-skip", default="2,4,8", help="các giá trị max_skip cần đo")
+    parser.add_argument("--diff-threshold", type=float, default=12.0)
+    parser.add_argument("--rois", default="", help='ví dụ "Red-light,Green-light=0,0,1,0.5;Car=0,0.4,1,1"')
+    args = parser.parse_args()
+
+    recording = Recording(args.recording) if args.recording else synthesize_recording(tempfile.mkdtemp())
+    if args.model:
+        from ..yolo_detection import YOLODetector
+        detector = YOLODetector(model_path=args.model)
+    else:
+        detector = BusyColorDetector(args.inference_ms / 1000)
+
+    baseline_cpu, baseline, baseline_cars = run(detector, recording)
+    red_frames = [i for i, labels in enumerate(baseline) if 'Red-light' in labels]
+    print(f"{len(recording)} frame, {len(red_frames)} frame có Red-light (theo inference mọi frame)")
+    print(f"{'chế độ':>16} {'CPU s':>7} {'inference':>10} {'khác nhãn':>10} {'đỏ bỏ sót':>10} {'lệch Car px':>12}")
+    print(f"{'mọi frame':>16} {baseline_cpu:7.2f} {'100%':>10} {0:>10} {0:>10} {0.0:12.1f}")
+    for max_skip in (int(n) for n in args.max_skip.split(",")):
+        scheduler = InferenceScheduler(detector, max_skip=max_skip, diff_threshold=args.diff_threshold,
+                                       rois=args.rois)
+        cpu, labels, cars = run(scheduler, recording)
+        mismatched = sum(a != b for a, b in zip(baseline, labels))
+        missed_red = sum('Red-light' not in labels[i] for i in red_frames)
+        ratio = scheduler.stats()['inference_ratio']
+        print(f"{f'max_skip={max_skip}':>16} {cpu:7.2f} {ratio:10.0%} {mismatched:>10} {missed_red:>10} "
+              f"{car_error(baseline_cars, cars):12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Độ trễ /start-navigation, /stats và /ws của app trong main.py khi inference chạy hết công suất: YOLO trong tiến
+trình API (INFERENCE_WORKERS=0) so với tiến trình worker riêng (INFERENCE_WORKERS=N).
+
+Mỗi chế độ chạy app trong một tiến trình con (cấu hình đọc từ biến môi trường lúc import), ESP32 là simulator chạy
+trong tiến trình benchmark. Bỏ qua frame tĩnh được tắt (INFERENCE_MAX_SKIP=0) để frame nào cũng chạy inference.
+Cần model thật:  python -m yolov5-backend.benchmarks.bench_inference_worker --model best.pt --workers 0,1,2
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+from .. import config
+from ..esp32_simulator import start_simulator
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    if not samples:
+        return {'p50': float('nan'), 'p95': float('nan')}
+    return {'p50': statistics.median(samples), 'p95': samples[int(0.95 * (len(samples) - 1))]}
+
+
+def timed_ms(fn) -> float:
+    start = time.perf_counter()
+    response = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    response.raise_for_status()
+    return elapsed
+
+
+def run_child(seconds: float):
+    """Chạy trong tiến trình con: dựng app, đo lúc rảnh rồi lúc đang điều hướng (inference liên tục)."""
+    from fastapi.testclient import TestClient
+    main_module = importlib.import_module(f"{__package__.rsplit('.', 1)[0]}.main")
+    route = {"start": [4, 0], "end": [0, 6]}
+    result = {}
+    with TestClient(main_module.app) as client:
+        idle_stats = [timed_ms(lambda: client.get("/stats")) for _ in range(50)]
+        idle_start = []
+        for _ in range(5):
+            idle_start.append(timed_ms(lambda: client.post("/start-navigation", json=route)))
+            client.post("/stop-navigation")
+            time.sleep(1)
+
+        client.post("/start-navigation", json=route)
+        frame_times: List[float] = []
+        stop = threading.Event()
+
+        def receive_frames():
+            with client.websocket_connect("/ws") as ws:
+                while not stop.is_set():
+                    ws.receive_text()
+                    frame_times.append(time.perf_counter())
+
+        receiver = threading.Thread(target=receive_frames, daemon=True)
+        receiver.start()
+        time.sleep(1)
+        busy_stats, busy_start = [], []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            busy_stats.append(timed_ms(lambda: client.get("/stats")))
+            if len(busy_stats) % 10 == 0:
+                busy_start.append(timed_ms(lambda: client.post("/start-navigation", json=route)))
+            time.sleep(0.05)
+        stop.set()
+        receiver.join(timeout=5)
+        snapshot = client.get("/stats").json()
+        client.post("/stop-navigation")
+        gaps = [(b - a) * 1000 for a, b in zip(frame_times, frame_times[1:])]
+        stages = snapshot['stages']
+        result = {
+            'idle_stats': percentiles(idle_stats), 'busy_stats': percentiles(busy_stats),
+            'idle_start': percentiles(idle_start), 'busy_start': percentiles(busy_start),
+            'ws_gap': percentiles(gaps), 'ws_fps': len(frame_times) / seconds,
+            'ws_end_to_end_p95': stages.get('ws_end_to_end', {}).get('p95_ms', float('nan')),
+            'inference_calls': snapshot['frame_bus']['inference_calls']
+        }
+    main_module.fleet.close()
+    print("RESULT " + json.dumps(result), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=config.YOLO_MODEL_PATH)
+    parser.add_argument("--workers", default="0,1", help="các giá trị INFERENCE_WORKERS cần đo")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.seconds)
+        return
+
+    simulator = start_simulator(latency=0.005)
+    print(f"{'workers':>8} {'/stats rảnh':>12} {'/stats bận':>12} {'/start rảnh':>12} {'/start bận':>12} "
+          f"{'/ws khoảng p95':>15} {'/ws fps':>8} {'ws e2e p95':>11}")
+    for workers in (int(n) for n in args.workers.split(",")):
+        env = dict(os.environ, ESP32_BASE_URL=simulator.base_url, ESP32_STREAM_URL=simulator.base_url + "/stream",
+                   YOLO_MODEL_PATH=args.model, INFERENCE_WORKERS=str(workers), INFERENCE_MAX_SKIP="0",
+                   LOG_LEVEL="ERROR")
+        output = subprocess.run([sys.executable, "-m", __spec__.name, "--child", "--seconds", str(args.seconds)],
+                                env=env, capture_output=True, text=True)
+        lines = [line for line in output.stdout.splitlines() if line.startswith("RESULT ")]
+        if not lines:
+            print(f"{workers:>8}: lỗi\n{output.stderr[-2000:]}")
+            continue
+        r = json.loads(lines[-1][len("RESULT "):])
+        print(f"{workers:>8} {r['idle_stats']['p95']:9.1f} ms {r['busy_stats']['p95']:9.1f} ms "
+              f"{r['idle_start']['p95']:9.1f} ms {r['busy_start']['p95']:9.1f} ms {r['ws_gap']['p95']:12.1f} ms "
+              f"{r['ws_fps']:8.1f} {r['ws_end_to_end_p95']:8.1f} ms")
+    print("(p95; /start bận gồm cả dừng và join vòng điều khiển cũ)")
+    simulator.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Đo thông lượng một vòng lặp kiểu control loop khi ghi log: print đồng bộ (cũ) so với logging qua hàng đợi
+(bật DEBUG, mặc định INFO, tắt hẳn). stdout được thay bằng một stream chậm giống terminal / pipe bị nghẽn.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_logging
+"""
+import argparse
+import io
+import time
+from .. import log as log_module
+
+
+class SlowStream(io.TextIOBase):
+    """Stream ghi chậm: mỗi lần write tốn `delay` giây, đếm số dòng nhận được."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        self.lines += text.count("\n")
+        return len(text)
+
+
+def busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run_print(iterations: int, work: float, stream: SlowStream) -> float:
+    labels = ['Car', 'Green-light']
+    start = time.perf_counter()
+    for seq in range(iterations):
+        busy(work)
+        print("Phát hiện:", labels, file=stream)
+        print(f"Đọc dữ liệu siêu âm: {42.0} cm", file=stream)
+        print("Phát hiện:", labels, file=stream)
+        print("Sent command: B,120,120", file=stream)
+    return iterations / (time.perf_counter() - start)
+
+
+def run_logging(iterations: int, work: float, stream: SlowStream, level: str, rate_limit: bool = True):
+    rate_filter = None if rate_limit else log_module.RateLimitFilter(interval=0)
+    handler = log_module.setup_logging(level=level, module_levels="", stream=stream, rate_filter=rate_filter)
+    log = log_module.get_logger("bench")
+    labels = ['Car', 'Green-light']
+    start = time.perf_counter()
+    for seq in range(iterations):
+        busy(work)
+        log.debug("Phát hiện: %s", labels, extra={'frame': seq, 'stage': 'detect'})
+        log.debug("Đọc dữ liệu siêu âm: %s cm", 42.0)
+        log.info("Phát hiện: %s", labels, extra={'frame': seq})
+        log.debug("Sent command: %s", "B,120,120", extra={'command': "B,120,120"})
+    return iterations / (time.perf_counter() - start), handler.dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--work-us", type=float, default=500.0, help="thời gian xử lý giả của mỗi vòng")
+    parser.add_argument("--write-us", type=float, default=200.0, help="thời gian mỗi lần ghi ra stdout")
+    args = parser.parse_args()
+    work = args.work_us / 1e6
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        busy(work)
+    print(f"{'không log (giới hạn trên)':>28}: {args.iterations / (time.perf_counter() - start):8.0f} vòng/s")
+    stream = SlowStream(args.write_us / 1e6)
+    print(f"{'print (cũ)':>28}: {run_print(args.iterations, work, stream):8.0f} vòng/s, {stream.lines} dòng")
+    for name, level, rate_limit in (("logging DEBUG, no limit", "DEBUG", False),
+                                    ("logging DEBUG", "DEBUG", True),
+                                    ("logging INFO (mặc định)", "INFO", True),
+                                    ("logging off", "CRITICAL", True)):
+        stream = SlowStream(args.write_us / 1e6)
+        rate, dropped = run_logging(args.iterations, work, stream, level, rate_limit)
+        log_module.flush_logging()
+        print(f"{name:>28}: {rate:8.0f} vòng/s, {stream.lines} dòng, queue bỏ {dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Đo chi phí của các hook metrics trên đường nóng: bật, tắt (METRICS_ENABLED=0) và không có hook.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_metrics
+"""
+import argparse
+import time
+from ..metrics import MetricsRegistry
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    def no_hook():
+        pass
+
+    baseline = per_call_ns(no_hook, args.iterations)
+    print(f"{'no hook':>28}: {baseline:7.0f} ns/call")
+    for enabled in (False, True):
+        registry = MetricsRegistry(enabled=enabled)
+
+        def timed():
+            with registry.timed("stage"):
+                pass
+
+        def counted():
+            registry.count("frames")
+            registry.mark("fps")
+
+        state = "on" if enabled else "off"
+        print(f"{'timed() metrics ' + state:>28}: {per_call_ns(timed, args.iterations) - baseline:7.0f} ns/call")
+        print(f"{'count()+mark() metrics ' + state:>28}: {per_call_ns(counted, args.iterations) - baseline:7.0f} ns/call")
+    snapshot_start = time.perf_counter()
+    registry.prometheus()
+    print(f"{'render /metrics':>28}: {(time.perf_counter() - snapshot_start) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""So sánh FPS lấy ảnh: poll snapshot /cam.jpg với giữ một kết nối MJPEG /stream.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_mjpeg_stream
+"""
+import argparse
+import time
+from ..esp32_interface import ESP32SyncClient
+from ..esp32_simulator import start_simulator
+
+
+def measure_fps(client: ESP32SyncClient, duration: float):
+    frames = 0
+    failures = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        if client.get_image() is None:
+            failures += 1
+        else:
+            frames += 1
+    return frames / (time.perf_counter() - start), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--latency-ms", type=float, default=60.0,
+                        help="Thời gian ESP32 xử lý một request snapshot (chụp + gửi)")
+    parser.add_argument("--stream-fps", type=float, default=25.0, help="FPS camera phát trên /stream")
+    args = parser.parse_args()
+
+    server = start_simulator(latency=args.latency_ms / 1000, stream_fps=args.stream_fps)
+    for mode in ("snapshot", "mjpeg"):
+        client = ESP32SyncClient(base_url=server.base_url, cam_mode=mode, stream_url=f"{server.base_url}/stream")
+        fps, failures = measure_fps(client, args.duration)
+        extra = ""
+        if client.client.stream is not None:
+            extra = f", parser dropped {client.client.stream.parser.frames_dropped}"
+        print(f"{mode:>8}: {fps:6.1f} fps, {failures} failures{extra}")
+        client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
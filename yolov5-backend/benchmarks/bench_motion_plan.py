@@ -0,0 +1,175 @@
+"""Đếm lệnh gửi ESP32 cho mỗi lộ trình: executor cũ (mỗi ô một lần gửi "B", quay bằng R / S chặn vòng điều khiển)
+so với kế hoạch chuyển động theo đoạn (motion_plan.py, mỗi đoạn một lệnh).
+
+Mỗi chế độ chạy RobotController.run() thật trên frame bus được publish đều đặn (không có vật cản / đèn), lệnh đi qua
+ESP32SyncClient tới simulator. In số lần gọi control_robot, số HTTP /command simulator nhận được (sau khi kênh lệnh
+bỏ lệnh trùng), thời gian đi hết lộ trình và CPU mỗi tick điều hướng. Thời gian mỗi ô / mỗi lần quay được rút ngắn
+(--cell-ms, --turn-ms) để benchmark chạy nhanh.
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_motion_plan
+"""
+import argparse
+import threading
+import time
+from typing import List, Tuple
+import numpy as np
+from .. import config
+from .. import robot_control
+from ..esp32_interface import ESP32SyncClient
+from ..esp32_simulator import start_simulator
+from ..frame_bus import FrameBus
+from ..grid_map import OccupancyMap
+from ..motion_plan import step_heading, turn_between
+from ..perception_filter import PerceptionFilter
+from ..robot_control import RobotController, obstacles, GRID_SIZE
+
+ROUTES = {
+    'mặc định': (GRID_SIZE, obstacles, [((4, 0), (0, 6)), ((0, 0), (4, 6)), ((2, 0), (0, 5))]),
+    '20x20 trống': ((20, 20), set(), [((0, 0), (19, 19)), ((19, 0), (0, 19)), ((10, 10), (0, 0))])
+}
+
+
+class TimedController(RobotController):
+    """Đo CPU của từng tick advance_navigation."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tick_cpu: List[float] = []
+
+    def advance_navigation(self, command: str, command_sent: bool) -> bool:
+        start = time.thread_time()
+        running = super().advance_navigation(command, command_sent)
+        self.tick_cpu.append(time.thread_time() - start)
+        return running
+
+
+class LegacyController(TimedController):
+    """Bản sao gọn executor cũ: dead reckoning từng ô, gửi lệnh của ô mỗi tick có frame mới, quay 90 độ bằng
+    lệnh quay + chờ TURN_90_DEGREE_TIME (chặn vòng điều khiển) + "S"."""
+
+    def start_navigation(self, start, goal):
+        path = super().start_navigation(start, goal)
+        self.path_index = 0
+        self.handled_seq = 0
+        return path
+
+    def turn_90_degrees(self, turn_direction: str):
+        self.control_robot(turn_direction, self.current_speed)
+        self.stop_event.wait(robot_control.TURN_90_DEGREE_TIME)
+        self.control_robot("S", self.current_speed)
+
+    def advance_navigation(self, command: str, command_sent: bool) -> bool:
+        start = time.thread_time()
+        # Executor cũ gửi lại lệnh mỗi khi có frame mới
+        fresh = self.last_frame_seq != self.handled_seq
+        self.handled_seq = self.last_frame_seq
+        running = self._legacy_step(command, command_sent, fresh)
+        self.tick_cpu.append(time.thread_time() - start)
+        return running
+
+    def _legacy_step(self, command: str, command_sent: bool, fresh: bool) -> bool:
+        if not command_sent and self.traffic_light_state == "green":
+            if time.time() - self.last_intersection_time > self.calculate_time_to_travel_cell():
+                if self.path_index < len(self.path):
+                    self.path_index += 1
+                    self.current_position = self.path[self.path_index - 1]
+                    self.last_intersection_time = time.time()
+                if self.current_position == self.goal_position:
+                    self.control_robot("S", self.current_speed)
+                    self.robot_running = False
+                    self.navigation_complete.set()
+                    return False
+                target = step_heading(self.current_position, self.path[self.path_index])
+                turn = turn_between(self.current_direction, target)
+                command = turn[0] if turn else "B"
+                if turn is None:
+                    self.control_robot(command, self.current_speed)
+                else:
+                    for _ in range(turn[1]):
+                        self.turn_90_degrees(command)
+                    self.current_direction = target
+        if not command_sent and (fresh or command != self.last_command):
+            self.control_robot(command, self.current_speed)
+        self.last_command = command
+        return True
+
+
+class CountingControl:
+    def __init__(self, send):
+        self.send = send
+        self.calls = 0
+
+    def __call__(self, command: str, speed: int) -> bool:
+        self.calls += 1
+        return self.send(command, speed)
+
+
+def publish_frames(bus: FrameBus, fps: float, stop: threading.Event):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    while not stop.is_set():
+        bus.publish(frame, [], 50.0)
+        stop.wait(1 / fps)
+
+
+def run_route(controller_cls, client: ESP32SyncClient, simulator, grid: OccupancyMap,
+              route: Tuple[Tuple[int, int], Tuple[int, int]], fps: float):
+    bus = FrameBus(yolo_detector=None)
+    control = CountingControl(client.submit_command)
+    controller = controller_cls(None, bus, grid=grid, control=control)
+    controller.perception = PerceptionFilter(window=1)
+    stop = threading.Event()
+    publisher = threading.Thread(target=publish_frames, args=(bus, fps, stop), daemon=True)
+    publisher.start()
+    http_before = len(simulator.commands)
+    path = controller.start_navigation(*route)
+    start = time.perf_counter()
+    thread = threading.Thread(target=controller.run, daemon=True)
+    thread.start()
+    thread.join(timeout=120)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    publisher.join()
+    client.commands.flush(timeout=5)
+    cpu = sorted(controller.tick_cpu)
+    return {
+        'cells': len(path) - 1,
+        'segments': len(controller.plan),
+        'calls': control.calls,
+        'http': len(simulator.commands) - http_before,
+        'seconds': elapsed,
+        'arrived': controller.current_position == route[1],
+        'tick_cpu_us': sum(cpu) / len(cpu) * 1e6 if cpu else 0.0,
+        'ticks': len(cpu)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cell-ms", type=float, default=50.0, help="thời gian đi một ô (CELL_MIN_TRAVEL_TIME)")
+    parser.add_argument("--turn-ms", type=float, default=100.0, help="thời gian quay 90 độ")
+    parser.add_argument("--fps", type=float, default=20.0, help="tốc độ publish frame")
+    args = parser.parse_args()
+    config.CELL_MIN_TRAVEL_TIME = args.cell_ms / 1000
+    robot_control.TURN_90_DEGREE_TIME = args.turn_ms / 1000
+
+    simulator = start_simulator()
+    client = ESP32SyncClient(base_url=simulator.base_url)
+    print(f"{'bản đồ':>12} {'lộ trình':>18} {'ô':>3} {'chế độ':>7} {'đoạn':>5} {'gọi lệnh':>9} {'HTTP':>5} "
+          f"{'thời gian':>10} {'CPU/tick':>9}")
+    totals = {'cũ': [0, 0], 'đoạn': [0, 0]}
+    for map_name, (size, blocked, routes) in ROUTES.items():
+        for route in routes:
+            for mode, controller_cls in (("cũ", LegacyController), ("đoạn", TimedController)):
+                r = run_route(controller_cls, client, simulator, OccupancyMap(size, blocked), route, args.fps)
+                totals[mode][0] += r['calls']
+                totals[mode][1] += r['http']
+                print(f"{map_name:>12} {f'{route[0]}->{route[1]}':>18} {r['cells']:3d} {mode:>7} "
+                      f"{r['segments'] if mode == 'đoạn' else '-':>5} {r['calls']:9d} {r['http']:5d} "
+                      f"{r['seconds']:8.2f} s {r['tick_cpu_us']:6.1f} µs" + ("" if r['arrived'] else "  (chưa tới)"))
+    for mode, (calls, http) in totals.items():
+        print(f"Tổng {mode}: {calls} lần gọi control_robot, {http} HTTP /command")
+    client.close()
+    simulator.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Đo số lệnh động cơ và dao động dừng / chạy khi nhận diện chập chờn: RobotController dùng nhãn của từng frame
+(cửa sổ 1 frame, không hysteresis) so với PerceptionFilter mặc định.
+
+Chuỗi frame tổng hợp: đèn xanh -> đỏ -> xanh, mỗi frame đèn thật chỉ được nhận ra với xác suất --hit-rate, thỉnh
+thoảng nhận nhầm màu còn lại; chiều cao box xe có nhiễu, siêu âm có số đo lỗi (-1) và gai. Cuối cùng kiểm tra
+một số đo gần rồi chuỗi -1 (vật cản đã đi khỏi tầm đo) có xoá khoảng cách cũ không.
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_perception_filter
+"""
+import argparse
+import random
+import numpy as np
+from ..frame_bus import FrameBus
+from ..grid_map import OccupancyMap
+from ..perception_filter import PerceptionFilter
+from ..robot_control import RobotController
+
+RED_START, RED_END = 200, 350
+
+
+class CommandLog:
+    """Thay control_robot: ghi lại mọi lệnh gửi tới ESP32."""
+
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, command, speed=None):
+        self.sent.append((command, speed))
+        return True
+
+
+def synthesize(frames: int, hit_rate: float, false_rate: float, seed: int = 0):
+    rng = random.Random(seed)
+    sequence = []
+    for i in range(frames):
+        red = RED_START <= i < RED_END
+        detections = []
+        true_light, other_light = ('Red-light', 'Green-light') if red else ('Green-light', 'Red-light')
+        if rng.random() < hit_rate:
+            detections.append({'label': true_light, 'x1': 580, 'y1': 20, 'x2': 620, 'y2': 60,
+                               'confidence': rng.uniform(0.4, 0.9)})
+        if rng.random() < false_rate:
+            detections.append({'label': other_light, 'x1': 580, 'y1': 20, 'x2': 620, 'y2': 60,
+                               'confidence': rng.uniform(0.25, 0.5)})
+        if rng.random() < hit_rate:
+            height = 150 + 100 * i / frames + rng.gauss(0, 40)
+            detections.append({'label': 'Car', 'x1': 200, 'y1': 420 - height, 'x2': 400, 'y2': 420,
+                               'confidence': rng.uniform(0.5, 0.9)})
+        distance = 30.0 if rng.random() > 0.05 else rng.choice([-1.0, 4.0])
+        sequence.append((red, detections, distance))
+    return sequence
+
+
+def run(sequence, perception: PerceptionFilter):
+    commands = CommandLog()
+    bus = FrameBus(yolo_detector=None)
+    controller = RobotController(None, bus, grid=OccupancyMap((1000, 1), set()), control=commands)
+    controller.perception = perception
+    controller.start_navigation((0, 0), (999, 0))
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    stopped_for_red, first_red_stop, wrong_stops = [], None, 0
+    for i, (red, detections, distance) in enumerate(sequence):
+        packet = bus.publish(frame, detections, distance)
+        command, command_sent = controller.react_to_perception(packet)
+        controller.advance_navigation(command, command_sent)
+        light_red = controller.traffic_light_state == "red"
+        if red:
+            stopped_for_red.append(light_red)
+            if light_red and first_red_stop is None:
+                first_red_stop = i - RED_START
+        elif light_red:
+            wrong_stops += 1
+    flips = sum(a[0] != b[0] for a, b in zip(commands.sent, commands.sent[1:]))
+    speeds = sum(a[1] != b[1] for a, b in zip(commands.sent, commands.sent[1:]))
+    return {
+        'commands': len(commands.sent),
+        'stop_go_flips': flips,
+        'speed_changes': speeds,
+        'state_changes': perception.state_changes,
+        'red_delay': first_red_stop,
+        'red_coverage': sum(stopped_for_red) / len(stopped_for_red),
+        'wrong_red_frames': wrong_stops
+    }
+
+
+def check_distance_cleared(perception: PerceptionFilter, misses: int = 100) -> bool:
+    """Một số đo 3 cm rồi `misses` lần -1: khoảng cách phải về -1 để ô phía trước không bị chặn mãi."""
+    perception.update([], 3.0)
+    for _ in range(misses):
+        state = perception.update([], -1)
+    return state.distance == -1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--hit-rate", type=float, default=0.8, help="xác suất nhận ra đúng đèn / xe mỗi frame")
+    parser.add_argument("--false-rate", type=float, default=0.05, help="xác suất nhận nhầm màu đèn mỗi frame")
+    args = parser.parse_args()
+
+    sequence = synthesize(args.frames, args.hit_rate, args.false_rate)
+    raw = PerceptionFilter(window=1, on_threshold=1e-9, off_threshold=1e-9, smoothing=1.0)
+    for name, perception in (("từng frame", raw), ("PerceptionFilter", PerceptionFilter())):
+        r = run(sequence, perception)
+        print(f"{name:>16}: {r['commands']} lệnh, {r['stop_go_flips']} lần đổi dừng/chạy, "
+              f"{r['speed_changes']} lần đổi tốc độ, {r['state_changes']} lần đổi trạng thái; "
+              f"đèn đỏ: trễ {r['red_delay']} frame, giữ dừng {r['red_coverage']:.0%} thời gian đỏ, "
+              f"{r['wrong_red_frames']} frame dừng nhầm khi đèn xanh")
+    cleared = check_distance_cleared(PerceptionFilter())
+    print(f"Siêu âm 3 cm rồi 100 lần -1: {'khoảng cách đã xoá' if cleared else 'VẪN GIỮ số đo cũ'}")
+    if not cleared:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
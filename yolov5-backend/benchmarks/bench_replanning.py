@@ -0,0 +1,80 @@
+"""Đo thời gian replan khi một ô phía trước bị chặn: chạy lại A* từ đầu so với sửa lộ trình bằng D* Lite.
+
+Cột cuối là cách RobotController chọn theo REPLAN_DSTAR_MIN_CELLS (lưới nhỏ hơn ngưỡng dùng A*).
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_replanning
+"""
+import argparse
+import random
+import statistics
+import time
+from .. import config
+from ..grid_map import OccupancyMap
+from ..replanner import DStarLite
+from ..robot_control import GRID_SIZE, obstacles as DEFAULT_OBSTACLES
+
+
+def simulate(size, obstacles, start, goal, events: int, rng):
+    """Robot đi dọc lộ trình; thỉnh thoảng ô kế tiếp bị chặn và phải replan."""
+    grid = OccupancyMap(size, obstacles)
+    replanner = DStarLite(grid, start, goal)
+    path = replanner.path()
+    position_index = 0
+    a_star_times, dstar_times = [], []
+    now = 0.0
+    while len(dstar_times) < events and position_index + 1 < len(path):
+        # Đi vài bước rồi chặn ô phía trước
+        position_index = min(position_index + rng.randint(1, 8), len(path) - 2)
+        current, ahead = path[position_index], path[position_index + 1]
+        if ahead == goal:
+            break
+        now += 1.0
+        grid.mark_blocked(ahead, ttl=1.0, now=now)
+
+        t0 = time.perf_counter()
+        grid.a_star(current, goal)
+        a_star_times.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        replanner.move_to(current)
+        replanner.update_cells([ahead])
+        new_path = replanner.path()
+        dstar_times.append(time.perf_counter() - t0)
+        if not new_path:
+            # Không có đường vòng (ví dụ ở góc bản đồ): gỡ vật cản và đi tiếp như khi hết TTL
+            replanner.update_cells(grid.clear_expired(now=now + 1.0))
+            new_path = replanner.path()
+        path, position_index = new_path, 0
+    return a_star_times, dstar_times
+
+
+def report(name, size, a_star_times, dstar_times):
+    planner = "D* Lite" if size[0] * size[1] >= config.REPLAN_DSTAR_MIN_CELLS else "A*"
+    if not dstar_times:
+        print(f"{name}: no replanning events")
+        return
+    a_star = statistics.mean(a_star_times) * 1e6
+    dstar = statistics.mean(dstar_times) * 1e6
+    print(f"{name}: {len(dstar_times):3d} events | full A* mean {a_star:10.1f} us, "
+          f"median {statistics.median(a_star_times) * 1e6:10.1f} us | D* Lite repair mean {dstar:9.1f} us, "
+          f"median {statistics.median(dstar_times) * 1e6:9.1f} us ({a_star / dstar:5.1f}x) -> {planner}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--density", type=float, default=0.15)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    report("5x7", GRID_SIZE, *simulate(GRID_SIZE, DEFAULT_OBSTACLES, (4, 0), (0, 6), args.events, rng))
+
+    for size in ((10, 10), (20, 20), (50, 50), (200, 200)):
+        obstacles = {(r, c) for r in range(size[0]) for c in range(size[1]) if rng.random() < args.density}
+        obstacles -= {(0, 0), (size[0] - 1, size[1] - 1)}
+        report(f"{size[0]}x{size[1]}", size,
+               *simulate(size, obstacles, (0, 0), (size[0] - 1, size[1] - 1), args.events, rng))
+
+
+if __name__ == "__main__":
+    main()
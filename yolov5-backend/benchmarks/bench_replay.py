@@ -0,0 +1,152 @@
+"""Benchmark đầu-cuối trên một recording: simulator phát lại ảnh / siêu âm, FrameBus + RobotController +
+WebSocketHandler chạy như trong main.py, đo FPS và độ trễ quyết định (từ lúc lấy frame tới lệnh điều khiển).
+
+Không có --recording thì tự tạo một recording tổng hợp (xe màu đỏ tiến lại gần).
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_replay --speed 0
+                           python -m yolov5-backend.benchmarks.bench_replay --recording runs/lap1 --speed 1
+"""
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+from ..esp32_interface import ESP32SyncClient, set_default_client
+from ..esp32_simulator import start_simulator
+from ..frame_bus import FrameBus
+from ..metrics import metrics
+from ..recording import Recorder, Recording
+from ..robot_control import RobotController
+from ..websocket_handler import WebSocketHandler
+
+
+def synthesize_recording(path: str, frames: int = 300, fps: float = 15.0) -> Recording:
+    """Recording tổng hợp: một khối đỏ ("xe") lớn dần, siêu âm giảm dần, đèn xanh ở góc ảnh."""
+    recorder = Recorder(path)
+    start = time.time()
+    for i in range(frames):
+        t = start + i / fps
+        frame = np.full((480, 640, 3), 60, dtype=np.uint8)
+        height = int(40 + 360 * (i % 150) / 150)
+        cv2.rectangle(frame, (320 - height // 2, 460 - height), (320 + height // 2, 460), (0, 0, 255), -1)
+        cv2.circle(frame, (600, 40), 20, (0, 255, 0), -1)
+        recorder.record_frame(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes(), t)
+        recorder.record_ultrasonic(max(2.0, 60.0 - 0.4 * (i % 150)), t)
+    recorder.close()
+    return Recording(path)
+
+
+class ColorDetector:
+    """Detector giả rẻ và tất định cho recording tổng hợp: vùng đỏ là 'Car', vùng xanh lá là 'Green-light'."""
+
+    def __init__(self, inference_time: float):
+        self.inference_time = inference_time
+
+    def detect(self, frame):
+        time.sleep(self.inference_time)
+        detections = []
+        for label, lower, upper in (('Car', (0, 0, 200), (60, 60, 255)), ('Green-light', (0, 200, 0), (60, 255, 60))):
+            ys, xs = np.nonzero(cv2.inRange(frame, lower, upper))
+            if len(xs):
+                detections.append({'label': label, 'x1': int(xs.min()), 'y1': int(ys.min()), 'x2': int(xs.max()),
+                                   'y2': int(ys.max()), 'confidence': 0.9})
+        return frame, detections
+
+
+class CountingWebSocket:
+    """WebSocket giả chỉ đếm số frame nhận được."""
+
+    def __init__(self, idx: int, query_params=None):
+        self.client = f"replay-{idx}"
+        self.query_params = query_params or {}
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.frames += 1
+
+    async def send_bytes(self, data):
+        pass
+
+
+def run_websockets(handler: WebSocketHandler, clients, stop: threading.Event):
+    async def main():
+        for ws in clients:
+            await handler.connect(ws)
+        task = asyncio.create_task(handler.stream_video())
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        for ws in clients:
+            handler.disconnect(ws)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recording", default=None)
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = thời gian thực, 0 = nhanh nhất có thể")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="độ trễ mạng giả lập của ESP32")
+    parser.add_argument("--model", default=None, help="đường dẫn model YOLO; bỏ trống dùng detector màu giả")
+    parser.add_argument("--inference-ms", type=float, default=20.0, help="thời gian inference của detector giả")
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    recording = Recording(args.recording) if args.recording else synthesize_recording(tempfile.mkdtemp())
+    simulator = start_simulator(latency=args.latency_ms / 1000, recording=recording, speed=args.speed)
+    client = ESP32SyncClient(base_url=simulator.base_url)
+    set_default_client(client)
+    if args.model:
+        from ..yolo_detection import YOLODetector
+        detector = YOLODetector(model_path=args.model)
+    else:
+        detector = ColorDetector(args.inference_ms / 1000)
+
+    metrics.reset()
+    bus = FrameBus(detector)
+    controller = RobotController(detector, bus)
+    handler = WebSocketHandler(bus, asyncio.Event(), controller)
+    clients = [CountingWebSocket(i) for i in range(args.clients)]
+    stop = threading.Event()
+    controller.start_navigation((4, 0), (0, 6))
+    control_thread = threading.Thread(target=controller.run, daemon=True)
+    ws_thread = threading.Thread(target=run_websockets, args=(handler, clients, stop), daemon=True)
+
+    start = time.perf_counter()
+    bus.start()
+    control_thread.start()
+    ws_thread.start()
+    simulator.finished.wait(args.max_seconds)
+    elapsed = time.perf_counter() - start
+    controller.stop_navigation()
+    control_thread.join(timeout=3)
+    bus.stop()
+    stop.set()
+    ws_thread.join(timeout=3)
+    client.commands.flush(timeout=3)
+
+    snapshot = metrics.snapshot()
+    stages = snapshot['stages']
+    print(f"Recording {len(recording)} frame ({recording.duration:.1f} s), speed {args.speed or 'max'}, "
+          f"chạy {elapsed:.1f} s, simulator phát {simulator.frames_served} frame")
+    print(f"FrameBus: {bus.frames_published / elapsed:.1f} fps; WebSocket: "
+          + ", ".join(f"{ws.frames / elapsed:.1f}" for ws in clients) + " fps")
+    print(f"Lệnh tới simulator: {len(simulator.commands)} (recording gốc có {len(recording.commands)} lệnh), "
+          f"kênh lệnh: {client.commands.stats()['suppressed']} lệnh trùng bị bỏ")
+    for stage in ("esp32_fetch", "imdecode", "detect", "perception_age", "decision_latency", "control_robot",
+                  "imencode", "ws_end_to_end"):
+        if stage in stages:
+            s = stages[stage]
+            print(f"{stage:>18}: p50 {s['p50_ms']:7.1f} ms, p95 {s['p95_ms']:7.1f} ms, p99 {s['p99_ms']:7.1f} ms "
+                  f"({s['count']} mẫu)")
+    client.close()
+    simulator.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""So sánh tìm đường: A* cũ, A* của GridMap (cold), cache lộ trình và tra bảng next-hop, trên lưới 5x7 và 200x200.
+
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_routing
+"""
+import argparse
+import random
+import time
+from heapq import heappush, heappop
+from ..grid_map import GridMap
+from ..robot_control import GRID_SIZE, obstacles as DEFAULT_OBSTACLES
+
+
+def legacy_a_star(start, goal, obstacles, grid_size):
+    """Bản sao RobotController.a_star trước khi có GridMap."""
+    def manhattan_distance(pos1, pos2):
+        return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
+    if start in obstacles or goal in obstacles:
+        return []
+    open_set = []
+    heappush(open_set, (0, start))
+    came_from = {}
+    g_score = {start: 0}
+    f_score = {start: manhattan_distance(start, goal)}
+    while open_set:
+        _, current = heappop(open_set)
+        if current == goal:
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            path.append(start)
+            return path[::-1]
+        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        for dx, dy in directions:
+            next_pos = (current[0] + dx, current[1] + dy)
+            if (0 <= next_pos[0] < grid_size[0] and 0 <= next_pos[1] < grid_size[1] and
+                    next_pos not in obstacles):
+                tentative_g_score = g_score[current] + 1
+                if next_pos not in g_score or tentative_g_score < g_score[next_pos]:
+                    came_from[next_pos] = current
+                    g_score[next_pos] = tentative_g_score
+                    f_score[next_pos] = tentative_g_score + manhattan_distance(next_pos, goal)
+                    heappush(open_set, (f_score[next_pos], next_pos))
+    return []
+
+
+def per_query_us(fn, queries) -> float:
+    start = time.perf_counter()
+    for s, g in queries:
+        fn(s, g)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+
+def bench_grid(name, size, obstacles, queries, goals):
+    grid = GridMap(size, obstacles, route_cache_size=len(queries), table_cache_size=len(goals))
+    legacy = per_query_us(lambda s, g: legacy_a_star(s, g, obstacles, size), queries)
+    cold = per_query_us(grid.a_star, queries)
+    per_query_us(grid.route, queries)  # làm nóng cache
+    cached = per_query_us(grid.route, queries)
+    start = time.perf_counter()
+    grid.precompute(goals)
+    precompute_ms = (time.perf_counter() - start) * 1000
+    table_hop = per_query_us(grid.next_hop, queries)
+    table_route = per_query_us(grid.route_from_table, queries)
+
+    # Thêm một vật cản trên một lộ trình đã cache rồi đo thời gian cập nhật cache
+    path = next(p for p in (grid.route(s, g) for s, g in queries) if len(p) > 2)
+    start = time.perf_counter()
+    grid.set_obstacle(path[len(path) // 2])
+    update_us = (time.perf_counter() - start) * 1e6
+    print(f"{name}: legacy A* {legacy:9.1f} us | cold A* {cold:9.1f} us | cached route {cached:6.2f} us | "
+          f"next-hop {table_hop:5.2f} us | table route {table_route:7.1f} us | "
+          f"precompute {len(goals)} goals {precompute_ms:8.1f} ms | obstacle update {update_us:8.1f} us")
+
+
+def random_obstacles(size, density, rng):
+    return {(r, c) for r in range(size[0]) for c in range(size[1]) if rng.random() < density}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--goals", type=int, default=20, help="Số đích (trạm) được dựng bảng trên lưới lớn")
+    parser.add_argument("--density", type=float, default=0.2)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    free = [(r, c) for r in range(GRID_SIZE[0]) for c in range(GRID_SIZE[1]) if (r, c) not in DEFAULT_OBSTACLES]
+    queries = [(rng.choice(free), rng.choice(free)) for _ in range(args.queries)]
+    bench_grid("5x7 (all-pairs)", GRID_SIZE, set(DEFAULT_OBSTACLES), queries, free)
+
+    size = (200, 200)
+    obstacles = random_obstacles(size, args.density, rng)
+    free = [(r, c) for r in range(size[0]) for c in range(size[1]) if (r, c) not in obstacles]
+    goals = rng.sample(free, args.goals)
+    queries = [(rng.choice(free), rng.choice(goals)) for _ in range(args.queries)]
+    bench_grid("200x200", size, obstacles, queries, goals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Load test fan-out WebSocket: vòng lặp gửi tuần tự (cũ) so với hàng đợi + task gửi riêng cho từng client.
+
+Dùng client giả lập (một phần là client chậm) để đo độ trễ gửi của các client nhanh.
+Chạy từ thư mục gốc repo:  python -m yolov5-backend.benchmarks.bench_ws_fanout --clients 40 --slow 5
+"""
+import argparse
+import asyncio
+import base64
+import statistics
+import time
+import cv2
+import numpy as np
+from ..frame_bus import FramePacket
+from ..websocket_handler import WebSocketHandler
+
+
+class FakeWebSocket:
+    """WebSocket giả: mỗi lần gửi mất send_delay giây, ghi lại độ trễ từ lúc frame được publish."""
+
+    def __init__(self, idx: int, send_delay: float, query_params=None):
+        self.client = f"sim-{idx}"
+        self.query_params = query_params or {}
+        self.send_delay = send_delay
+        self.latencies = []
+
+    async def accept(self):
+        pass
+
+    async def _send(self):
+        await asyncio.sleep(self.send_delay)
+        self.latencies.append(time.perf_counter() - self.current_publish_time)
+
+    async def send_text(self, data):
+        await self._send()
+
+    async def send_bytes(self, data):
+        await self._send()
+
+    async def send_json(self, data):
+        await self._send()
+
+
+class RobotStub:
+    robot_running = True
+
+
+def make_clients(count: int, slow: int, fast_delay: float, slow_delay: float):
+    return [FakeWebSocket(i, slow_delay if i < slow else fast_delay) for i in range(count)]
+
+
+async def run_legacy(clients, frames: int, interval: float, frame: np.ndarray):
+    """Bản sao vòng lặp cũ: encode mỗi frame rồi await send_json lần lượt từng client."""
+    start = time.perf_counter()
+    for seq in range(frames):
+        publish_time = time.perf_counter()
+        for c in clients:
+            c.current_publish_time = publish_time
+        _, buffer = cv2.imencode('.jpg', frame)
+        data = {'image': base64.b64encode(buffer).decode('utf-8'), 'detections': [], 'ultrasonic_distance': 50}
+        for connection in clients:
+            await connection.send_json(data)
+        await asyncio.sleep(max(0.0, start + (seq + 1) * interval - time.perf_counter()))
+
+
+async def run_fanout(clients, frames: int, interval: float, frame: np.ndarray):
+    handler = WebSocketHandler(None, asyncio.Event(), RobotStub())
+    for c in clients:
+        await handler.connect(c)
+    start = time.perf_counter()
+    for seq in range(1, frames + 1):
+        publish_time = time.perf_counter()
+        for c in clients:
+            c.current_publish_time = publish_time
+        await handler.broadcast(FramePacket(seq, time.time(), frame, [], 50))
+        await asyncio.sleep(max(0.0, start + seq * interval - time.perf_counter()))
+    await asyncio.sleep(0.2)
+    stats = handler.client_stats()
+    for c in clients:
+        handler.disconnect(c)
+    return stats
+
+
+def summarize(name: str, clients, slow: int, frames: int, elapsed: float, dropped: int = 0):
+    fast = [lat for c in clients[slow:] for lat in c.latencies]
+    fast.sort()
+    print(f"{name:>10}: fast clients p50 {statistics.median(fast) * 1000:7.1f} ms, "
+          f"p95 {fast[int(len(fast) * 0.95)] * 1000:7.1f} ms, "
+          f"broadcast rate {frames / elapsed:5.1f} fps, dropped for slow clients {dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--slow", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--fps", type=float, default=20.0)
+    parser.add_argument("--fast-ms", type=float, default=1.0)
+    parser.add_argument("--slow-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    interval = 1.0 / args.fps
+
+    clients = make_clients(args.clients, args.slow, args.fast_ms / 1000, args.slow_ms / 1000)
+    start = time.perf_counter()
+    asyncio.run(run_legacy(clients, args.frames, interval, frame))
+    summarize("legacy", clients, args.slow, args.frames, time.perf_counter() - start)
+
+    clients = make_clients(args.clients, args.slow, args.fast_ms / 1000, args.slow_ms / 1000)
+    start = time.perf_counter()
+    stats = asyncio.run(run_fanout(clients, args.frames, interval, frame))
+    summarize("fan-out", clients, args.slow, args.frames, time.perf_counter() - start,
+              sum(s['dropped'] for s in stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import asyncio
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+from . import config
+
+
+class LatencyHistogram:
+    """Histogram độ trễ với các bucket cố định (ms), đủ rẻ để ghi mỗi lần gửi lệnh."""
+
+    BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={b}ms" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'max_ms': self.max,
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+STOP_COMMAND = "S"
+
+
+class CommandChannel:
+    """Kênh gửi lệnh động cơ tới ESP32: bỏ lệnh trùng, gộp lệnh dồn dập và gửi bất đồng bộ có retry.
+
+    Lệnh là chuỗi cmd đã định dạng (xem format_command). submit() không chặn; một task trên event loop của client
+    gửi lần lượt, lệnh chuyển động chưa kịp gửi bị thay bằng lệnh mới hơn. Lệnh dừng "S" không bao giờ bị bỏ:
+    lệnh mới hơn xếp sau nó, và "S" được thử lại (backoff giới hạn) tới khi xe nhận được.
+    Lệnh trùng với lệnh chờ gửi / đang gửi, hoặc (khi không có) với lệnh ESP32 đã nhận gần nhất thì bỏ qua.
+    heartbeat > 0 gửi lại lệnh chuyển động định kỳ cho firmware có watchdog động cơ.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[bool]], loop: asyncio.AbstractEventLoop,
+                 retries: int = config.ESP32_COMMAND_RETRIES,
+                 retry_backoff: float = config.ESP32_COMMAND_RETRY_BACKOFF,
+                 heartbeat: float = config.ESP32_COMMAND_HEARTBEAT):
+        self._send = send
+        self._loop = loop
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        # Lệnh chờ gửi theo thứ tự: nhiều nhất một "S" rồi một lệnh chuyển động; và lệnh đang gửi
+        self._queue: Deque[str] = deque()
+        self._in_flight: Optional[str] = None
+        self._idle = threading.Event()
+        self._idle.set()
+        self.last_acked: Optional[str] = None
+        self.sent = 0
+        self.suppressed = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.retried = 0
+        self.heartbeats = 0
+        self.rtt = LatencyHistogram()
+        self._wakeup = asyncio.run_coroutine_threadsafe(self._create_event(), loop).result()
+        self._task = asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+
+    @staticmethod
+    async def _create_event() -> asyncio.Event:
+        return asyncio.Event()
+
+    async def _start(self) -> asyncio.Task:
+        return asyncio.create_task(self._sender())
+
+    def _effective(self) -> Optional[str]:
+        """Lệnh xe sẽ thực hiện sau khi mọi lệnh đã nhận được gửi xong (gọi khi đang giữ _lock)."""
+        if self._queue:
+            return self._queue[-1]
+        return self._in_flight if self._in_flight is not None else self.last_acked
+
+    def submit(self, command: str) -> bool:
+        """Đưa lệnh vào kênh (gọi được từ mọi thread). Trả về False nếu lệnh trùng và bị bỏ qua."""
+        with self._lock:
+            if command == self._effective():
+                self.suppressed += 1
+                return False
+            if self._queue and self._queue[-1] != STOP_COMMAND:
+                # Lệnh chuyển động chưa gửi bị thay bằng lệnh mới hơn; "S" phía trước vẫn giữ nguyên
+                self._queue.pop()
+                self.coalesced += 1
+            if command != self._effective():
+                self._queue.append(command)
+            self._idle.clear()
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Chờ tới khi không còn lệnh chờ hoặc đang gửi."""
+        return self._idle.wait(timeout)
+
+    async def _sender(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._heartbeat_timeout())
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if not self._queue and self._in_flight is None and self.last_acked is not None:
+                        # Gửi lại lệnh chuyển động gần nhất để giữ watchdog của firmware
+                        self.heartbeats += 1
+                        self._queue.append(self.last_acked)
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if not self._queue:
+                        self._idle.set()
+                        break
+                    self._in_flight = self._queue.popleft()
+                await self._deliver(self._in_flight)
+                with self._lock:
+                    self._in_flight = None
+
+    def _heartbeat_timeout(self) -> Optional[float]:
+        if self.heartbeat <= 0 or self.last_acked in (None, STOP_COMMAND):
+            return None
+        return self.heartbeat
+
+    async def _deliver(self, command: str):
+        attempt = 0
+        while True:
+            if attempt and command != STOP_COMMAND:
+                with self._lock:
+                    if self._queue:
+                        # Đã có lệnh mới hơn: bỏ lần thử lại, gửi lệnh mới thay vì lệnh cũ
+                        return
+                if attempt > self.retries:
+                    break
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (min(attempt, self.retries + 1) - 1))
+            start = time.perf_counter()
+            ok = await self._send(command)
+            if ok:
+                self.rtt.observe(time.perf_counter() - start)
+                self.sent += 1
+                self.last_acked = command
+                return
+            attempt += 1
+        self.failed += 1
+
+    def stats(self) -> Dict:
+        return {
+            'sent': self.sent,
+            'suppressed': self.suppressed,
+            'coalesced': self.coalesced,
+            'failed': self.failed,
+            'retried': self.retried,
+            'heartbeats': self.heartbeats,
+            'last_acked': self.last_acked,
+            'rtt': self.rtt.to_dict()
+        }
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._task.cancel)
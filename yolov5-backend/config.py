@@ -0,0 +1,131 @@
+import os
+
+# Cấu hình chung, có thể ghi đè bằng biến môi trường khi triển khai
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+# ESP32-CAM
+ESP32_HOST = os.environ.get("ESP32_HOST", "192.168.107.231")
+ESP32_BASE_URL = os.environ.get("ESP32_BASE_URL", f"http://{ESP32_HOST}")
+ESP32_FRAME_TIMEOUT = _env_float("ESP32_FRAME_TIMEOUT", 3.0)
+ESP32_ULTRASONIC_TIMEOUT = _env_float("ESP32_ULTRASONIC_TIMEOUT", 1.0)
+ESP32_COMMAND_TIMEOUT = _env_float("ESP32_COMMAND_TIMEOUT", 2.0)
+ESP32_MAX_CONNECTIONS = _env_int("ESP32_MAX_CONNECTIONS", 4)
+# Chế độ lấy ảnh: "snapshot" (poll /cam.jpg) hoặc "mjpeg" (giữ một kết nối stream multipart)
+ESP32_CAM_MODE = os.environ.get("ESP32_CAM_MODE", "snapshot")
+ESP32_STREAM_URL = os.environ.get("ESP32_STREAM_URL", f"http://{ESP32_HOST}:81/stream")
+# Thư mục ghi lại ảnh / siêu âm / lệnh để phát lại bằng simulator; để trống = không ghi
+ESP32_RECORD_DIR = os.environ.get("ESP32_RECORD_DIR", "")
+# Kênh lệnh động cơ: số lần thử lại và thời gian chờ ban đầu (giây, nhân đôi mỗi lần)
+ESP32_COMMAND_RETRIES = _env_int("ESP32_COMMAND_RETRIES", 2)
+ESP32_COMMAND_RETRY_BACKOFF = _env_float("ESP32_COMMAND_RETRY_BACKOFF", 0.05)
+# Chu kỳ gửi lại lệnh chuyển động (giây) cho firmware có watchdog động cơ; 0 = tắt
+ESP32_COMMAND_HEARTBEAT = _env_float("ESP32_COMMAND_HEARTBEAT", 0.0)
+# YOLO
+YOLO_CONF_THRESHOLD = _env_float("YOLO_CONF_THRESHOLD", 0.25)
+# Danh sách tên lớp cách nhau bởi dấu phẩy, để trống = giữ tất cả
+YOLO_CLASSES = [c.strip() for c in os.environ.get("YOLO_CLASSES", "").split(",") if c.strip()]
+# Đường dẫn model: .pt, .torchscript hoặc .onnx (xuất bằng export.py của yolov5)
+YOLO_MODEL_PATH = os.environ.get("YOLO_MODEL_PATH",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "best.pt"))
+# Thư mục mã nguồn yolov5 đã clone sẵn; để trống sẽ dùng bản trong cache của torch.hub
+YOLOV5_REPO_DIR = os.environ.get("YOLOV5_REPO_DIR", "")
+YOLO_IMG_SIZE = _env_int("YOLO_IMG_SIZE", 640)
+YOLO_WARMUP_RUNS = _env_int("YOLO_WARMUP_RUNS", 1)
+# Backend inference: "torch", "onnxruntime" hoặc "onnxruntime-int8" (lượng tử hoá động từ file .onnx)
+YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "torch")
+# Số thread CPU cho inference, 0 = để thư viện tự chọn
+YOLO_THREADS = _env_int("YOLO_THREADS", 0)
+YOLO_IOU_THRESHOLD = _env_float("YOLO_IOU_THRESHOLD", 0.45)
+# WebSocket video
+WS_JPEG_QUALITY = _env_int("WS_JPEG_QUALITY", 80)
+# Số frame tối đa chờ gửi cho mỗi client; đầy thì bỏ frame cũ nhất
+WS_CLIENT_QUEUE_SIZE = _env_int("WS_CLIENT_QUEUE_SIZE", 1)
+# Bản đồ / tìm đường
+ROUTE_CACHE_SIZE = _env_int("ROUTE_CACHE_SIZE", 1024)
+# Số bảng next-hop (mỗi bảng cho một đích) được giữ trong bộ nhớ
+NEXT_HOP_TABLE_CACHE_SIZE = _env_int("NEXT_HOP_TABLE_CACHE_SIZE", 64)
+# Thời gian (giây) một ô bị coi là có vật cản sau khi phát hiện
+NO_ENTRY_BLOCK_TTL = _env_float("NO_ENTRY_BLOCK_TTL", 30.0)
+STOPPED_CAR_BLOCK_TTL = _env_float("STOPPED_CAR_BLOCK_TTL", 5.0)
+ULTRASONIC_BLOCK_TTL = _env_float("ULTRASONIC_BLOCK_TTL", 3.0)
+# Siêu âm dưới ngưỡng này (cm) coi như ô phía trước bị chặn
+ULTRASONIC_BLOCK_DISTANCE_CM = _env_float("ULTRASONIC_BLOCK_DISTANCE_CM", 5.0)
+# Bản đồ ít ô hơn ngưỡng này thì replan bằng A* đầy đủ (rẻ hơn sửa lộ trình bằng D* Lite trên lưới nhỏ)
+REPLAN_DSTAR_MIN_CELLS = _env_int("REPLAN_DSTAR_MIN_CELLS", 400)
+# Vòng điều khiển
+# Chu kỳ tick cố định (giây), cũng là deadline của mỗi vòng
+CONTROL_PERIOD = _env_float("CONTROL_PERIOD", 0.1)
+# Dữ liệu nhận diện cũ hơn ngưỡng này (giây) thì tick không đi tiếp dựa trên nó
+CONTROL_STALE_TIMEOUT = _env_float("CONTROL_STALE_TIMEOUT", 1.0)
+# Thời gian tối thiểu để dead reckoning coi như đã đi hết một ô (nhịp cũ của vòng lặp là 0.5 s)
+CELL_MIN_TRAVEL_TIME = _env_float("CELL_MIN_TRAVEL_TIME", 0.5)
+# Tốc độ chỉ được tăng / giảm một nấc (20) mỗi khoảng này (giây), bất kể camera chạy bao nhiêu FPS
+SPEED_RAMP_INTERVAL = _env_float("SPEED_RAMP_INTERVAL", 0.5)
+# Metrics
+# Bật/tắt đo độ trễ từng stage cho /metrics và /stats (0 = tắt, các hook thành no-op)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Số mẫu gần nhất dùng để tính p50/p95/p99 cho mỗi stage
+METRICS_WINDOW = _env_int("METRICS_WINDOW", 1024)
+# Cửa sổ (giây) để tính FPS / tốc độ sự kiện
+METRICS_RATE_WINDOW = _env_float("METRICS_RATE_WINDOW", 5.0)
+# Logging
+# Mức log chung và mức riêng theo module, ví dụ LOG_MODULE_LEVELS="robot_control=DEBUG,esp32_interface=WARNING"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_MODULE_LEVELS = os.environ.get("LOG_MODULE_LEVELS", "")
+# "text" hoặc "json" (một object mỗi dòng)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Mỗi message được ghi tối đa LOG_RATE_BURST lần trong LOG_RATE_INTERVAL giây; 0 = không giới hạn
+LOG_RATE_INTERVAL = _env_float("LOG_RATE_INTERVAL", 1.0)
+LOG_RATE_BURST = _env_int("LOG_RATE_BURST", 5)
+# Số bản ghi tối đa chờ ghi; đầy thì bỏ thay vì chặn thread gọi
+LOG_QUEUE_SIZE = _env_int("LOG_QUEUE_SIZE", 10000)
+# Fleet nhiều xe
+# Các xe thêm ngoài xe mặc định (ESP32_BASE_URL), dạng "car2=http://192.168.1.21,car3=http://192.168.1.22"
+FLEET_ROBOTS = os.environ.get("FLEET_ROBOTS", "")
+# Số frame tối đa gộp vào một lượt inference và thời gian chờ gom thêm frame (giây)
+FLEET_MAX_BATCH = _env_int("FLEET_MAX_BATCH", 8)
+FLEET_BATCH_WAIT = _env_float("FLEET_BATCH_WAIT", 0.005)
+# Lập lịch inference
+# Số frame tối đa liên tiếp được bỏ qua inference khi ảnh gần như không đổi; 0 = inference mọi frame
+INFERENCE_MAX_SKIP = _env_int("INFERENCE_MAX_SKIP", 4)
+# Ngưỡng chênh lệch (0-255) của ô thay đổi nhiều nhất trên ảnh thu nhỏ; dưới ngưỡng thì coi là ảnh tĩnh
+INFERENCE_DIFF_THRESHOLD = _env_float("INFERENCE_DIFF_THRESHOLD", 12.0)
+# Vùng quan tâm theo nhóm lớp, toạ độ chuẩn hoá x1,y1,x2,y2, ví dụ
+# "Red-light,Green-light,Yellow-light=0,0,1,0.55;Car=0.2,0.35,0.8,1"; để trống = cả khung hình
+INFERENCE_ROIS = os.environ.get("INFERENCE_ROIS", "")
+# Lọc nhận diện theo thời gian
+# Số frame của cửa sổ trượt tính confidence trung bình mỗi lớp
+PERCEPTION_WINDOW = _env_int("PERCEPTION_WINDOW", 5)
+# Hysteresis: trạng thái (đèn đỏ / xanh, biển cấm, xe phía trước) bật khi confidence trung bình >= ON,
+# tắt khi < OFF
+PERCEPTION_ON_THRESHOLD = _env_float("PERCEPTION_ON_THRESHOLD", 0.3)
+PERCEPTION_OFF_THRESHOLD = _env_float("PERCEPTION_OFF_THRESHOLD", 0.1)
+# Hệ số làm mượt (EMA) chiều cao box xe và khoảng cách siêu âm; 1 = không làm mượt
+PERCEPTION_SMOOTHING = _env_float("PERCEPTION_SMOOTHING", 0.5)
+# Số frame liên tiếp siêu âm không có số đo (-1: không có tiếng vọng, > 400 cm, lỗi đọc) vẫn giữ khoảng cách cũ;
+# quá số này thì coi như phía trước trống
+PERCEPTION_DISTANCE_HOLD = _env_int("PERCEPTION_DISTANCE_HOLD", 2)
+# Tiến trình inference riêng
+# Số tiến trình worker chạy YOLO; 0 = chạy trong tiến trình API như trước
+INFERENCE_WORKERS = _env_int("INFERENCE_WORKERS", 0)
+# Số slot frame trong vòng shared memory (số frame tối đa đang chờ inference cùng lúc)
+INFERENCE_WORKER_SLOTS = _env_int("INFERENCE_WORKER_SLOTS", 4)
+# Kích thước frame lớn nhất (rộng x cao) một slot chứa được
+INFERENCE_WORKER_MAX_FRAME = os.environ.get("INFERENCE_WORKER_MAX_FRAME", "1600x1200")
+# Niceness của worker, để API và vòng điều khiển được ưu tiên CPU khi inference chạy hết công suất
+INFERENCE_WORKER_NICE = _env_int("INFERENCE_WORKER_NICE", 10)
+# Worker không trả kết quả sau ngần này giây thì coi như treo và bị khởi động lại
+INFERENCE_WORKER_TIMEOUT = _env_float("INFERENCE_WORKER_TIMEOUT", 10.0)
+# Mã hoá / giải mã JPEG
+# "auto" (simplejpeg hoặc PyTurboJPEG nếu đã cài, không thì OpenCV), "simplejpeg", "turbojpeg" hoặc "opencv"
+JPEG_BACKEND = os.environ.get("JPEG_BACKEND", "auto")
+# Giải mã thu nhỏ theo DCT (1/2, 1/4, 1/8) miễn cạnh dài vẫn >= giá trị này (px); 0 = luôn giải mã đủ độ phân giải
+JPEG_DECODE_TARGET = _env_int("JPEG_DECODE_TARGET", YOLO_IMG_SIZE)
+# Số buffer giải mã tối đa được giữ để dùng lại khi thư viện ghi được vào buffer có sẵn; 0 = mỗi frame một mảng mới.
+# Buffer chỉ được dùng lại khi frame cũ trong đó không còn được tham chiếu
+JPEG_BUFFER_POOL = _env_int("JPEG_BUFFER_POOL", 4)
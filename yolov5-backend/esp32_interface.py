@@ -1,61 +1,266 @@
-import requests
+import asyncio
+import threading
+import httpx
 import numpy as np
 import cv2
 from typing import Optional, Tuple
+from . import config
+from .mjpeg_stream import MJPEGStream
+from .recording import Recorder
+from .command_channel import CommandChannel
+from .metrics import metrics
+from .log import get_logger
+
+log = get_logger(__name__)
 
 # Địa chỉ ESP32-CAM
-ESP32_CAM_URL = "http://192.168.107.231/cam.jpg"
-ESP32_CONTROL_URL = "http://192.168.107.231/command"
-ESP32_ULTRASONIC_URL = "http://192.168.107.231/ultrasonic"
+ESP32_CAM_URL = f"{config.ESP32_BASE_URL}/cam.jpg"
+ESP32_CONTROL_URL = f"{config.ESP32_BASE_URL}/command"
+ESP32_ULTRASONIC_URL = f"{config.ESP32_BASE_URL}/ultrasonic"
 
-def get_image_from_esp32() -> Optional[np.ndarray]:
-    """Lấy hình ảnh từ ESP32-CAM và trả về dưới dạng numpy array."""
-    try:
-        response = requests.get(ESP32_CAM_URL, stream=True, timeout=10)
-        img_array = np.asarray(bytearray(response.content), dtype=np.uint8)
-        frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        if frame is None:
-            print("Error: Could not decode frame from ESP32-CAM.")
+def format_command(command: str, speed: int) -> str:
+    """Chuyển lệnh + tốc độ thành chuỗi cmd mà firmware ESP32 hiểu."""
+    if command in ["S", "stop"]:
+        return "S"
+    return f"{command},{speed},{speed}"
+
+def decode_frame(content: bytes) -> Optional[np.ndarray]:
+    img_array = np.frombuffer(content, dtype=np.uint8)
+    return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+
+def parse_ultrasonic(data: dict) -> float:
+    distance = data.get("distance", -1)
+    if distance < 0 or distance > 400:
+        log.warning("Dữ liệu siêu âm không hợp lệ: %s cm, bỏ qua", distance)
+        return -1
+    log.debug("Đọc dữ liệu siêu âm: %s cm", distance)
+    return distance
+
+
+class ESP32Client:
+    """Client async tới ESP32-CAM, giữ một session keep-alive dùng lại kết nối cho mọi request.
+
+    cam_mode="mjpeg" giữ một kết nối stream và trả về ảnh mới nhất; "snapshot" poll /cam.jpg mỗi frame.
+    Nếu có recorder, mọi ảnh JPEG, lần đọc siêu âm và lệnh gửi thành công đều được ghi lại để phát lại sau.
+    Phải được tạo và dùng trong cùng một event loop.
+    """
+
+    def __init__(self, base_url: str = config.ESP32_BASE_URL,
+                 frame_timeout: float = config.ESP32_FRAME_TIMEOUT,
+                 ultrasonic_timeout: float = config.ESP32_ULTRASONIC_TIMEOUT,
+                 command_timeout: float = config.ESP32_COMMAND_TIMEOUT,
+                 max_connections: int = config.ESP32_MAX_CONNECTIONS,
+                 cam_mode: str = config.ESP32_CAM_MODE,
+                 stream_url: str = config.ESP32_STREAM_URL,
+                 recorder: Optional[Recorder] = None):
+        self.base_url = base_url
+        self.frame_timeout = frame_timeout
+        self.ultrasonic_timeout = ultrasonic_timeout
+        self.command_timeout = command_timeout
+        self.recorder = recorder
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections,
+                              keepalive_expiry=30)
+        self._session = httpx.AsyncClient(base_url=base_url, limits=limits)
+        if cam_mode not in ("snapshot", "mjpeg"):
+            raise ValueError(f"Unknown ESP32 camera mode: {cam_mode}")
+        self.cam_mode = cam_mode
+        # Stream dùng kết nối riêng để không chiếm chỗ trong pool của các request ngắn
+        self.stream = MJPEGStream(httpx.AsyncClient(), stream_url) if cam_mode == "mjpeg" else None
+
+    async def _get_jpeg(self) -> Optional[bytes]:
+        if self.stream is not None:
+            jpeg = await self.stream.next_jpeg(self.frame_timeout)
+            if jpeg is None:
+                log.warning("MJPEG stream has no fresh frame")
+            return jpeg
+        response = await self._session.get("/cam.jpg", timeout=self.frame_timeout)
+        return response.content
+
+    async def get_jpeg(self) -> Optional[bytes]:
+        """Lấy ảnh JPEG gốc từ ESP32-CAM, chưa giải mã (giải mã để cho thread của frame bus)."""
+        try:
+            with metrics.timed("esp32_fetch"):
+                jpeg = await self._get_jpeg()
+            if jpeg is None:
+                metrics.count("frame_fetch_failures")
+                return None
+            if self.recorder is not None:
+                self.recorder.record_frame(jpeg)
+            return jpeg
+        except Exception as e:
+            log.warning("Error fetching image: %s", e)
+            metrics.count("frame_fetch_failures")
             return None
+
+    async def get_image(self) -> Optional[np.ndarray]:
+        """Lấy hình ảnh từ ESP32-CAM và trả về dưới dạng numpy array."""
+        jpeg = await self.get_jpeg()
+        if jpeg is None:
+            return None
+        with metrics.timed("imdecode"):
+            frame = decode_frame(jpeg)
+        if frame is None:
+            log.warning("Could not decode frame from ESP32-CAM")
+            metrics.count("frame_decode_failures")
         return frame
-    except Exception as e:
-        print(f"Error fetching image: {e}")
-        return None
+
+    async def get_ultrasonic_distance(self) -> float:
+        """Lấy dữ liệu siêu âm từ ESP32-CAM."""
+        try:
+            with metrics.timed("ultrasonic"):
+                response = await self._session.get("/ultrasonic", timeout=self.ultrasonic_timeout)
+            if response.status_code == 200:
+                distance = parse_ultrasonic(response.json())
+                if self.recorder is not None:
+                    self.recorder.record_ultrasonic(distance)
+                return distance
+            log.warning("Lỗi đọc dữ liệu siêu âm, status code: %s", response.status_code)
+            return -1
+        except Exception as e:
+            log.warning("Lỗi kết nối siêu âm: %s", e)
+            return -1
+
+    async def fetch_frame_and_distance(self) -> Tuple[Optional[np.ndarray], float]:
+        """Lấy frame và dữ liệu siêu âm song song."""
+        frame, distance = await asyncio.gather(self.get_image(), self.get_ultrasonic_distance())
+        return frame, distance
+
+    async def fetch_jpeg_and_distance(self) -> Tuple[Optional[bytes], float]:
+        """Như fetch_frame_and_distance nhưng trả JPEG chưa giải mã, để không giải mã trên event loop dùng chung."""
+        jpeg, distance = await asyncio.gather(self.get_jpeg(), self.get_ultrasonic_distance())
+        return jpeg, distance
+
+    async def control_robot(self, command: str, speed: int) -> bool:
+        """Gửi lệnh điều khiển đến ESP32-CAM."""
+        return await self.send_command(format_command(command, speed))
+
+    async def send_command(self, full_command: str) -> bool:
+        """Gửi chuỗi cmd đã định dạng tới /command."""
+        try:
+            with metrics.timed("control_robot"):
+                response = await self._session.get("/command", params={"cmd": full_command},
+                                                   timeout=self.command_timeout)
+            if response.status_code == 200:
+                log.debug("Sent command: %s", full_command, extra={'command': full_command})
+                if self.recorder is not None:
+                    self.recorder.record_command(full_command)
+                return True
+            log.warning("Failed to send command %s, status code: %s", full_command, response.status_code)
+            metrics.count("command_failures")
+            return False
+        except Exception as e:
+            log.warning("Gửi lệnh %s thất bại: %s", full_command, e)
+            metrics.count("command_failures")
+            return False
+
+    async def aclose(self):
+        if self.stream is not None:
+            await self.stream.stop()
+            await self.stream.session.aclose()
+        await self._session.aclose()
+
+
+class ESP32SyncClient:
+    """Facade đồng bộ cho ESP32Client, dùng từ các thread (control loop, frame bus).
+
+    Client async chạy trên một event loop riêng trong thread nền nên không chặn event loop của FastAPI.
+    Nhiều client (ví dụ các xe trong một fleet) có thể dùng chung một loop nền qua tham số loop.
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None, **client_kwargs):
+        self._owns_loop = loop is None
+        self._thread: Optional[threading.Thread] = None
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="esp32-client", daemon=True)
+            self._thread.start()
+        self._loop = loop
+        self.client: ESP32Client = self._run(self._create_client(client_kwargs))
+        self._commands: Optional[CommandChannel] = None
+
+    @staticmethod
+    async def _create_client(client_kwargs) -> ESP32Client:
+        return ESP32Client(**client_kwargs)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_image(self) -> Optional[np.ndarray]:
+        return self._run(self.client.get_image())
+
+    def get_ultrasonic_distance(self) -> float:
+        return self._run(self.client.get_ultrasonic_distance())
+
+    def fetch_frame_and_distance(self) -> Tuple[Optional[np.ndarray], float]:
+        return self._run(self.client.fetch_frame_and_distance())
+
+    def fetch_jpeg_and_distance(self) -> Tuple[Optional[bytes], float]:
+        return self._run(self.client.fetch_jpeg_and_distance())
+
+    def control_robot(self, command: str, speed: int) -> bool:
+        return self._run(self.client.control_robot(command, speed))
+
+    @property
+    def commands(self) -> CommandChannel:
+        """Kênh gửi lệnh bất đồng bộ, bỏ lệnh trùng, chạy trên event loop của client."""
+        if self._commands is None:
+            self._commands = CommandChannel(self.client.send_command, self._loop)
+        return self._commands
+
+    def submit_command(self, command: str, speed: int) -> bool:
+        return self.commands.submit(format_command(command, speed))
+
+    def close(self):
+        if self._commands is not None:
+            self._commands.flush(timeout=self.client.command_timeout)
+            self._commands.close()
+        self._run(self.client.aclose())
+        if self._owns_loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2)
+
+
+_default_client: Optional[ESP32SyncClient] = None
+_default_client_lock = threading.Lock()
+
+def get_default_client() -> ESP32SyncClient:
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            recorder = Recorder(config.ESP32_RECORD_DIR) if config.ESP32_RECORD_DIR else None
+            _default_client = ESP32SyncClient(recorder=recorder)
+        return _default_client
+
+def set_default_client(client: ESP32SyncClient):
+    """Thay client dùng chung, ví dụ trỏ tới simulator khi phát lại một recording."""
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
+
+def get_image_from_esp32() -> Optional[np.ndarray]:
+    """Lấy hình ảnh từ ESP32-CAM và trả về dưới dạng numpy array."""
+    return get_default_client().get_image()
 
 def get_ultrasonic_distance() -> float:
     """Lấy dữ liệu siêu âm từ ESP32-CAM."""
-    try:
-        response = requests.get(ESP32_ULTRASONIC_URL, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            distance = data.get("distance", -1)
-            if distance < 0 or distance > 400:
-                print(f"Dữ liệu siêu âm không hợp lệ: {distance} cm, bỏ qua")
-                return -1
-            print(f"Đọc dữ liệu siêu âm: {distance} cm")
-            return distance
-        else:
-            print(f"Lỗi đọc dữ liệu siêu âm, status code: {response.status_code}")
-            return -1
-    except Exception as e:
-        print(f"Lỗi kết nối siêu âm: {e}")
-        return -1
+    return get_default_client().get_ultrasonic_distance()
+
+def fetch_frame_and_distance() -> Tuple[Optional[np.ndarray], float]:
+    """Lấy frame và dữ liệu siêu âm song song qua client dùng chung."""
+    return get_default_client().fetch_frame_and_distance()
+
+def fetch_jpeg_and_distance() -> Tuple[Optional[bytes], float]:
+    """Lấy JPEG chưa giải mã và dữ liệu siêu âm song song qua client dùng chung."""
+    return get_default_client().fetch_jpeg_and_distance()
 
 def control_robot(command: str, speed: int) -> bool:
-    """Gửi lệnh điều khiển đến ESP32-CAM."""
-    try:
-        if command in ["S", "stop"]:
-            full_command = "S"
-        else:
-            full_command = f"{command},{speed},{speed}"
-        url = f"{ESP32_CONTROL_URL}?cmd={full_command}"
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            print(f"Sent command: {full_command}")
-            return True
-        else:
-            print(f"Failed to send command, status code: {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"Gửi lệnh thất bại: {e}")
-        return False
\ No newline at end of file
+    """Gửi lệnh điều khiển đến ESP32-CAM qua kênh lệnh dùng chung (không chặn).
+
+    Trả về False nếu lệnh trùng với lệnh đang có hiệu lực và bị bỏ qua.
+    """
+    return get_default_client().submit_command(command, speed)
+
+def command_stats() -> dict:
+    """Số lệnh đã gửi / bị bỏ / bị gộp và histogram độ trễ round-trip."""
+    return get_default_client().commands.stats()
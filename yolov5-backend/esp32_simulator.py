@@ -0,0 +1,192 @@
+"""Server HTTP giả lập ESP32-CAM (/cam.jpg, /stream, /ultrasonic, /command) để đo độ trễ và thông lượng khi không có xe.
+
+Có thể phát lại một recording (xem recording.py) theo thời gian thực hoặc nhanh nhất có thể.
+
+Chạy độc lập:  python -m yolov5-backend.esp32_simulator --port 8081 --latency-ms 20
+Phát lại:      python -m yolov5-backend.esp32_simulator --port 8081 --replay runs/lap1 --speed 1 --loop
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import cv2
+import numpy as np
+from .recording import Recording
+
+STREAM_BOUNDARY = "123456789000000000000987654321"
+
+
+def make_test_jpeg(width: int = 640, height: int = 480) -> bytes:
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.rectangle(frame, (width // 4, height // 4), (width // 2, height // 2), (0, 0, 255), -1)
+    cv2.putText(frame, "ESP32 SIM", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+    _, buffer = cv2.imencode('.jpg', frame)
+    return buffer.tobytes()
+
+
+class ESP32Simulator(ThreadingHTTPServer):
+    """ThreadingHTTPServer giữ trạng thái giả lập: ảnh trả về, khoảng cách, độ trễ và lệnh đã nhận.
+
+    Với recording: speed > 0 phát theo thời gian thực (nhân speed), mỗi request nhận ảnh mới nhất tại thời điểm
+    đó; speed = 0 phát nhanh nhất có thể, mỗi request lấy ảnh sẽ nhận ảnh kế tiếp. Hết recording thì quay lại đầu nếu
+    loop, nếu không thì giữ ảnh cuối và set `finished`.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0, distance: float = 50.0,
+                 jpeg: Optional[bytes] = None, stream_fps: float = 25.0,
+                 recording: Optional[Recording] = None, speed: float = 1.0, loop: bool = False):
+        super().__init__(address, _ESP32RequestHandler)
+        self.latency = latency
+        self.stream_fps = stream_fps
+        self.distance = distance
+        self.jpeg = jpeg or make_test_jpeg()
+        self.recording = recording
+        self.speed = speed
+        self.loop = loop
+        self.finished = threading.Event()
+        self.frames_served = 0
+        self._replay_start: Optional[float] = None
+        self._replay_index = -1
+        self.commands: List[Tuple[float, str]] = []
+        self.request_count = 0
+        self.connection_count = 0
+        self._lock = threading.Lock()
+
+    def _replay_elapsed(self) -> float:
+        """Thời điểm trong recording (giây từ đầu) đang được phát."""
+        recording = self.recording
+        if self.speed <= 0:
+            index = max(self._replay_index, 0)
+            return float(recording.index['t'][index]) - recording.start_time
+        if self._replay_start is None:
+            self._replay_start = time.monotonic()
+        elapsed = (time.monotonic() - self._replay_start) * self.speed
+        if elapsed > recording.duration:
+            if not self.loop:
+                self.finished.set()
+                return recording.duration
+            elapsed %= max(recording.duration, 1e-9)
+        return elapsed
+
+    def current_jpeg(self) -> bytes:
+        if self.recording is None:
+            return self.jpeg
+        with self._lock:
+            self.frames_served += 1
+            if self.speed > 0:
+                return self.recording.frame_jpeg(self.recording.frame_index_at(self._replay_elapsed()))
+            if self._replay_index + 1 >= len(self.recording):
+                if self.loop:
+                    self._replay_index = -1
+                else:
+                    self.finished.set()
+                    return self.recording.frame_jpeg(len(self.recording) - 1)
+            self._replay_index += 1
+            return self.recording.frame_jpeg(self._replay_index)
+
+    def current_distance(self) -> float:
+        if self.recording is None or len(self.recording.ultrasonic) == 0:
+            return self.distance
+        with self._lock:
+            return self.recording.ultrasonic_at(self._replay_elapsed())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def record_command(self, cmd: str):
+        with self._lock:
+            self.commands.append((time.time(), cmd))
+
+
+class _ESP32RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Cho phép keep-alive như ESP32 WebServer
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connection_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.record_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path == "/stream":
+            self._stream()
+        elif url.path == "/cam.jpg":
+            self._send(200, "image/jpeg", self.server.current_jpeg())
+        elif url.path == "/ultrasonic":
+            self._send(200, "application/json", json.dumps({"distance": self.server.current_distance()}).encode())
+        elif url.path == "/command":
+            cmd = parse_qs(url.query).get("cmd", [""])[0]
+            self.server.record_command(cmd)
+            self._send(200, "text/plain", b"OK")
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _stream(self):
+        """Phát MJPEG multipart giống CameraWebServer của ESP32 cho tới khi client ngắt kết nối."""
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace;boundary={STREAM_BOUNDARY}")
+        self.end_headers()
+        interval = 1.0 / self.server.stream_fps
+        try:
+            while True:
+                jpeg = self.server.current_jpeg()
+                self.wfile.write(f"\r\n--{STREAM_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg)
+                time.sleep(interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_simulator(host: str = "127.0.0.1", port: int = 0, **kwargs) -> ESP32Simulator:
+    """Khởi động simulator trong thread nền; port=0 để hệ điều hành chọn port trống."""
+    server = ESP32Simulator((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="esp32-simulator", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--distance", type=float, default=50.0)
+    parser.add_argument("--stream-fps", type=float, default=25.0)
+    parser.add_argument("--replay", default=None, help="thư mục recording để phát lại")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = thời gian thực, 0 = nhanh nhất có thể")
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+    recording = Recording(args.replay) if args.replay else None
+    server = ESP32Simulator((args.host, args.port), latency=args.latency_ms / 1000, distance=args.distance,
+                            stream_fps=args.stream_fps, recording=recording, speed=args.speed, loop=args.loop)
+    print(f"ESP32 simulator listening on {server.base_url}"
+          + (f", replaying {args.replay} ({len(recording)} frames)" if recording else ""))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from . import config
+from .esp32_interface import ESP32SyncClient
+from .frame_bus import FrameBus
+from .grid_map import OccupancyMap
+from .inference_scheduler import InferenceScheduler
+from .log import get_logger
+from .robot_control import GRID_SIZE, RobotController, obstacles
+from .websocket_handler import WebSocketHandler
+from .yolo_detection import BatchingDetector, YOLODetector
+
+log = get_logger(__name__)
+
+
+def default_stream_url(base_url: str) -> str:
+    """CameraWebServer của ESP32 phát MJPEG ở port 81 trên cùng host."""
+    return f"http://{urlparse(base_url).hostname}:81/stream"
+
+
+def parse_fleet(spec: str) -> List[Tuple[str, str]]:
+    """"car2=http://192.168.1.21,car3=http://192.168.1.22" -> [('car2', 'http://...'), ('car3', 'http://...')]."""
+    robots = []
+    for item in spec.split(","):
+        if "=" in item:
+            robot_id, base_url = item.split("=", 1)
+            robots.append((robot_id.strip(), base_url.strip()))
+    return robots
+
+
+class Robot:
+    """Một xe trong fleet: client ESP32, frame bus, bộ điều khiển và WebSocket handler riêng."""
+
+    def __init__(self, robot_id: str, client: ESP32SyncClient, detector, grid: Optional[OccupancyMap] = None):
+        self.id = robot_id
+        self.client = client
+        self.controller: RobotController
+        # Cổng bỏ frame tĩnh và tracker giữ trạng thái theo từng camera, detector bên trong dùng chung
+        self.detector = InferenceScheduler(detector)
+        self.frame_bus = FrameBus(self.detector, should_run=lambda: self.controller.robot_running,
+                                  fetch=client.fetch_jpeg_and_distance)
+        self.controller = RobotController(self.detector, self.frame_bus, grid=grid, control=client.submit_command)
+        self.navigation_complete = asyncio.Event()
+        self.websocket_handler = WebSocketHandler(self.frame_bus, self.navigation_complete, self.controller)
+        self.thread: Optional[threading.Thread] = None
+
+    def stop_navigation(self, timeout: float = 2):
+        """Dừng xe và chờ thread điều khiển cũ thoát (chặn tối đa timeout giây)."""
+        self.controller.stop_navigation()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                log.warning("Thread điều khiển của %s chưa dừng sau %s s", self.id, timeout)
+        self.navigation_complete.set()
+
+    def start_navigation(self, start: Tuple[int, int], goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+        if self.thread and self.thread.is_alive():
+            self.stop_navigation()
+        path = self.controller.start_navigation(start, goal)
+        if not path:
+            return path
+        self.thread = threading.Thread(target=self.controller.run, name=f"robot-{self.id}", daemon=True)
+        self.thread.start()
+        return path
+
+    def close(self):
+        self.stop_navigation()
+        self.frame_bus.stop()
+        self.client.close()
+
+    def stats(self) -> Dict:
+        return {
+            'id': self.id,
+            'base_url': self.client.client.base_url,
+            'running': self.controller.robot_running,
+            'position': self.controller.current_position,
+            'frames_published': self.frame_bus.frames_published,
+            'inference_ratio': self.detector.stats()['inference_ratio'],
+            'websocket_clients': len(self.websocket_handler.sessions)
+        }
+
+
+class FleetManager:
+    """Quản lý nhiều xe trong một tiến trình: một model YOLO dùng chung, frame của các xe được gộp batch.
+
+    Client ESP32 của các xe đăng ký qua register() dùng chung một event loop nền.
+    """
+
+    def __init__(self, detector: YOLODetector, grid: Optional[OccupancyMap] = None,
+                 max_batch: int = config.FLEET_MAX_BATCH, batch_wait: float = config.FLEET_BATCH_WAIT):
+        self.detector = BatchingDetector(detector, max_batch=max_batch, max_wait=batch_wait)
+        # Bản đồ dùng chung cho mọi xe nếu truyền vào; mặc định mỗi xe có bản đồ riêng
+        # để vật cản tạm thời một xe thấy không làm lệch D* Lite của xe khác
+        self.grid = grid
+        self.robots: Dict[str, Robot] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="fleet-esp32-clients", daemon=True).start()
+
+    def register(self, robot_id: str, base_url: Optional[str] = None, client: Optional[ESP32SyncClient] = None,
+                 grid: Optional[OccupancyMap] = None, **client_kwargs) -> Robot:
+        """Thêm một xe theo địa chỉ ESP32 (hoặc một client có sẵn) và chạy frame bus của nó."""
+        with self._lock:
+            if robot_id in self.robots:
+                raise ValueError(f"Robot đã tồn tại: {robot_id}")
+            if client is None:
+                client_kwargs.setdefault('stream_url', default_stream_url(base_url))
+                client = ESP32SyncClient(loop=self._loop, base_url=base_url, **client_kwargs)
+            grid = grid or self.grid or OccupancyMap(GRID_SIZE, obstacles)
+            robot = Robot(robot_id, client, self.detector, grid)
+            self.robots[robot_id] = robot
+            self.detector.producers = len(self.robots)
+        robot.frame_bus.start()
+        log.info("Đăng ký robot %s (%s)", robot_id, client.client.base_url)
+        return robot
+
+    def unregister(self, robot_id: str):
+        with self._lock:
+            robot = self.robots.pop(robot_id)
+            self.detector.producers = len(self.robots)
+        robot.close()
+        log.info("Gỡ robot %s", robot_id)
+
+    def get(self, robot_id: str) -> Robot:
+        """Trả về robot theo id; KeyError nếu chưa đăng ký."""
+        return self.robots[robot_id]
+
+    def stats(self) -> Dict:
+        return {
+            'robots': [robot.stats() for robot in list(self.robots.values())],
+            'detector': self.detector.stats()
+        }
+
+    def close(self):
+        for robot_id in list(self.robots):
+            self.unregister(robot_id)
+        self.detector.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
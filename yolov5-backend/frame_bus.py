@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
+from .esp32_interface import fetch_jpeg_and_distance
+from .image_codec import JpegCodec
+from .yolo_detection import YOLODetector
+from .metrics import metrics
+from .log import get_logger
+
+log = get_logger(__name__)
+
+
+@dataclass
+class FramePacket:
+    """Một frame đã qua nhận diện, kèm dữ liệu siêu âm đọc cùng lúc."""
+    seq: int
+    timestamp: float
+    frame: np.ndarray
+    detections: List[Dict] = field(default_factory=list)
+    ultrasonic_distance: float = -1
+    # Thời điểm bắt đầu lấy frame từ ESP32, dùng để đo độ trễ đầu-cuối
+    captured_at: float = 0.0
+    # JPEG gốc từ ESP32 khi frame được giải mã đủ độ phân giải, để WebSocket gửi lại mà không mã hoá
+    jpeg: Optional[bytes] = None
+    # Tỉ lệ kích thước frame / ảnh gốc của camera (< 1 khi giải mã thu nhỏ); toạ độ detections luôn theo ảnh gốc
+    image_scale: float = 1.0
+
+
+class FrameBus:
+    """Một producer duy nhất lấy frame + siêu âm, chạy YOLO một lần và phát bản mới nhất cho mọi subscriber.
+
+    Bộ đệm chỉ giữ giá trị mới nhất: subscriber chậm sẽ bỏ qua các frame cũ thay vì xếp hàng.
+    fetch có thể trả JPEG (được giải mã bằng codec trong thread của bus, thu nhỏ theo kích thước đầu vào model)
+    hoặc frame đã giải mã.
+    """
+
+    def __init__(self, yolo_detector: YOLODetector,
+                 should_run: Optional[Callable[[], bool]] = None,
+                 fetch: Callable[[], Tuple[Union[bytes, np.ndarray, None], float]] = fetch_jpeg_and_distance,
+                 codec: Optional[JpegCodec] = None):
+        self.yolo_detector = yolo_detector
+        self.should_run = should_run or (lambda: True)
+        self.fetch = fetch
+        self.codec = codec or JpegCodec()
+        self._latest: Optional[FramePacket] = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.frames_published = 0
+        self.inference_calls = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._produce, name="frame-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def latest(self) -> Optional[FramePacket]:
+        return self._latest
+
+    def _produce(self):
+        while not self._stop_event.is_set():
+            if not self.should_run():
+                self._stop_event.wait(0.1)
+                continue
+            try:
+                captured_at = time.time()
+                frame, ultrasonic_distance = self.fetch()
+                jpeg = None
+                denominator = 1
+                if isinstance(frame, bytes):
+                    jpeg = frame
+                    with metrics.timed("imdecode"):
+                        frame, denominator = self.codec.decode(jpeg)
+                    if frame is None:
+                        log.warning("Could not decode frame from ESP32-CAM")
+                        metrics.count("frame_decode_failures")
+                    elif denominator != 1:
+                        jpeg = None
+                if frame is None:
+                    log.warning("No frame from ESP32-CAM, skipping...")
+                    metrics.count("frame_bus_empty_fetches")
+                    self._stop_event.wait(1)
+                    continue
+                frame, detections = self.yolo_detector.detect(frame)
+                self.inference_calls += 1
+                if denominator != 1:
+                    # Đưa toạ độ về ảnh gốc để các ngưỡng pixel (chiều cao box xe...) giữ nguyên ý nghĩa;
+                    # dict mới vì detector (InferenceScheduler) có thể giữ lại list của nó
+                    detections = [dict(det, **{k: det[k] * denominator for k in ('x1', 'y1', 'x2', 'y2')})
+                                  for det in detections]
+                self.publish(frame, detections, ultrasonic_distance, captured_at, jpeg, 1 / denominator)
+            except Exception as e:
+                log.exception("Error in frame bus: %s", e)
+                self._stop_event.wait(1)
+
+    def publish(self, frame: np.ndarray, detections: List[Dict], ultrasonic_distance: float,
+                captured_at: Optional[float] = None, jpeg: Optional[bytes] = None,
+                image_scale: float = 1.0) -> FramePacket:
+        """Đưa một frame mới vào bộ đệm và đánh thức mọi subscriber."""
+        with self._cond:
+            self._seq += 1
+            now = time.time()
+            packet = FramePacket(self._seq, now, frame, detections, ultrasonic_distance,
+                                 now if captured_at is None else captured_at, jpeg, image_scale)
+            self._latest = packet
+            self.frames_published += 1
+            self._cond.notify_all()
+            metrics.mark("frame_bus_fps")
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, event in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+        return packet
+
+    def wait_for_next(self, last_seq: int = 0, timeout: Optional[float] = None,
+                      cancel: Optional[threading.Event] = None) -> Optional[FramePacket]:
+        """Chờ (blocking) một frame có seq lớn hơn last_seq; trả về None khi hết thời gian hoặc cancel được set
+        (kèm interrupt())."""
+        with self._cond:
+            self._cond.wait_for(lambda: (self._latest is not None and self._latest.seq > last_seq) or
+                                (cancel is not None and cancel.is_set()), timeout)
+            packet = self._latest
+        if packet is None or packet.seq <= last_seq:
+            return None
+        return packet
+
+    def interrupt(self):
+        """Đánh thức mọi subscriber đang chờ trong wait_for_next để chúng kiểm tra lại cờ cancel."""
+        with self._cond:
+            self._cond.notify_all()
+
+    async def next_frame(self, last_seq: int = 0) -> FramePacket:
+        """Phiên bản async của wait_for_next, dùng cho các WebSocket streamer."""
+        while True:
+            with self._cond:
+                packet = self._latest
+                if packet is not None and packet.seq > last_seq:
+                    return packet
+                event = asyncio.Event()
+                self._async_waiters.append((asyncio.get_running_loop(), event))
+            await event.wait()
@@ -0,0 +1,307 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from heapq import heappush, heappop
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from . import config
+
+Cell = Tuple[int, int]
+# Thứ tự duyệt giống A* cũ của RobotController để lộ trình không đổi
+DIRECTIONS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+UNREACHABLE = -1
+
+
+class GridMap:
+    """Bản đồ lưới tĩnh cho tìm đường, có cache lộ trình và bảng next-hop tính trước.
+
+    - route(): A* với cache LRU theo (start, goal).
+    - next_hop() / route_from_table(): tra bảng next-hop dựng bằng BFS ngược từ mỗi đích (lưới trọng số đều).
+    Khi vật cản thay đổi (set_obstacle) chỉ các lộ trình/bảng có thể bị ảnh hưởng mới bị xoá.
+    """
+
+    def __init__(self, size: Tuple[int, int], obstacles: Iterable[Cell] = (),
+                 route_cache_size: int = config.ROUTE_CACHE_SIZE,
+                 table_cache_size: int = config.NEXT_HOP_TABLE_CACHE_SIZE):
+        self.rows, self.cols = size
+        self.obstacles: Set[Cell] = set(obstacles)
+        self.route_cache_size = route_cache_size
+        self.table_cache_size = table_cache_size
+        self._routes: "OrderedDict[Tuple[Cell, Cell], Tuple[Cell, ...]]" = OrderedDict()
+        self._routes_through: Dict[Cell, Set[Tuple[Cell, Cell]]] = {}
+        # goal index -> (dist, next_hop) dạng mảng phẳng theo chỉ số r * cols + c
+        self._tables: "OrderedDict[int, Tuple[array, array]]" = OrderedDict()
+        self._neighbors: List[Tuple[int, ...]] = [()] * (self.rows * self.cols)
+        for r in range(self.rows):
+            for c in range(self.cols):
+                self._update_neighbors(r * self.cols + c)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Control thread cập nhật vật cản trong khi API có thể đang tính lộ trình
+        self._lock = threading.RLock()
+
+    # Tiện ích chỉ số
+    def in_bounds(self, cell: Cell) -> bool:
+        return 0 <= cell[0] < self.rows and 0 <= cell[1] < self.cols
+
+    def is_free(self, cell: Cell) -> bool:
+        return self.in_bounds(cell) and cell not in self.obstacles
+
+    def _index(self, cell: Cell) -> int:
+        return cell[0] * self.cols + cell[1]
+
+    def _cell(self, index: int) -> Cell:
+        return divmod(index, self.cols)
+
+    def _update_neighbors(self, index: int):
+        r, c = divmod(index, self.cols)
+        if (r, c) in self.obstacles:
+            self._neighbors[index] = ()
+            return
+        self._neighbors[index] = tuple(
+            (r + dr) * self.cols + (c + dc) for dr, dc in DIRECTIONS
+            if 0 <= r + dr < self.rows and 0 <= c + dc < self.cols and (r + dr, c + dc) not in self.obstacles
+        )
+
+    def neighbors(self, cell: Cell) -> List[Cell]:
+        return [self._cell(i) for i in self._neighbors[self._index(cell)]]
+
+    @property
+    def adjacency(self) -> List[Tuple[int, ...]]:
+        """Danh sách hàng xóm trống theo chỉ số phẳng r * cols + c; được cập nhật tại chỗ khi vật cản đổi."""
+        return self._neighbors
+
+    # A*
+    def a_star(self, start: Cell, goal: Cell) -> List[Cell]:
+        """A* không qua cache, dùng danh sách hàng xóm đã tính trước."""
+        if not self.is_free(start) or not self.is_free(goal):
+            return []
+        cols = self.cols
+        neighbors = self._neighbors
+        goal_r, goal_c = goal
+        start_i, goal_i = self._index(start), self._index(goal)
+        open_set = [(abs(start[0] - goal_r) + abs(start[1] - goal_c), start)]
+        came_from: Dict[int, int] = {}
+        g_score = {start_i: 0}
+        while open_set:
+            _, current = heappop(open_set)
+            current_i = current[0] * cols + current[1]
+            if current_i == goal_i:
+                path = [current_i]
+                while current_i in came_from:
+                    current_i = came_from[current_i]
+                    path.append(current_i)
+                return [divmod(i, cols) for i in reversed(path)]
+            tentative_g = g_score[current_i] + 1
+            for next_i in neighbors[current_i]:
+                if tentative_g < g_score.get(next_i, tentative_g + 1):
+                    came_from[next_i] = current_i
+                    g_score[next_i] = tentative_g
+                    r, c = divmod(next_i, cols)
+                    heappush(open_set, (tentative_g + abs(r - goal_r) + abs(c - goal_c), (r, c)))
+        return []
+
+    def route(self, start: Cell, goal: Cell) -> List[Cell]:
+        """Lộ trình ngắn nhất start -> goal, lấy từ cache LRU nếu đã tính."""
+        with self._lock:
+            return self._route(start, goal)
+
+    def _route(self, start: Cell, goal: Cell) -> List[Cell]:
+        key = (start, goal)
+        cached = self._routes.get(key)
+        if cached is not None:
+            self._routes.move_to_end(key)
+            self.cache_hits += 1
+            return list(cached)
+        self.cache_misses += 1
+        path = self.a_star(start, goal)
+        self._routes[key] = tuple(path)
+        for cell in path:
+            self._routes_through.setdefault(cell, set()).add(key)
+        if len(self._routes) > self.route_cache_size:
+            self._evict_route(next(iter(self._routes)))
+        return path
+
+    def _evict_route(self, key: Tuple[Cell, Cell]):
+        path = self._routes.pop(key, ())
+        for cell in path:
+            keys = self._routes_through.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._routes_through[cell]
+
+    # Bảng next-hop
+    def _table(self, goal: Cell) -> Tuple[array, array]:
+        goal_i = self._index(goal)
+        table = self._tables.get(goal_i)
+        if table is not None:
+            self._tables.move_to_end(goal_i)
+            return table
+        size = self.rows * self.cols
+        dist = array('i', [UNREACHABLE]) * size
+        next_hop = array('i', [UNREACHABLE]) * size
+        if self.is_free(goal):
+            neighbors = self._neighbors
+            dist[goal_i] = 0
+            next_hop[goal_i] = goal_i
+            queue = deque([goal_i])
+            while queue:
+                current = queue.popleft()
+                d = dist[current] + 1
+                for n in neighbors[current]:
+                    if dist[n] == UNREACHABLE:
+                        dist[n] = d
+                        next_hop[n] = current
+                        queue.append(n)
+        table = (dist, next_hop)
+        self._tables[goal_i] = table
+        if len(self._tables) > self.table_cache_size:
+            self._tables.popitem(last=False)
+        return table
+
+    def precompute(self, goals: Optional[Iterable[Cell]] = None):
+        """Dựng trước bảng next-hop cho các đích (mặc định: mọi ô trống, tức bảng all-pairs)."""
+        if goals is None:
+            goals = [(r, c) for r in range(self.rows) for c in range(self.cols) if (r, c) not in self.obstacles]
+        goals = list(goals)
+        with self._lock:
+            self.table_cache_size = max(self.table_cache_size, len(goals))
+            for goal in goals:
+                self._table(goal)
+
+    def next_hop(self, cell: Cell, goal: Cell) -> Optional[Cell]:
+        """Ô kế tiếp trên một đường ngắn nhất từ cell tới goal; None nếu không tới được."""
+        if not self.in_bounds(cell):
+            return None
+        with self._lock:
+            hop = self._table(goal)[1][self._index(cell)]
+        return None if hop == UNREACHABLE else self._cell(hop)
+
+    def distance(self, cell: Cell, goal: Cell) -> int:
+        """Số bước ngắn nhất từ cell tới goal, -1 nếu không tới được."""
+        if not self.in_bounds(cell):
+            return UNREACHABLE
+        with self._lock:
+            return self._table(goal)[0][self._index(cell)]
+
+    def route_from_table(self, start: Cell, goal: Cell) -> List[Cell]:
+        """Lộ trình ngắn nhất bằng cách đi theo bảng next-hop (cùng độ dài với A*, có thể khác thứ tự khi hoà)."""
+        if not self.in_bounds(start):
+            return []
+        current = self._index(start)
+        goal_i = self._index(goal)
+        with self._lock:
+            _, next_hop = self._table(goal)
+            if next_hop[current] == UNREACHABLE:
+                return []
+            path = [current]
+            while current != goal_i:
+                current = next_hop[current]
+                path.append(current)
+        return [self._cell(i) for i in path]
+
+    # Cập nhật vật cản
+    def set_obstacle(self, cell: Cell, blocked: bool = True):
+        """Thêm/bỏ vật cản và chỉ xoá những lộ trình, bảng next-hop có thể bị ảnh hưởng."""
+        with self._lock:
+            self._set_obstacle(cell, blocked)
+
+    def _set_obstacle(self, cell: Cell, blocked: bool):
+        if not self.in_bounds(cell) or (cell in self.obstacles) == blocked:
+            return
+        index = self._index(cell)
+        if blocked:
+            self.obstacles.add(cell)
+        else:
+            self.obstacles.discard(cell)
+        self._update_neighbors(index)
+        for n in self._neighbors[index] if not blocked else self._adjacent_indices(index):
+            self._update_neighbors(n)
+        if blocked:
+            self._on_blocked(cell, index)
+        else:
+            self._on_unblocked(cell, index)
+
+    def _adjacent_indices(self, index: int) -> List[int]:
+        r, c = divmod(index, self.cols)
+        return [(r + dr) * self.cols + c + dc for dr, dc in DIRECTIONS
+                if 0 <= r + dr < self.rows and 0 <= c + dc < self.cols]
+
+    def _on_blocked(self, cell: Cell, index: int):
+        # Lộ trình đi qua ô bị chặn
+        for key in list(self._routes_through.get(cell, ())):
+            self._evict_route(key)
+        # Bảng mà ô này là next-hop của ô khác (hoặc là đích) phải dựng lại; nếu chỉ là lá thì xoá ô đó
+        for goal_i, (dist, next_hop) in list(self._tables.items()):
+            if dist[index] == UNREACHABLE:
+                continue
+            if goal_i == index or any(next_hop[n] == index for n in self._adjacent_indices(index)):
+                del self._tables[goal_i]
+            else:
+                dist[index] = UNREACHABLE
+                next_hop[index] = UNREACHABLE
+
+    def _on_unblocked(self, cell: Cell, index: int):
+        # Lộ trình rỗng (trước không tới được) hoặc có thể ngắn hơn khi đi qua ô vừa mở
+        for key, path in list(self._routes.items()):
+            start, goal = key
+            if not path or len(path) - 1 > (abs(start[0] - cell[0]) + abs(start[1] - cell[1]) +
+                                            abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])):
+                self._evict_route(key)
+        neighbors = self._neighbors[index]
+        for goal_i, (dist, next_hop) in list(self._tables.items()):
+            if goal_i == index:
+                del self._tables[goal_i]  # Đích vừa được mở lại
+                continue
+            reachable = [n for n in neighbors if dist[n] != UNREACHABLE]
+            if len(reachable) != len(neighbors):
+                # Ô mới nối thêm vùng trước đây không tới được
+                if reachable:
+                    del self._tables[goal_i]
+                continue
+            if not reachable:
+                continue
+            best = min(reachable, key=lambda n: dist[n])
+            new_dist = dist[best] + 1
+            if any(dist[n] > new_dist + 1 for n in reachable):
+                del self._tables[goal_i]  # Ô mới tạo đường tắt cho ô khác
+            else:
+                dist[index] = new_dist
+                next_hop[index] = best
+
+
+class OccupancyMap(GridMap):
+    """GridMap có thêm vật cản tạm thời (biển cấm, xe dừng, vật cản siêu âm) tự hết hạn sau ttl giây.
+
+    Vật cản tĩnh ban đầu không bao giờ bị xoá bởi clear_expired.
+    """
+
+    def __init__(self, size: Tuple[int, int], obstacles: Iterable[Cell] = (), **kwargs):
+        super().__init__(size, obstacles, **kwargs)
+        self.static_obstacles = frozenset(self.obstacles)
+        self.dynamic_obstacles: Dict[Cell, float] = {}
+
+    def mark_blocked(self, cell: Cell, ttl: float, now: Optional[float] = None) -> bool:
+        """Đánh dấu ô bị chặn trong ttl giây; trả về True nếu bản đồ thực sự thay đổi."""
+        if not self.in_bounds(cell) or cell in self.static_obstacles:
+            return False
+        now = time.time() if now is None else now
+        with self._lock:
+            changed = cell not in self.obstacles
+            self.dynamic_obstacles[cell] = max(self.dynamic_obstacles.get(cell, 0), now + ttl)
+            if changed:
+                self._set_obstacle(cell, True)
+        return changed
+
+    def clear_expired(self, now: Optional[float] = None) -> List[Cell]:
+        """Bỏ các vật cản tạm thời đã hết hạn; trả về danh sách ô vừa được mở lại."""
+        now = time.time() if now is None else now
+        if not self.dynamic_obstacles:
+            return []
+        with self._lock:
+            expired = [cell for cell, expiry in self.dynamic_obstacles.items() if expiry <= now]
+            for cell in expired:
+                del self.dynamic_obstacles[cell]
+                self._set_obstacle(cell, False)
+        return expired
@@ -0,0 +1,165 @@
+"""Giải mã / mã hoá JPEG cho frame bus và WebSocket.
+
+- Giải mã thu nhỏ theo DCT (1/2, 1/4, 1/8) ngay trong libjpeg, dừng ở kích thước gần nhất không nhỏ hơn đầu vào
+  của model, thay vì giải mã đủ độ phân giải rồi để model resize lại.
+- Dùng simplejpeg hoặc PyTurboJPEG nếu đã cài (nhanh hơn, simplejpeg còn ghi được vào buffer có sẵn), không thì OpenCV.
+  Buffer giải mã chỉ được dùng lại khi không còn thành phần nào giữ frame cũ.
+- Buffer resize khi mã hoá ảnh thu nhỏ được dùng lại giữa các frame.
+Mỗi JpegCodec chỉ nên dùng từ một thread tại một thời điểm (mỗi frame bus / WebSocketHandler một codec).
+"""
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from . import config
+from .log import get_logger
+
+log = get_logger(__name__)
+
+DENOMINATORS = (8, 4, 2, 1)
+OPENCV_REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                        8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(rộng, cao) đọc từ marker SOF của JPEG mà không giải mã ảnh; None nếu không phải JPEG hợp lệ."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        # SOF0..SOF15, trừ DHT (C4), JPG (C8), DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return (data[i + 7] << 8) | data[i + 8], (data[i + 5] << 8) | data[i + 6]
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    return None
+
+
+def choose_denominator(width: int, height: int, target: int) -> int:
+    """Mẫu số thu nhỏ lớn nhất mà cạnh dài sau khi giải mã vẫn >= target."""
+    if target <= 0:
+        return 1
+    for denominator in DENOMINATORS:
+        if max(width, height) // denominator >= target:
+            return denominator
+    return 1
+
+
+def _load_backend(name: str):
+    """Trả về (tên, module / đối tượng thư viện) theo JPEG_BACKEND; "auto" thử lần lượt các thư viện nhanh."""
+    candidates = ("simplejpeg", "turbojpeg") if name == "auto" else (name,)
+    for candidate in candidates:
+        try:
+            if candidate == "simplejpeg":
+                import simplejpeg
+                return candidate, simplejpeg
+            if candidate == "turbojpeg":
+                from turbojpeg import TurboJPEG
+                return candidate, TurboJPEG()
+        except Exception as e:
+            if name != "auto":
+                log.warning("Không dùng được thư viện JPEG %s (%s), dùng OpenCV", candidate, e)
+    if name not in ("auto", "opencv", "simplejpeg", "turbojpeg"):
+        raise ValueError(f"Unknown JPEG backend: {name}")
+    return "opencv", None
+
+
+class JpegCodec:
+    def __init__(self, decode_target: int = config.JPEG_DECODE_TARGET, backend: str = config.JPEG_BACKEND,
+                 pool_size: int = config.JPEG_BUFFER_POOL):
+        self.decode_target = decode_target
+        self.backend, self._lib = _load_backend(backend)
+        self.pool_size = pool_size
+        # shape -> các buffer giải mã dùng lại được
+        self._pools: Dict[Tuple[int, ...], List[np.ndarray]] = {}
+        self._resize_buffers: Dict[Tuple[int, ...], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _fallback(self, e: Exception):
+        log.warning("Thư viện JPEG %s lỗi (%s), chuyển sang OpenCV", self.backend, e)
+        self.backend, self._lib = "opencv", None
+
+    def _buffer(self, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """Buffer giải mã không còn ai giữ; None (thư viện tự cấp phát) nếu mọi buffer trong pool đang được dùng."""
+        if self.pool_size <= 0:
+            return None
+        with self._lock:
+            pool = self._pools.setdefault(shape, [])
+            for i in range(len(pool)):
+                # Chỉ còn tham chiếu của pool (và của chính lời gọi getrefcount): không FramePacket, ảnh đang encode
+                # cho WebSocket hay view nào của buffer còn sống, ghi đè an toàn
+                if sys.getrefcount(pool[i]) <= 2:
+                    return pool[i]
+            if len(pool) < self.pool_size:
+                pool.append(np.empty(shape, dtype=np.uint8))
+                return pool[-1]
+        return None
+
+    def decode(self, jpeg: bytes) -> Tuple[Optional[np.ndarray], int]:
+        """Giải mã sang BGR; trả về (frame, mẫu số thu nhỏ đã dùng). frame là None nếu dữ liệu hỏng."""
+        size = jpeg_size(jpeg)
+        denominator = choose_denominator(*size, self.decode_target) if size else 1
+        if self.backend == "simplejpeg":
+            try:
+                height, width = size[1] if size else 0, size[0] if size else 0
+                # Kích thước sau khi thu nhỏ của libjpeg làm tròn lên
+                shape = (-(-height // denominator), -(-width // denominator), 3)
+                frame = self._lib.decode_jpeg(jpeg, colorspace="BGR", min_height=shape[0], min_width=shape[1],
+                                              buffer=self._buffer(shape) if size else None)
+                return frame, denominator
+            except ValueError:
+                return None, denominator
+            except Exception as e:
+                self._fallback(e)
+        if self.backend == "turbojpeg":
+            try:
+                return self._lib.decode(jpeg, scaling_factor=(1, denominator)), denominator
+            except OSError:
+                return None, denominator
+            except Exception as e:
+                self._fallback(e)
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), OPENCV_REDUCED_FLAGS[denominator])
+        return frame, denominator
+
+    def resize(self, frame: np.ndarray, scale: float) -> np.ndarray:
+        """Thu nhỏ vào buffer dùng lại theo kích thước; kết quả chỉ hợp lệ tới lần resize cùng kích thước kế tiếp."""
+        height, width = frame.shape[:2]
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        shape = (size[1], size[0]) + frame.shape[2:]
+        buffer = self._resize_buffers.get(shape)
+        if buffer is None:
+            buffer = self._resize_buffers[shape] = np.empty(shape, dtype=frame.dtype)
+        return cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame: np.ndarray, quality: int, scale: float = 1.0) -> bytes:
+        if scale < 1.0:
+            frame = self.resize(frame, scale)
+        if self.backend == "simplejpeg":
+            try:
+                return self._lib.encode_jpeg(np.ascontiguousarray(frame), quality=quality, colorspace="BGR")
+            except Exception as e:
+                self._fallback(e)
+        if self.backend == "turbojpeg":
+            try:
+                return self._lib.encode(frame, quality=quality)
+            except Exception as e:
+                self._fallback(e)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.backend,
+            'decode_target': self.decode_target,
+            'pooled_buffers': sum(len(pool) for pool in self._pools.values()),
+            'resize_buffers': len(self._resize_buffers)
+        }
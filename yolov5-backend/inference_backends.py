@@ -0,0 +1,185 @@
+import ast
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+from . import config
+from .model_loader import load_model, warm_up
+from .log import get_logger
+
+log = get_logger(__name__)
+
+
+class InferenceBackend:
+    """Giao diện chung của các backend: infer_batch trả về mỗi frame một mảng (N, 6)
+    [x1, y1, x2, y2, confidence, class_id] theo toạ độ frame gốc."""
+    name = "base"
+    names: List[str] = []
+    conf_threshold = config.YOLO_CONF_THRESHOLD
+    iou_threshold = config.YOLO_IOU_THRESHOLD
+
+    def set_thresholds(self, conf_threshold: float, iou_threshold: float):
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def infer_batch(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        raise NotImplementedError
+
+
+class TorchHubBackend(InferenceBackend):
+    """PyTorch eager qua AutoShape của yolov5 (hành vi mặc định từ trước)."""
+    name = "torch"
+
+    def __init__(self, model_path: str, img_size: int = config.YOLO_IMG_SIZE, threads: int = config.YOLO_THREADS):
+        import torch
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = load_model(model_path)
+        self.img_size = img_size
+        names = self.model.names
+        self.names = [names[i] for i in range(len(names))] if isinstance(names, dict) else list(names)
+
+    def set_thresholds(self, conf_threshold: float, iou_threshold: float):
+        super().set_thresholds(conf_threshold, iou_threshold)
+        self.model.conf = conf_threshold
+        self.model.iou = iou_threshold
+
+    def infer_batch(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        results = self.model(frames, size=self.img_size)
+        return [pred.cpu().numpy() for pred in results.xyxy]
+
+
+def letterbox(frame: np.ndarray, img_size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize giữ tỉ lệ rồi pad (114) thành ảnh vuông img_size như yolov5; trả về ảnh, tỉ lệ và phần pad."""
+    h, w = frame.shape[:2]
+    gain = min(img_size / h, img_size / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (img_size - new_w) // 2, (img_size - new_h) // 2
+    out = np.full((img_size, img_size, 3), 114, dtype=np.uint8)
+    out[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return out, gain, (pad_x, pad_y)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Non-maximum suppression thuần NumPy; trả về chỉ số các box được giữ."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(pred: np.ndarray, conf_threshold: float, iou_threshold: float,
+                gain: float, pad: Tuple[int, int], shape: Tuple[int, int], max_det: int = 300) -> np.ndarray:
+    """Chuyển output thô (N, 5 + nc) [cx, cy, w, h, obj, cls...] của YOLOv5 thành (K, 6) theo toạ độ frame gốc."""
+    pred = pred[pred[:, 4] > conf_threshold]
+    if not len(pred):
+        return np.zeros((0, 6), dtype=np.float32)
+    class_scores = pred[:, 5:] * pred[:, 4:5]
+    class_ids = class_scores.argmax(1)
+    confidences = class_scores[np.arange(len(pred)), class_ids]
+    mask = confidences > conf_threshold
+    pred, class_ids, confidences = pred[mask], class_ids[mask], confidences[mask]
+    boxes = np.empty((len(pred), 4), dtype=np.float32)
+    boxes[:, 0] = pred[:, 0] - pred[:, 2] / 2
+    boxes[:, 1] = pred[:, 1] - pred[:, 3] / 2
+    boxes[:, 2] = pred[:, 0] + pred[:, 2] / 2
+    boxes[:, 3] = pred[:, 1] + pred[:, 3] / 2
+    # NMS theo từng lớp bằng cách dịch box của mỗi lớp ra một vùng riêng
+    keep = nms(boxes + class_ids[:, None] * 4096.0, confidences, iou_threshold)[:max_det]
+    boxes, confidences, class_ids = boxes[keep], confidences[keep], class_ids[keep]
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / gain).clip(0, shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / gain).clip(0, shape[0])
+    return np.concatenate([boxes, confidences[:, None], class_ids[:, None].astype(np.float32)], axis=1)
+
+
+def quantize_onnx_model(model_path: str, output_path: Optional[str] = None) -> str:
+    """Lượng tử hoá động int8 một model ONNX (trọng số Conv/MatMul) và lưu cạnh file gốc."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    output_path = output_path or os.path.splitext(model_path)[0] + ".int8.onnx"
+    if not os.path.isfile(output_path) or os.path.getmtime(output_path) < os.path.getmtime(model_path):
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QUInt8)
+    return output_path
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime trên CPU với tiền xử lý letterbox và NMS tự làm bằng NumPy."""
+    name = "onnxruntime"
+
+    def __init__(self, model_path: str, img_size: int = config.YOLO_IMG_SIZE, threads: int = config.YOLO_THREADS,
+                 names: Optional[Sequence[str]] = None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Model xuất với kích thước cố định thì phải dùng đúng kích thước đó
+        fixed_size = model_input.shape[2]
+        self.img_size = fixed_size if isinstance(fixed_size, int) else img_size
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if names is not None:
+            self.names = list(names)
+        elif "names" in metadata:
+            parsed = ast.literal_eval(metadata["names"])
+            self.names = [parsed[i] for i in range(len(parsed))] if isinstance(parsed, dict) else list(parsed)
+        else:
+            raise ValueError(f"Model ONNX không có metadata 'names': {model_path}")
+
+    def infer_batch(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        prepared = [letterbox(frame, self.img_size) for frame in frames]
+        blob = np.stack([img for img, _, _ in prepared]).transpose(0, 3, 1, 2)
+        blob = np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                      for i in range(len(frames))])
+        return [
+            postprocess(pred, self.conf_threshold, self.iou_threshold, gain, pad, frame.shape[:2])
+            for pred, frame, (_, gain, pad) in zip(outputs, frames, prepared)
+        ]
+
+
+class QuantizedOnnxRuntimeBackend(OnnxRuntimeBackend):
+    """ONNX Runtime với model int8 lượng tử hoá động, tạo tự động từ file .onnx FP32 ở lần chạy đầu."""
+    name = "onnxruntime-int8"
+
+    def __init__(self, model_path: str, **kwargs):
+        super().__init__(quantize_onnx_model(model_path), **kwargs)
+
+
+BACKENDS = {
+    TorchHubBackend.name: TorchHubBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    QuantizedOnnxRuntimeBackend.name: QuantizedOnnxRuntimeBackend,
+}
+
+
+def load_backend(name: str = config.YOLO_BACKEND, model_path: str = config.YOLO_MODEL_PATH,
+                 img_size: int = config.YOLO_IMG_SIZE,
+                 threads: int = config.YOLO_THREADS) -> Tuple[InferenceBackend, float, float]:
+    """Tạo backend theo tên và warm-up; trả về (backend, thời gian nạp, thời gian inference đầu tiên)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name} (chọn một trong {sorted(BACKENDS)})")
+    start = time.perf_counter()
+    backend = BACKENDS[name](model_path, img_size=img_size, threads=threads)
+    load_time = time.perf_counter() - start
+    first_inference_time = warm_up(backend.infer_batch, backend.img_size)
+    log.info("Backend %s (%s, %spx) loaded in %.2f s, first inference %.1f ms", name,
+             os.path.basename(model_path), backend.img_size, load_time, first_inference_time * 1000)
+    return backend, load_time, first_inference_time
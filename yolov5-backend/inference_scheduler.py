@@ -0,0 +1,181 @@
+"""Lập lịch inference cho một luồng camera: bỏ qua frame gần như tĩnh, giữ box giữa hai lần inference bằng
+tracker nhẹ (vận tốc không đổi) và chỉ chạy YOLO trên vùng quan tâm (ROI) của từng nhóm lớp."""
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from . import config
+from .log import get_logger
+from .metrics import metrics
+from .yolo_detection import draw_detections
+
+log = get_logger(__name__)
+
+Roi = Tuple[float, float, float, float]
+# Kích thước ảnh thu nhỏ dùng để so sánh frame: mỗi ô ~40x40 px với ảnh 640x480
+THUMBNAIL_SIZE = (16, 12)
+
+
+def parse_rois(spec: str) -> List[Tuple[Tuple[str, ...], Roi]]:
+    """"Red-light,Green-light=0,0,1,0.55;Car=0.2,0.35,0.8,1" -> [(('Red-light', 'Green-light'), (0, 0, 1, 0.55)), ...]."""
+    rois = []
+    for item in spec.split(";"):
+        if "=" not in item:
+            continue
+        labels, coords = item.split("=", 1)
+        x1, y1, x2, y2 = (min(max(float(v), 0.0), 1.0) for v in coords.split(","))
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"ROI rỗng: {item}")
+        rois.append((tuple(label.strip() for label in labels.split(",") if label.strip()), (x1, y1, x2, y2)))
+    return rois
+
+
+def box_iou(a: Dict, b: Dict) -> float:
+    w = min(a['x2'], b['x2']) - max(a['x1'], b['x1'])
+    h = min(a['y2'], b['y2']) - max(a['y1'], b['y1'])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / ((a['x2'] - a['x1']) * (a['y2'] - a['y1']) + (b['x2'] - b['x1']) * (b['y2'] - b['y1']) - inter)
+
+
+class BoxTracker:
+    """Giữ box giữa hai lần inference: ghép box mới với box cũ cùng nhãn theo IoU, ước lượng vận tốc (px/frame)
+    từ hai lần inference gần nhất rồi dời box theo vận tốc đó trên các frame bị bỏ qua. Box không ghép được
+    (mới xuất hiện) có vận tốc 0, tức giữ nguyên tại chỗ."""
+
+    def __init__(self, iou_threshold: float = 0.3):
+        self.iou_threshold = iou_threshold
+        # (detection lần inference gần nhất, vận tốc dx1, dy1, dx2, dy2 theo px/frame)
+        self.tracks: List[Tuple[Dict, Tuple[float, float, float, float]]] = []
+
+    def update(self, detections: List[Dict], frames_elapsed: int):
+        """frames_elapsed: số frame giữa lần inference trước và lần này."""
+        tracks = []
+        unmatched = list(self.tracks)
+        for det in detections:
+            best, best_iou = None, self.iou_threshold
+            for track in unmatched:
+                if track[0]['label'] == det['label']:
+                    iou = box_iou(track[0], det)
+                    if iou >= best_iou:
+                        best, best_iou = track, iou
+            velocity = (0.0, 0.0, 0.0, 0.0)
+            if best is not None:
+                unmatched.remove(best)
+                n = max(frames_elapsed, 1)
+                velocity = tuple((det[k] - best[0][k]) / n for k in ('x1', 'y1', 'x2', 'y2'))
+            # Giữ bản sao: detections trả về cho caller có thể bị sửa (ví dụ đổi toạ độ về ảnh camera)
+            tracks.append((dict(det), velocity))
+        self.tracks = tracks
+
+    def predict(self, frames_since: int, width: int, height: int) -> List[Dict]:
+        """Box dời theo vận tốc sau frames_since frame, cắt theo khung hình; bỏ box bị đẩy hẳn ra ngoài."""
+        predicted = []
+        for det, (vx1, vy1, vx2, vy2) in self.tracks:
+            box = dict(det)
+            box['x1'] = min(max(det['x1'] + vx1 * frames_since, 0), width)
+            box['y1'] = min(max(det['y1'] + vy1 * frames_since, 0), height)
+            box['x2'] = min(max(det['x2'] + vx2 * frames_since, 0), width)
+            box['y2'] = min(max(det['y2'] + vy2 * frames_since, 0), height)
+            if box['x2'] > box['x1'] and box['y2'] > box['y1']:
+                predicted.append(box)
+        return predicted
+
+
+class InferenceScheduler:
+    """Bọc một detector (cùng giao diện detect(frame) -> (frame đã vẽ, detections)) cho một luồng camera.
+
+    - Cổng so sánh frame: ảnh thu nhỏ (màu) của vùng ROI được so với ảnh của lần inference gần nhất; nếu ô thay
+      đổi nhiều nhất vẫn dưới diff_threshold thì bỏ qua inference, tối đa max_skip frame liên tiếp.
+      Dùng ô lớn nhất thay vì trung bình để một đèn nhỏ đổi màu vẫn kích hoạt inference.
+    - Frame bị bỏ qua dùng box của lần inference gần nhất, dời theo vận tốc ước lượng từ hai lần inference gần
+      nhất (BoxTracker), tối đa max_skip frame. Vật đứng yên giữa hai lần inference thì box giữ nguyên.
+    - ROI: inference trên vùng bao các ROI, detection của một nhóm lớp nằm ngoài ROI của nhóm thì bị loại.
+      Lớp không thuộc nhóm nào chỉ được tìm trong vùng bao đó.
+    Mỗi luồng camera (một frame bus) cần một InferenceScheduler riêng; detector bên trong có thể dùng chung.
+    """
+
+    def __init__(self, detector, max_skip: int = config.INFERENCE_MAX_SKIP,
+                 diff_threshold: float = config.INFERENCE_DIFF_THRESHOLD, rois: str = config.INFERENCE_ROIS):
+        self.detector = detector
+        self.max_skip = max_skip
+        self.diff_threshold = diff_threshold
+        self.rois = parse_rois(rois)
+        self.tracker = BoxTracker()
+        self._last_thumbnail: Optional[np.ndarray] = None
+        self._frames_since_inference = 0
+        self.frames = 0
+        self.inferred = 0
+
+    @property
+    def names(self):
+        return getattr(self.detector, 'names', None)
+
+    def _crop_box(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        if not self.rois:
+            return 0, 0, width, height
+        x1 = min(roi[0] for _, roi in self.rois)
+        y1 = min(roi[1] for _, roi in self.rois)
+        x2 = max(roi[2] for _, roi in self.rois)
+        y2 = max(roi[3] for _, roi in self.rois)
+        return int(x1 * width), int(y1 * height), int(np.ceil(x2 * width)), int(np.ceil(y2 * height))
+
+    def _in_roi(self, det: Dict, width: int, height: int) -> bool:
+        cx = (det['x1'] + det['x2']) / 2 / width
+        cy = (det['y1'] + det['y2']) / 2 / height
+        for labels, (x1, y1, x2, y2) in self.rois:
+            if det['label'] in labels:
+                return x1 <= cx <= x2 and y1 <= cy <= y2
+        return True
+
+    def _should_infer(self, thumbnail: np.ndarray) -> bool:
+        if self._last_thumbnail is None or self._frames_since_inference >= self.max_skip:
+            return True
+        return float(np.abs(thumbnail - self._last_thumbnail).max()) >= self.diff_threshold
+
+    def detect(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = self._crop_box(width, height)
+        region = frame[y1:y2, x1:x2]
+        thumbnail = None
+        if self.max_skip > 0:
+            with metrics.timed("frame_diff"):
+                thumbnail = cv2.resize(region, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+        self.frames += 1
+        if thumbnail is not None and not self._should_infer(thumbnail):
+            self._frames_since_inference += 1
+            metrics.count("inference_skipped")
+            detections = self.tracker.predict(min(self._frames_since_inference, self.max_skip), width, height)
+            return draw_detections(frame, detections), detections
+
+        if not self.rois:
+            frame, detections = self.detector.detect(frame)
+        else:
+            # Detector chạy trên bản sao vùng cắt (ảnh nó vẽ bị bỏ); lọc theo ROI rồi mới vẽ các box được giữ lên
+            # frame gốc, để box bị loại không xuất hiện trên ảnh gửi client
+            _, detections = self.detector.detect(region.copy())
+            for det in detections:
+                det['x1'] += x1
+                det['x2'] += x1
+                det['y1'] += y1
+                det['y2'] += y1
+            detections = [det for det in detections if self._in_roi(det, width, height)]
+            frame = draw_detections(frame, detections)
+
+        self.tracker.update(detections, self._frames_since_inference + 1)
+        self._last_thumbnail = thumbnail
+        self._frames_since_inference = 0
+        self.inferred += 1
+        metrics.mark("inference_fps")
+        return frame, detections
+
+    def stats(self) -> Dict:
+        return {
+            'frames': self.frames,
+            'inferred': self.inferred,
+            'skipped': self.frames - self.inferred,
+            'inference_ratio': self.inferred / self.frames if self.frames else 1.0,
+            'max_skip': self.max_skip,
+            'diff_threshold': self.diff_threshold,
+            'rois': [{'labels': list(labels), 'roi': roi} for labels, roi in self.rois]
+        }
@@ -0,0 +1,305 @@
+"""Chạy YOLO trong tiến trình riêng để inference không tranh GIL với FastAPI và vòng điều khiển.
+
+Frame được chép thẳng vào một vòng slot shared memory cấp phát sẵn (không pickle ảnh); worker đọc frame tại chỗ
+và trả về mảng kết quả gọn (N x 6 float32) qua socket. Worker chết hoặc treo thì được khởi động lại tự động.
+
+Worker là một tiến trình Python độc lập (python -m yolov5-backend.inference_worker ...) thay vì multiprocessing,
+để không import lại main.py (và dựng lại cả fleet) trong tiến trình con.
+"""
+import argparse
+import importlib
+import itertools
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from . import config
+from .log import get_logger
+from .metrics import metrics
+from .yolo_detection import Detections, draw_detections
+
+log = get_logger(__name__)
+
+DEFAULT_FACTORY = f"{__package__}.yolo_detection:YOLODetector"
+# Thư mục chứa package, để worker chạy được bằng python -m <package>.inference_worker
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_frame_size(spec: str) -> Tuple[int, int]:
+    """"1600x1200" -> (1600, 1200) (rộng, cao)."""
+    width, height = spec.lower().split("x")
+    return int(width), int(height)
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[subprocess.Popen] = None
+        self.conn: Optional[Connection] = None
+        self.lock = threading.Lock()
+        # request id -> (future, slot)
+        self.in_flight: Dict[int, Tuple[Future, int]] = {}
+        # False trong lúc worker đang khởi động lại: không phân frame cho nó
+        self.ready = False
+        self.served = 0
+        self.restarts = 0
+
+
+class ProcessDetector:
+    """Cùng API detect() / detect_batch() với YOLODetector nhưng inference chạy trong một nhóm tiến trình worker.
+
+    detect() chép frame vào một slot trống (chờ nếu mọi slot đang bận), gửi (id, slot, shape) cho worker đang ít
+    việc nhất và vẽ box ngay trong tiến trình này khi có kết quả. Mỗi worker có một thread đọc kết quả, đồng thời
+    phát hiện worker chết để khởi động lại; các frame đang chờ trên worker đó nhận RuntimeError.
+    """
+
+    def __init__(self, workers: int = max(config.INFERENCE_WORKERS, 1), slots: int = config.INFERENCE_WORKER_SLOTS,
+                 max_frame: str = config.INFERENCE_WORKER_MAX_FRAME, factory: str = DEFAULT_FACTORY,
+                 nice: int = config.INFERENCE_WORKER_NICE, timeout: float = config.INFERENCE_WORKER_TIMEOUT,
+                 start_timeout: float = 120.0, **detector_kwargs):
+        width, height = parse_frame_size(max_frame)
+        self.slot_bytes = width * height * 3
+        self.slots = max(slots, workers)
+        self.factory = factory
+        self.detector_kwargs = detector_kwargs
+        self.nice = nice
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.names: List[str] = []
+        self._shm = SharedMemory(create=True, size=self.slot_bytes * self.slots)
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+        self._ids = itertools.count()
+        self._closed = False
+        self._workers = [_Worker(i) for i in range(workers)]
+        try:
+            for worker in self._workers:
+                self._spawn(worker)
+        except Exception:
+            self.close()
+            raise
+        for worker in self._workers:
+            threading.Thread(target=self._read_results, args=(worker,), name=f"inference-worker-{worker.index}",
+                             daemon=True).start()
+        log.info("%d inference worker sẵn sàng, %d slot x %.1f MiB shared memory", workers, self.slots,
+                 self.slot_bytes / 2 ** 20)
+
+    def _spawn(self, worker: _Worker):
+        parent_sock, child_sock = socket.socketpair()
+        cmd = [sys.executable, "-m", f"{__package__}.inference_worker", "--fd", str(child_sock.fileno()),
+               "--shm", self._shm.name, "--slot-bytes", str(self.slot_bytes), "--factory", self.factory,
+               "--kwargs", json.dumps(self.detector_kwargs), "--nice", str(self.nice)]
+        try:
+            process = subprocess.Popen(cmd, pass_fds=(child_sock.fileno(),), cwd=PACKAGE_PARENT)
+        finally:
+            child_sock.close()
+        conn = Connection(parent_sock.detach())
+        try:
+            # Worker gửi danh sách lớp sau khi nạp xong model
+            if not conn.poll(self.start_timeout):
+                raise RuntimeError(f"Inference worker {worker.index} không khởi động sau {self.start_timeout} s")
+            _, names = conn.recv()
+        except Exception:
+            conn.close()
+            process.kill()
+            process.wait()
+            raise
+        self.names = names
+        with worker.lock:
+            worker.process, worker.conn = process, conn
+            worker.ready = True
+        log.info("Inference worker %d chạy (pid %d)", worker.index, process.pid)
+
+    def _read_results(self, worker: _Worker):
+        while not self._closed:
+            try:
+                req_id, data, error = worker.conn.recv()
+            except (EOFError, OSError):
+                if self._closed:
+                    return
+                self._restart(worker)
+                continue
+            with worker.lock:
+                entry = worker.in_flight.pop(req_id, None)
+            if entry is None:
+                # Kết quả của frame đã bị huỷ (slot đã được trả lại khi khởi động lại)
+                continue
+            future, slot = entry
+            self._free_slots.put(slot)
+            worker.served += 1
+            if error is None:
+                future.set_result(Detections(data, self.names))
+            else:
+                future.set_exception(RuntimeError(f"Inference worker {worker.index}: {error}"))
+
+    def _restart(self, worker: _Worker):
+        with worker.lock:
+            worker.ready = False
+            pending, worker.in_flight = worker.in_flight, {}
+            worker.conn.close()
+        if worker.process.poll() is None:
+            worker.process.kill()
+        log.error("Inference worker %d thoát (mã %s), %d frame bị huỷ, khởi động lại", worker.index,
+                  worker.process.wait(), len(pending))
+        # Thu hồi slot của các frame đang chờ trên worker chết để các lời gọi khác không bị chặn
+        for future, slot in pending.values():
+            self._free_slots.put(slot)
+            future.set_exception(RuntimeError(f"Inference worker {worker.index} bị crash"))
+        worker.restarts += 1
+        metrics.count("inference_worker_restarts")
+        while not self._closed:
+            try:
+                self._spawn(worker)
+                return
+            except Exception as e:
+                log.error("Không khởi động lại được inference worker %d: %s", worker.index, e)
+                time.sleep(1)
+
+    def _submit(self, frame: np.ndarray) -> Tuple[Future, _Worker]:
+        if frame.dtype != np.uint8 or frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} không vừa slot {self.slot_bytes} byte, "
+                             f"tăng INFERENCE_WORKER_MAX_FRAME")
+        ready = [w for w in self._workers if w.ready]
+        if not ready:
+            raise RuntimeError("Không có inference worker nào sẵn sàng (đang khởi động lại)")
+        # Chờ khi mọi slot đang bận: giới hạn số frame xếp hàng thay vì để hàng đợi phình ra. Slot của worker chết
+        # được trả lại khi nó khởi động lại; quá timeout thì báo lỗi thay vì treo mọi thread gọi detect()
+        try:
+            slot = self._free_slots.get(timeout=self.timeout)
+        except queue.Empty:
+            metrics.count("inference_worker_slot_timeouts")
+            raise RuntimeError(f"Không có slot shared memory trống sau {self.timeout} s")
+        try:
+            view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+            view[...] = frame
+            del view
+        except Exception:
+            self._free_slots.put(slot)
+            raise
+        future: Future = Future()
+        worker = min(ready, key=lambda w: len(w.in_flight))
+        req_id = next(self._ids)
+        with worker.lock:
+            worker.in_flight[req_id] = (future, slot)
+            try:
+                worker.conn.send((req_id, slot, frame.shape))
+            except (OSError, ValueError) as e:
+                # Worker vừa chết; thread đọc kết quả sẽ khởi động lại nó
+                worker.in_flight.pop(req_id)
+                self._free_slots.put(slot)
+                future.set_exception(RuntimeError(f"Inference worker {worker.index} không nhận frame: {e}"))
+        return future, worker
+
+    def _result(self, future: Future, worker: _Worker) -> Detections:
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            log.error("Inference worker %d không trả kết quả sau %s s, khởi động lại", worker.index, self.timeout)
+            # Thread đọc kết quả thấy kết nối đóng và khởi động lại worker
+            worker.process.kill()
+            raise RuntimeError(f"Inference worker {worker.index} bị treo")
+
+    def infer_batch(self, frames: List[np.ndarray]) -> List[Detections]:
+        """Các frame được phân cho nhiều worker và chạy song song."""
+        pending = [self._submit(frame) for frame in frames]
+        return [self._result(future, worker) for future, worker in pending]
+
+    def infer(self, frame: np.ndarray) -> Detections:
+        return self.infer_batch([frame])[0]
+
+    def detect(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[Tuple[np.ndarray, List[Dict]]]:
+        outputs = []
+        with metrics.timed("detect"):
+            results = self.infer_batch(frames)
+        for frame, detections in zip(frames, results):
+            log.debug("Phát hiện: %s", detections.labels, extra={'stage': 'detect'})
+            with metrics.timed("draw"):
+                frame = draw_detections(frame, detections)
+            outputs.append((frame, detections.to_dicts()))
+        return outputs
+
+    def stats(self) -> Dict:
+        return {
+            'workers': [{'pid': w.process.pid if w.process else None, 'ready': w.ready, 'served': w.served,
+                         'in_flight': len(w.in_flight), 'restarts': w.restarts} for w in self._workers],
+            'slots': self.slots,
+            'free_slots': self._free_slots.qsize()
+        }
+
+    def close(self):
+        self._closed = True
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            with worker.lock:
+                try:
+                    worker.conn.send(None)
+                except (OSError, ValueError):
+                    pass
+            try:
+                worker.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+                worker.process.wait()
+            worker.conn.close()
+        self._shm.close()
+        self._shm.unlink()
+
+
+def serve(fd: int, shm_name: str, slot_bytes: int, factory: str, detector_kwargs: Dict, nice: int):
+    """Vòng lặp của tiến trình worker: nạp detector, rồi nhận (id, slot, shape), trả (id, mảng kết quả, lỗi)."""
+    conn = Connection(fd)
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    shm = SharedMemory(shm_name)
+    # Tiến trình cha sở hữu vùng nhớ; bỏ đăng ký để resource tracker của worker không xoá nó khi worker thoát
+    resource_tracker.unregister(shm._name, "shared_memory")
+    module_name, attr = factory.split(":")
+    detector = getattr(importlib.import_module(module_name), attr)(**detector_kwargs)
+    try:
+        conn.send(("ready", list(detector.names)))
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            req_id, slot, shape = message
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            try:
+                conn.send((req_id, np.ascontiguousarray(detector.infer(frame).data, dtype=np.float32), None))
+            except Exception as e:
+                conn.send((req_id, None, repr(e)))
+            del frame
+    except (EOFError, BrokenPipeError):
+        # Tiến trình cha đã đóng kết nối (thoát hoặc close())
+        pass
+    shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiến trình inference worker, được ProcessDetector khởi động")
+    parser.add_argument("--fd", type=int, required=True)
+    parser.add_argument("--shm", required=True)
+    parser.add_argument("--slot-bytes", type=int, required=True)
+    parser.add_argument("--factory", default=DEFAULT_FACTORY)
+    parser.add_argument("--kwargs", default="{}")
+    parser.add_argument("--nice", type=int, default=0)
+    args = parser.parse_args()
+    serve(args.fd, args.shm, args.slot_bytes, args.factory, json.loads(args.kwargs), args.nice)
+
+
+if __name__ == "__main__":
+    main()
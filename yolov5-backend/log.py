@@ -0,0 +1,155 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from . import config
+
+ROOT_LOGGER = "pbl5"
+# Các trường có cấu trúc truyền qua extra=..., ví dụ log.debug("...", extra={'frame': seq, 'stage': 'detect'})
+STRUCTURED_FIELDS = ("frame", "stage", "latency_ms", "client", "command")
+
+
+class RateLimitFilter(logging.Filter):
+    """Mỗi message (theo logger + template) chỉ được ghi `burst` lần trong mỗi `interval` giây.
+
+    Bản ghi có extra={'sample': N} chỉ giữ 1/N. Số bản ghi bị bỏ được ghi kèm ở lần ghi kế tiếp.
+    Template là chuỗi trước khi format, nên phải log theo kiểu log.info("x=%s", x) thay vì f-string.
+    """
+
+    def __init__(self, interval: float = config.LOG_RATE_INTERVAL, burst: int = config.LOG_RATE_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        # key -> [bắt đầu cửa sổ, số bản ghi đã cho qua, số bản ghi đã bỏ, tổng số lần gọi]
+        self._windows: Dict[Tuple[str, str], List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None:
+                state = self._windows[key] = [now, 0, 0, 0]
+            state[3] += 1
+            sample = getattr(record, 'sample', 1)
+            if sample > 1 and (state[3] - 1) % sample:
+                state[2] += 1
+                return False
+            if self.interval > 0:
+                if now - state[0] >= self.interval:
+                    state[0], state[1] = now, 0
+                if state[1] >= self.burst:
+                    state[2] += 1
+                    return False
+                state[1] += 1
+            record.suppressed, state[2] = state[2], 0
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Định dạng "text" (dòng log + key=value) hoặc "json" (một object JSON mỗi dòng)."""
+
+    def __init__(self, style: str = config.LOG_FORMAT):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.json = style == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {name: getattr(record, name) for name in STRUCTURED_FIELDS if hasattr(record, name)}
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            fields['suppressed'] = suppressed
+        if self.json:
+            entry = {'ts': record.created, 'level': record.levelname, 'logger': record.name,
+                     'msg': record.getMessage(), **fields}
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = super().format(record)
+        if fields:
+            line += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler với hàng đợi giới hạn: thread gọi log không bao giờ chờ I/O; hàng đợi đầy thì bỏ bản ghi.
+
+    Việc format được dời sang thread ghi log (QueueListener) thay vì làm ngay trong thread gọi.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """"frame_bus=DEBUG,websocket_handler=WARNING" -> {'frame_bus': 'DEBUG', 'websocket_handler': 'WARNING'}."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            module, level = item.split("=", 1)
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level: str = config.LOG_LEVEL, module_levels: str = config.LOG_MODULE_LEVELS,
+                  stream=None, queue_size: int = config.LOG_QUEUE_SIZE,
+                  rate_filter: Optional[logging.Filter] = None) -> NonBlockingQueueHandler:
+    """Gắn handler hàng đợi + thread ghi log cho logger gốc "pbl5". Gọi lại sẽ thay cấu hình cũ."""
+    global _listener, _handler
+    with _setup_lock:
+        root = logging.getLogger(ROOT_LOGGER)
+        if _listener is not None:
+            _listener.stop()
+            root.removeHandler(_handler)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(StructuredFormatter())
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        _handler = NonBlockingQueueHandler(log_queue)
+        _handler.addFilter(rate_filter or RateLimitFilter())
+        _listener = logging.handlers.QueueListener(log_queue, output)
+        _listener.start()
+        root.addHandler(_handler)
+        root.setLevel(level.upper())
+        root.propagate = False
+        for module, module_level in parse_module_levels(module_levels).items():
+            logging.getLogger(f"{ROOT_LOGGER}.{module}").setLevel(module_level)
+        return _handler
+
+
+def flush_logging():
+    """Dừng thread ghi log sau khi đã ghi hết hàng đợi (gọi khi thoát)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(module_name: str) -> logging.Logger:
+    """Logger theo module, ví dụ get_logger(__name__) trong frame_bus.py -> "pbl5.frame_bus"."""
+    if _handler is None:
+        setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{module_name.rsplit('.', 1)[-1]}")
+
+
+atexit.register(flush_logging)
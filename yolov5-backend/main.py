@@ -1,13 +1,24 @@
 from fastapi import FastAPI, WebSocket, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import asyncio
-import threading
-from typing import Dict, List, Tuple
+import json
+from typing import Dict, List, Union
 from pydantic import BaseModel
-from .robot_control import RobotController
+from . import config
 from .yolo_detection import YOLODetector
+from .inference_worker import ProcessDetector
 from .websocket_handler import WebSocketHandler
+from .fleet import FleetManager, Robot, parse_fleet
+from .robot_control import FINAL_ROUTE_STATUSES, grid_map
+from .metrics import metrics
+from .esp32_interface import command_stats, get_default_client
+from .log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_ROBOT_ID = "default"
 
 app = FastAPI()
 
@@ -21,61 +32,183 @@ app.add_middleware(
 )
 
 # Khởi tạo các thành phần
-yolo_detector = YOLODetector()
-robot_controller = RobotController(yolo_detector)
-navigation_complete = asyncio.Event()
-websocket_handler = WebSocketHandler(yolo_detector, navigation_complete, robot_controller)  # Truyền robot_controller
+# INFERENCE_WORKERS > 0: YOLO chạy trong các tiến trình riêng, không tranh GIL với request và vòng điều khiển
+yolo_detector = ProcessDetector() if config.INFERENCE_WORKERS > 0 else YOLODetector()
+# Mọi xe dùng chung một model; frame của các xe được gộp batch trong một lượt inference
+fleet = FleetManager(yolo_detector)
+# Xe mặc định dùng client chung của esp32_interface (ESP32_BASE_URL), phục vụ các route cũ /start-navigation, /ws
+default_robot = fleet.register(DEFAULT_ROBOT_ID, client=get_default_client(), grid=grid_map)
+for robot_id, base_url in parse_fleet(config.FLEET_ROBOTS):
+    fleet.register(robot_id, base_url)
+# Giữ tên cũ cho xe mặc định
+frame_bus = default_robot.frame_bus
+robot_controller = default_robot.controller
+websocket_handler = default_robot.websocket_handler
+# Task stream_video của từng xe
+stream_tasks: Dict[str, asyncio.Task] = {}
 
-# Chạy robot_controller trong một thread riêng
-robot_thread = None
+# Các nguồn thống kê kèm theo trong /stats
+metrics.register_collector('frame_bus', lambda: {'frames_published': frame_bus.frames_published,
+                                                 'inference_calls': frame_bus.inference_calls})
+metrics.register_collector('control_loop', lambda: robot_controller.scheduler.stats()
+                           if robot_controller.scheduler else None)
+metrics.register_collector('commands', command_stats)
+metrics.register_collector('websocket_clients', lambda: websocket_handler.client_stats())
+metrics.register_collector('fleet', fleet.stats)
+metrics.register_collector('inference', default_robot.detector.stats)
 
 class NavigationRequest(BaseModel):
     start: List[int]
     end: List[int]
 
-@app.post("/start-navigation")
-async def start_navigation(request: NavigationRequest) -> Dict:
-    global robot_thread
+class RobotRegistration(BaseModel):
+    id: str
+    base_url: str
+
+def get_robot(robot_id: str) -> Robot:
+    try:
+        return fleet.get(robot_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Không có robot {robot_id}")
+
+async def navigate(robot: Robot, request: NavigationRequest, stream: bool) -> Union[Dict, StreamingResponse]:
     start = tuple(request.start)
     end = tuple(request.end)
 
-    if not (0 <= start[0] < 5 and 0 <= start[1] < 7):
+    if len(start) != 2 or not robot.controller.grid_map.in_bounds(start):
         raise HTTPException(status_code=400, detail="Vị trí đầu không hợp lệ!")
-    if not (0 <= end[0] < 5 and 0 <= end[1] < 7):
+    if len(end) != 2 or not robot.controller.grid_map.in_bounds(end):
         raise HTTPException(status_code=400, detail="Vị trí đích không hợp lệ!")
+    grid = robot.controller.grid_map
+    if not grid.is_free(start):
+        raise HTTPException(status_code=400, detail="Vị trí đầu là vật cản!")
+    if not grid.is_free(end):
+        raise HTTPException(status_code=400, detail="Vị trí đích là vật cản!")
+    # Kiểm tra trước khi dừng lượt điều hướng đang chạy; lộ trình được cache nên start_navigation không tính lại
+    grid.clear_expired()
+    if not grid.route(start, end):
+        raise HTTPException(status_code=409, detail="Không có đường đi tới đích!")
+
+    if robot.thread and robot.thread.is_alive():
+        # Vòng điều khiển thoát khi stop; join ngoài event loop để không chặn các request khác
+        await asyncio.to_thread(robot.stop_navigation)
 
-    if robot_thread and robot_thread.is_alive():
-        robot_controller.stop_navigation()
-        robot_thread.join(timeout=2)
-        navigation_complete.set()
+    if not stream:
+        path = robot.start_navigation(start, end)
+        return {'path': path, 'status': 'navigation_started'}
 
-    path = robot_controller.start_navigation(start, end)
+    # Listener được gọi từ thread điều khiển, chuyển cập nhật về event loop qua queue
+    loop = asyncio.get_running_loop()
+    updates: asyncio.Queue = asyncio.Queue()
+    listener = lambda update: loop.call_soon_threadsafe(updates.put_nowait, update)
+    robot.controller.route_listeners.append(listener)
+    robot.start_navigation(start, end)
 
-    robot_thread = threading.Thread(target=robot_controller.run, daemon=True)
-    robot_thread.start()
+    async def route_updates():
+        try:
+            while True:
+                update = await updates.get()
+                yield json.dumps(update) + "\n"
+                if update['status'] in FINAL_ROUTE_STATUSES:
+                    break
+        finally:
+            robot.controller.route_listeners.remove(listener)
 
-    return {'path': path, 'status': 'navigation_started'}
+    return StreamingResponse(route_updates(), media_type="application/x-ndjson")
+
+@app.post("/start-navigation", response_model=None)
+async def start_navigation(request: NavigationRequest, stream: bool = False) -> Union[Dict, StreamingResponse]:
+    """Bắt đầu điều hướng. Với ?stream=true trả về NDJSON: lộ trình ban đầu rồi mỗi lần replan,
+    kết thúc bằng trạng thái arrived/stopped/no_route/failed."""
+    return await navigate(default_robot, request, stream)
 
 @app.post("/stop-navigation")
 async def stop_navigation() -> Dict:
     robot_controller.stop_navigation()
     return {"status": "stopped"}
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket_handler.connect(websocket)
+@app.get("/robots")
+async def list_robots() -> Dict:
+    return fleet.stats()
+
+@app.post("/robots")
+async def register_robot(registration: RobotRegistration) -> Dict:
+    """Thêm một xe theo địa chỉ ESP32, ví dụ {"id": "car2", "base_url": "http://192.168.1.21"}."""
+    try:
+        robot = await asyncio.to_thread(fleet.register, registration.id, registration.base_url)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    stream_tasks[robot.id] = asyncio.create_task(robot.websocket_handler.stream_video())
+    return robot.stats()
+
+@app.delete("/robots/{robot_id}")
+async def unregister_robot(robot_id: str) -> Dict:
+    if robot_id == DEFAULT_ROBOT_ID:
+        raise HTTPException(status_code=400, detail="Không thể gỡ robot mặc định")
+    get_robot(robot_id)
+    task = stream_tasks.pop(robot_id, None)
+    if task:
+        task.cancel()
+    await asyncio.to_thread(fleet.unregister, robot_id)
+    return {"status": "removed", "id": robot_id}
+
+@app.post("/robots/{robot_id}/start-navigation", response_model=None)
+async def start_robot_navigation(robot_id: str, request: NavigationRequest,
+                                 stream: bool = False) -> Union[Dict, StreamingResponse]:
+    return await navigate(get_robot(robot_id), request, stream)
+
+@app.post("/robots/{robot_id}/stop-navigation")
+async def stop_robot_navigation(robot_id: str) -> Dict:
+    get_robot(robot_id).controller.stop_navigation()
+    return {"status": "stopped"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint() -> PlainTextResponse:
+    """Độ trễ từng stage, bộ đếm và FPS theo định dạng text của Prometheus."""
+    return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+async def stats() -> Dict:
+    """Cùng số liệu với /metrics dạng JSON, kèm thống kê kênh lệnh, vòng điều khiển và client WebSocket."""
+    return metrics.snapshot()
+
+async def serve_websocket(handler: WebSocketHandler, websocket: WebSocket):
+    # Tuỳ chọn qua query string, ví dụ /ws?protocol=binary&quality=60&scale=0.5
+    try:
+        await handler.connect(websocket)
+    except ValueError:
+        return
     try:
         while True:
-            # Giữ kết nối WebSocket mở
-            await websocket.receive_text()
+            # Giữ kết nối WebSocket mở, đồng thời nhận tuỳ chọn stream client gửi lên
+            message = await websocket.receive_text()
+            handler.handle_message(websocket, message)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        log.info("WebSocket closed: %s", e, extra={'client': websocket.client})
     finally:
-        websocket_handler.disconnect(websocket)
+        handler.disconnect(websocket)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await serve_websocket(websocket_handler, websocket)
+
+@app.websocket("/robots/{robot_id}/ws")
+async def robot_websocket_endpoint(websocket: WebSocket, robot_id: str):
+    if robot_id not in fleet.robots:
+        await websocket.close(code=1008, reason=f"Không có robot {robot_id}")
+        return
+    await serve_websocket(fleet.get(robot_id).websocket_handler, websocket)
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(websocket_handler.stream_video())
+    # Frame bus của các xe đã chạy từ lúc đăng ký; ở đây chỉ cần task stream video trên event loop của app
+    for robot_id, robot in fleet.robots.items():
+        stream_tasks[robot_id] = asyncio.create_task(robot.websocket_handler.stream_video())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if isinstance(yolo_detector, ProcessDetector):
+        yolo_detector.close()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
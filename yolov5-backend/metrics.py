@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional
+from . import config
+
+# Tiền tố tên metric khi xuất theo định dạng Prometheus
+PREFIX = "pbl5"
+QUANTILES = (0.5, 0.95, 0.99)
+# nullcontext dùng lại được, tránh tạo object mới mỗi lần gọi khi metrics bị tắt
+_NULL_TIMER = nullcontext()
+
+
+class StageStats:
+    """Độ trễ của một stage: cửa sổ trượt các mẫu gần nhất để tính p50/p95/p99, cộng tổng count/sum."""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        # deque.append là thao tác nguyên tử với GIL, không cần khoá trên đường nóng
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> Dict[float, float]:
+        samples = sorted(self.samples)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+
+class RateMeter:
+    """Đếm sự kiện và tính tốc độ (sự kiện/giây) trong cửa sổ thời gian gần nhất, ví dụ FPS."""
+
+    def __init__(self, window: float, max_events: int = 4096):
+        self.window = window
+        self.events = deque(maxlen=max_events)
+        self.count = 0
+
+    def mark(self, now: Optional[float] = None):
+        self.events.append(time.monotonic() if now is None else now)
+        self.count += 1
+
+    def rate(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        recent = [t for t in list(self.events) if now - t <= self.window]
+        if len(recent) < 2 or recent[-1] <= recent[0]:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0])
+
+
+class _Timer:
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats: StageStats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """Nơi gom độ trễ theo stage, bộ đếm (frame bỏ, lỗi, ...) và FPS của pipeline nhận diện - điều khiển.
+
+    Khi enabled=False mọi hook đều là no-op để chi phí gần như bằng 0.
+    """
+
+    def __init__(self, enabled: bool = config.METRICS_ENABLED, window: int = config.METRICS_WINDOW,
+                 rate_window: float = config.METRICS_RATE_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.rate_window = rate_window
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.meters: Dict[str, RateMeter] = {}
+        # Các nguồn thống kê khác (kênh lệnh, scheduler, client WebSocket) được gọi khi xuất /stats
+        self.collectors: Dict[str, Callable[[], object]] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats(self.window))
+        return stats
+
+    def timed(self, stage: str):
+        """Context manager đo thời gian một stage: `with metrics.timed("detect"): ...`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._stage(stage))
+
+    def observe(self, stage: str, seconds: float):
+        if self.enabled:
+            self._stage(stage).observe(seconds)
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def mark(self, meter: str):
+        """Ghi một sự kiện cho bộ đo tốc độ (ví dụ một frame đã publish)."""
+        if not self.enabled:
+            return
+        rate_meter = self.meters.get(meter)
+        if rate_meter is None:
+            with self._lock:
+                rate_meter = self.meters.setdefault(meter, RateMeter(self.rate_window))
+        rate_meter.mark()
+
+    def register_collector(self, name: str, collector: Callable[[], object]):
+        self.collectors[name] = collector
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.meters.clear()
+
+    def snapshot(self) -> Dict:
+        """Toàn bộ số liệu dạng dict cho route JSON /stats."""
+        stages = {}
+        for name, stats in list(self.stages.items()):
+            quantiles = stats.quantiles()
+            stages[name] = {
+                'count': stats.count,
+                'mean_ms': stats.total / stats.count * 1000 if stats.count else 0.0,
+                **{f"p{int(q * 100)}_ms": value * 1000 for q, value in quantiles.items()}
+            }
+        collected = {}
+        for name, collector in list(self.collectors.items()):
+            try:
+                collected[name] = collector()
+            except Exception as e:
+                collected[name] = {'error': str(e)}
+        return {
+            'enabled': self.enabled,
+            'stages': stages,
+            'counters': dict(self.counters),
+            'rates': {name: meter.rate() for name, meter in list(self.meters.items())},
+            **collected
+        }
+
+    def prometheus(self) -> str:
+        """Xuất theo định dạng text của Prometheus cho route /metrics."""
+        lines: List[str] = [
+            f"# HELP {PREFIX}_stage_latency_seconds Latency of each pipeline stage over the recent window",
+            f"# TYPE {PREFIX}_stage_latency_seconds summary"
+        ]
+        for name, stats in sorted(self.stages.items()):
+            for q, value in stats.quantiles().items():
+                lines.append(f'{PREFIX}_stage_latency_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_sum{{stage="{name}"}} {stats.total:.6f}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_count{{stage="{name}"}} {stats.count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+        meters = sorted(self.meters.items())
+        lines.append(f"# TYPE {PREFIX}_rate_per_second gauge")
+        lines.extend(f'{PREFIX}_rate_per_second{{meter="{name}"}} {meter.rate():.3f}' for name, meter in meters)
+        lines.append(f"# TYPE {PREFIX}_events_total counter")
+        lines.extend(f'{PREFIX}_events_total{{meter="{name}"}} {meter.count}' for name, meter in meters)
+        return "\n".join(lines) + "\n"
+
+
+# Registry dùng chung cho cả tiến trình
+metrics = MetricsRegistry()
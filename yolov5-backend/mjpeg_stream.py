@@ -0,0 +1,128 @@
+import asyncio
+from typing import Optional
+import httpx
+from .log import get_logger
+
+log = get_logger(__name__)
+
+SOI = b"\xff\xd8"  # Start Of Image của JPEG
+EOI = b"\xff\xd9"  # End Of Image của JPEG
+
+
+class MJPEGParser:
+    """Tách các ảnh JPEG từ luồng multipart/x-mixed-replace theo từng chunk nhận được.
+
+    Dò marker SOI/EOI nên không phụ thuộc chuỗi boundary của firmware. Buffer được dùng lại giữa các
+    chunk và không quét lại phần đã quét. Nếu một chunk chứa nhiều ảnh, chỉ ảnh mới nhất được giữ.
+    """
+
+    def __init__(self, max_buffer: int = 2 * 1024 * 1024):
+        self.max_buffer = max_buffer
+        self._buffer = bytearray()
+        self._start = -1
+        self._scan = 0
+        self.frames_parsed = 0
+        self.frames_dropped = 0
+
+    def feed(self, chunk: bytes) -> Optional[bytes]:
+        buf = self._buffer
+        buf += chunk
+        newest = None
+        while True:
+            if self._start < 0:
+                start = buf.find(SOI, self._scan)
+                if start < 0:
+                    # Giữ lại byte cuối phòng trường hợp marker bị cắt giữa hai chunk
+                    self._scan = max(0, len(buf) - 1)
+                    break
+                self._start = start
+                self._scan = start + 2
+            end = buf.find(EOI, self._scan)
+            if end < 0:
+                self._scan = max(self._start + 2, len(buf) - 1)
+                break
+            if newest is not None:
+                self.frames_dropped += 1
+            newest = bytes(buf[self._start:end + 2])
+            self.frames_parsed += 1
+            self._start = -1
+            self._scan = end + 2
+
+        # Dồn buffer về đầu, bỏ phần đã xử lý
+        keep_from = self._scan if self._start < 0 else self._start
+        if keep_from:
+            del buf[:keep_from]
+            self._scan -= keep_from
+            if self._start >= 0:
+                self._start = 0
+        if len(buf) > self.max_buffer:
+            log.warning("MJPEG buffer overflow, resetting parser")
+            self.reset()
+        return newest
+
+    def reset(self):
+        self._buffer.clear()
+        self._start = -1
+        self._scan = 0
+
+
+class MJPEGStream:
+    """Giữ một kết nối MJPEG tới ESP32-CAM và luôn giữ ảnh JPEG mới nhất; ảnh cũ chưa ai lấy sẽ bị bỏ."""
+
+    def __init__(self, session: httpx.AsyncClient, url: str, reconnect_delay: float = 1.0):
+        self.session = session
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.parser = MJPEGParser()
+        self.latest_jpeg: Optional[bytes] = None
+        self.frame_id = 0
+        self.frames_skipped = 0
+        self._last_taken = 0
+        self._new_frame: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._new_frame = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.session.stream("GET", self.url, timeout=5.0) as response:
+                    if response.status_code != 200:
+                        raise RuntimeError(f"status code {response.status_code}")
+                    self.parser.reset()
+                    async for chunk in response.aiter_raw():
+                        jpeg = self.parser.feed(chunk)
+                        if jpeg is not None:
+                            self.latest_jpeg = jpeg
+                            self.frame_id += 1
+                            self._new_frame.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("MJPEG stream error: %s, reconnecting...", e)
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def next_jpeg(self, timeout: float) -> Optional[bytes]:
+        """Trả về ảnh JPEG mới nhất chưa được lấy, chờ tối đa timeout giây; None nếu stream bị đứng."""
+        self.start()
+        if self.frame_id == self._last_taken:
+            self._new_frame.clear()
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.frames_skipped += max(0, self.frame_id - self._last_taken - 1)
+        self._last_taken = self.frame_id
+        return self.latest_jpeg
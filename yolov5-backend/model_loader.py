@@ -0,0 +1,51 @@
+import os
+import time
+from typing import Callable, List
+import numpy as np
+from . import config
+from .log import get_logger
+
+log = get_logger(__name__)
+
+HUB_REPO = 'ultralytics/yolov5'
+
+
+def resolve_repo_dir(repo_dir: str = config.YOLOV5_REPO_DIR) -> str:
+    """Tìm mã nguồn yolov5 trên máy: YOLOV5_REPO_DIR, hoặc bản torch.hub đã tải trước đó. Trả về '' nếu không có."""
+    import torch
+    if repo_dir:
+        if not os.path.isfile(os.path.join(repo_dir, 'hubconf.py')):
+            raise FileNotFoundError(f"YOLOV5_REPO_DIR không chứa hubconf.py: {repo_dir}")
+        return repo_dir
+    cached = os.path.join(torch.hub.get_dir(), HUB_REPO.replace('/', '_') + '_master')
+    if os.path.isfile(os.path.join(cached, 'hubconf.py')):
+        return cached
+    return ''
+
+
+def load_model(model_path: str = config.YOLO_MODEL_PATH, repo_dir: str = config.YOLOV5_REPO_DIR):
+    """Nạp model YOLOv5 (.pt, .torchscript, .onnx) từ mã nguồn yolov5 cục bộ, không cần mạng.
+
+    Chỉ khi chưa có bản yolov5 nào trên máy mới tải từ GitHub (một lần, không force_reload).
+    """
+    import torch
+    if not os.path.isfile(model_path):
+        raise FileNotFoundError(f"Không tìm thấy model: {model_path} (đặt YOLO_MODEL_PATH)")
+    local_repo = resolve_repo_dir(repo_dir)
+    if local_repo:
+        return torch.hub.load(local_repo, 'custom', path=model_path, source='local')
+    log.info("Không có bản yolov5 cục bộ, tải %s vào cache của torch.hub", HUB_REPO)
+    return torch.hub.load(HUB_REPO, 'custom', path=model_path, trust_repo=True)
+
+
+def warm_up(infer_batch: Callable[[List[np.ndarray]], object], img_size: int = config.YOLO_IMG_SIZE,
+            runs: int = config.YOLO_WARMUP_RUNS) -> float:
+    """Chạy inference trên ảnh đen để khởi tạo kernel/bộ nhớ; trả về thời gian lần chạy đầu (giây)."""
+    dummy = np.zeros((img_size, img_size, 3), dtype=np.uint8)
+    first_inference_time = 0.0
+    for i in range(runs):
+        start = time.perf_counter()
+        infer_batch([dummy])
+        if i == 0:
+            first_inference_time = time.perf_counter() - start
+    return first_inference_time
@@ -0,0 +1,60 @@
+"""Biên dịch lộ trình A* (danh sách ô) thành kế hoạch chuyển động theo đoạn.
+
+Mỗi đoạn là một lệnh ESP32 với thời lượng tính trước: đi thẳng qua nhiều ô liền nhau ("B") hoặc quay tại chỗ
+("R" / "L", 90 hay 180 độ), thay vì một lệnh cho mỗi ô. Hướng xe được tính bằng bảng tra thay vì các chuỗi if/elif.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+Cell = Tuple[int, int]
+
+# Các hướng theo chiều kim đồng hồ: quay phải 90 độ = +1
+HEADINGS = ("backward", "right", "up", "left")
+HEADING_INDEX = {heading: i for i, heading in enumerate(HEADINGS)}
+# (dx, dy) của một bước sang ô kề -> hướng đi
+STEP_HEADINGS = {(1, 0): "backward", (0, 1): "right", (-1, 0): "up", (0, -1): "left"}
+# Số lần quay phải 90 độ (mod 4) -> (lệnh, số góc 90 độ); quay đầu dùng hai lần quay phải
+TURNS = {1: ("R", 1), 2: ("R", 2), 3: ("L", 1)}
+
+
+@dataclass(frozen=True)
+class Segment:
+    """Một lệnh của kế hoạch: đi thẳng qua `cells` hoặc quay tại chỗ (cells rỗng), hướng xe sau đoạn là heading."""
+    command: str
+    heading: str
+    cells: Tuple[Cell, ...]
+    duration: float
+
+    @property
+    def cell_time(self) -> float:
+        return self.duration / len(self.cells) if self.cells else 0.0
+
+
+def step_heading(current: Cell, target: Cell) -> Optional[str]:
+    """Hướng đi từ ô current sang ô kề target; None nếu hai ô không kề nhau."""
+    return STEP_HEADINGS.get((target[0] - current[0], target[1] - current[1]))
+
+
+def turn_between(current: str, target: str) -> Optional[Tuple[str, int]]:
+    """(lệnh quay, số góc 90 độ) để đổi hướng từ current sang target; None nếu đã đúng hướng."""
+    return TURNS.get((HEADING_INDEX[target] - HEADING_INDEX[current]) % 4)
+
+
+def compile_plan(path: Sequence[Cell], heading: str, cell_time: float, turn_time: float) -> List[Segment]:
+    """Gộp các bước cùng hướng của path (bắt đầu từ ô hiện tại, xe đang quay về heading) thành các đoạn."""
+    plan: List[Segment] = []
+    for current, target in zip(path, path[1:]):
+        direction = step_heading(current, target)
+        if direction is None:
+            raise ValueError(f"Lộ trình không liền mạch: {current} -> {target}")
+        turn = turn_between(heading, direction)
+        if turn is not None:
+            command, quarters = turn
+            plan.append(Segment(command, direction, (), quarters * turn_time))
+            heading = direction
+        if plan and plan[-1].command == "B":
+            last = plan[-1]
+            plan[-1] = Segment("B", heading, last.cells + (target,), last.duration + cell_time)
+        else:
+            plan.append(Segment("B", heading, (target,), cell_time))
+    return plan
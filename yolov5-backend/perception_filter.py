@@ -0,0 +1,122 @@
+"""Lọc kết quả nhận diện theo thời gian trước khi tới RobotController: confidence trung bình mỗi lớp trên cửa sổ
+trượt, hysteresis cho đèn giao thông / biển cấm / xe phía trước, làm mượt chiều cao box xe và khoảng cách siêu âm.
+Trạng thái chỉ đổi khi đã được xác nhận qua nhiều frame, nên một frame nhận diện chập chờn không làm xe dừng / chạy."""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from . import config
+from .log import get_logger
+from .metrics import metrics
+
+log = get_logger(__name__)
+
+
+class SlidingConfidence:
+    """Tổng confidence của mỗi lớp trong `window` frame gần nhất: ring buffer + tổng chạy, O(1) mỗi lớp mỗi frame."""
+
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self._buffers: Dict[str, List[float]] = {}
+        self._sums: Dict[str, float] = {}
+        self._index = 0
+
+    def update(self, confidences: Dict[str, float]):
+        """Thêm một frame; confidences là confidence lớn nhất của mỗi lớp trong frame (lớp vắng = 0)."""
+        for label in confidences:
+            if label not in self._buffers:
+                self._buffers[label] = [0.0] * self.window
+                self._sums[label] = 0.0
+        i = self._index
+        for label, buffer in self._buffers.items():
+            value = confidences.get(label, 0.0)
+            self._sums[label] += value - buffer[i]
+            buffer[i] = value
+        self._index = (i + 1) % self.window
+
+    def score(self, label: str) -> float:
+        return max(self._sums.get(label, 0.0), 0.0) / self.window
+
+
+@dataclass(frozen=True)
+class PerceptionState:
+    light: str = "green"
+    no_entry: bool = False
+    car_ahead: bool = False
+    # Chiều cao box xe đã làm mượt (px), None khi không có xe
+    car_height: Optional[float] = None
+    # Khoảng cách siêu âm đã làm mượt (cm), -1 khi chưa có số đo hợp lệ
+    distance: float = -1
+
+
+class PerceptionFilter:
+    """Gộp các frame liên tiếp thành một PerceptionState ổn định.
+
+    Đèn: chuyển sang đỏ khi điểm Red-light >= on_threshold; chỉ về xanh khi điểm Green-light >= on_threshold và
+    điểm Red-light < off_threshold (giữ hành vi cũ: đỏ kéo dài tới khi thấy đèn xanh).
+    Biển cấm và xe phía trước: bật ở on_threshold, tắt dưới off_threshold.
+    """
+
+    def __init__(self, window: int = config.PERCEPTION_WINDOW, on_threshold: float = config.PERCEPTION_ON_THRESHOLD,
+                 off_threshold: float = config.PERCEPTION_OFF_THRESHOLD,
+                 smoothing: float = config.PERCEPTION_SMOOTHING,
+                 distance_hold: int = config.PERCEPTION_DISTANCE_HOLD):
+        self.confidence = SlidingConfidence(window)
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.smoothing = smoothing
+        self.distance_hold = distance_hold
+        # Số frame liên tiếp không có số đo siêu âm hợp lệ
+        self._distance_misses = 0
+        self.state = PerceptionState()
+        self.state_changes = 0
+
+    def _smooth(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None or previous < 0 else previous + self.smoothing * (value - previous)
+
+    def _hysteresis(self, active: bool, label: str) -> bool:
+        score = self.confidence.score(label)
+        return score >= self.off_threshold if active else score >= self.on_threshold
+
+    def update(self, detections: List[Dict], ultrasonic_distance: float) -> PerceptionState:
+        confidences: Dict[str, float] = {}
+        car_height = None
+        for det in detections:
+            label = det['label']
+            confidences[label] = max(confidences.get(label, 0.0), det.get('confidence', 1.0))
+            if label == 'Car':
+                # Xe gần nhất (box cao nhất) quyết định tốc độ
+                car_height = max(car_height or 0.0, det['y2'] - det['y1'])
+        self.confidence.update(confidences)
+
+        old = self.state
+        light = old.light
+        if self.confidence.score('Red-light') >= self.on_threshold:
+            light = "red"
+        elif light == "red" and self.confidence.score('Green-light') >= self.on_threshold and \
+                self.confidence.score('Red-light') < self.off_threshold:
+            light = "green"
+        car_ahead = self._hysteresis(old.car_ahead, 'Car')
+        if not car_ahead:
+            smoothed_height = None
+        elif car_height is None:
+            # Xe vẫn được coi là còn đó nhưng frame này không thấy: giữ giá trị cũ
+            smoothed_height = old.car_height
+        else:
+            smoothed_height = self._smooth(old.car_height, car_height)
+        if ultrasonic_distance >= 0:
+            self._distance_misses = 0
+            distance = self._smooth(old.distance, ultrasonic_distance)
+        else:
+            # -1 là không có gì trong tầm đo: chỉ giữ số đo cũ qua vài frame lỗi lẻ tẻ
+            self._distance_misses += 1
+            distance = old.distance if self._distance_misses <= self.distance_hold else -1
+
+        self.state = PerceptionState(light, self._hysteresis(old.no_entry, 'No-entry'), car_ahead, smoothed_height,
+                                     distance)
+        changed = [name for name in ('light', 'no_entry', 'car_ahead')
+                   if getattr(old, name) != getattr(self.state, name)]
+        if changed:
+            self.state_changes += 1
+            metrics.count("perception_state_changes")
+            log.info("Trạng thái nhận diện đổi: %s",
+                     ", ".join(f"{name}={getattr(self.state, name)}" for name in changed))
+        return self.state
@@ -0,0 +1,149 @@
+"""Ghi lại một lượt chạy (ảnh JPEG, siêu âm, lệnh điều khiển kèm thời điểm) và đọc lại để phát lại qua simulator.
+
+Định dạng thư mục:
+    frames.bin      các ảnh JPEG nối liền nhau, đọc bằng memory map
+    frames.idx      mỗi ảnh một bản ghi FRAME_DTYPE (thời điểm, offset, độ dài)
+    ultrasonic.idx  mỗi lần đọc một bản ghi ULTRASONIC_DTYPE (thời điểm, khoảng cách)
+    commands.jsonl  mỗi lệnh một dòng {"t": ..., "cmd": ...}
+
+Ghi từ ESP32 thật:  python -m yolov5-backend.recording record --out runs/lap1 --duration 60
+Xem thông tin:      python -m yolov5-backend.recording info runs/lap1
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+
+FRAME_DTYPE = np.dtype([('t', '<f8'), ('offset', '<u8'), ('length', '<u4')])
+ULTRASONIC_DTYPE = np.dtype([('t', '<f8'), ('distance', '<f4')])
+
+
+class Recorder:
+    """Ghi nối tiếp vào thư mục recording; an toàn khi gọi từ nhiều thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._frames = open(os.path.join(path, "frames.bin"), "ab")
+        self._frame_index = open(os.path.join(path, "frames.idx"), "ab")
+        self._ultrasonic = open(os.path.join(path, "ultrasonic.idx"), "ab")
+        self._commands = open(os.path.join(path, "commands.jsonl"), "a", encoding="utf-8")
+        self._offset = self._frames.tell()
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def record_frame(self, jpeg: bytes, t: Optional[float] = None):
+        t = time.time() if t is None else t
+        with self._lock:
+            entry = np.array([(t, self._offset, len(jpeg))], dtype=FRAME_DTYPE)
+            self._frames.write(jpeg)
+            self._frame_index.write(entry.tobytes())
+            self._offset += len(jpeg)
+            self.frames += 1
+
+    def record_ultrasonic(self, distance: float, t: Optional[float] = None):
+        entry = np.array([(time.time() if t is None else t, distance)], dtype=ULTRASONIC_DTYPE)
+        with self._lock:
+            self._ultrasonic.write(entry.tobytes())
+
+    def record_command(self, cmd: str, t: Optional[float] = None):
+        with self._lock:
+            self._commands.write(json.dumps({'t': time.time() if t is None else t, 'cmd': cmd}) + "\n")
+
+    def flush(self):
+        with self._lock:
+            for f in (self._frames, self._frame_index, self._ultrasonic, self._commands):
+                f.flush()
+
+    def close(self):
+        with self._lock:
+            for f in (self._frames, self._frame_index, self._ultrasonic, self._commands):
+                f.close()
+
+
+class Recording:
+    """Đọc một thư mục recording. Ảnh được cắt thẳng từ memory map, không nạp cả file vào RAM."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = np.fromfile(os.path.join(path, "frames.idx"), dtype=FRAME_DTYPE)
+        if len(self.index) == 0:
+            raise ValueError(f"Recording không có frame nào: {path}")
+        self._data = np.memmap(os.path.join(path, "frames.bin"), dtype=np.uint8, mode="r")
+        ultrasonic_path = os.path.join(path, "ultrasonic.idx")
+        self.ultrasonic = np.fromfile(ultrasonic_path, dtype=ULTRASONIC_DTYPE) \
+            if os.path.exists(ultrasonic_path) else np.zeros(0, dtype=ULTRASONIC_DTYPE)
+        self.commands: List[Tuple[float, str]] = []
+        commands_path = os.path.join(path, "commands.jsonl")
+        if os.path.exists(commands_path):
+            with open(commands_path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            self.commands = [(entry['t'], entry['cmd']) for entry in entries]
+        self.start_time = float(self.index['t'][0])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def duration(self) -> float:
+        return float(self.index['t'][-1]) - self.start_time
+
+    def frame_jpeg(self, i: int) -> bytes:
+        entry = self.index[i]
+        offset = int(entry['offset'])
+        return self._data[offset:offset + int(entry['length'])].tobytes()
+
+    def frame_index_at(self, elapsed: float) -> int:
+        """Ảnh mới nhất đã có tại thời điểm `elapsed` giây kể từ đầu recording."""
+        i = int(np.searchsorted(self.index['t'], self.start_time + elapsed, side='right')) - 1
+        return min(max(i, 0), len(self.index) - 1)
+
+    def ultrasonic_at(self, elapsed: float) -> float:
+        if len(self.ultrasonic) == 0:
+            return -1
+        i = int(np.searchsorted(self.ultrasonic['t'], self.start_time + elapsed, side='right')) - 1
+        return float(self.ultrasonic['distance'][max(i, 0)])
+
+
+def record(out: str, duration: float, base_url: Optional[str] = None):
+    """Lấy frame + siêu âm liên tục từ ESP32 và ghi lại trong `duration` giây."""
+    from .esp32_interface import ESP32SyncClient
+    recorder = Recorder(out)
+    client = ESP32SyncClient(recorder=recorder, **({'base_url': base_url} if base_url else {}))
+    deadline = time.time() + duration
+    try:
+        while time.time() < deadline:
+            client.fetch_frame_and_distance()
+    finally:
+        client.close()
+        recorder.close()
+    return recorder.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="action", required=True)
+    record_parser = sub.add_parser("record")
+    record_parser.add_argument("--out", required=True)
+    record_parser.add_argument("--duration", type=float, default=60.0)
+    record_parser.add_argument("--base-url", default=None)
+    info_parser = sub.add_parser("info")
+    info_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.action == "record":
+        frames = record(args.out, args.duration, args.base_url)
+        print(f"Đã ghi {frames} frame vào {args.out}")
+        return
+    recording = Recording(args.path)
+    sizes = recording.index['length']
+    print(f"{args.path}: {len(recording)} frame trong {recording.duration:.1f} s "
+          f"({len(recording) / max(recording.duration, 1e-9):.1f} fps), JPEG trung bình {sizes.mean() / 1024:.1f} KiB, "
+          f"{len(recording.ultrasonic)} lần đọc siêu âm, {len(recording.commands)} lệnh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+from heapq import heappush, heappop
+from typing import Dict, Iterable, List, Tuple
+from .grid_map import Cell, DIRECTIONS, GridMap
+
+INF = float('inf')
+Key = Tuple[float, float]
+
+
+class DStarLite:
+    """Tìm đường tăng dần D* Lite (Koenig & Likhachev) trên GridMap.
+
+    Tìm ngược từ goal nên khi robot di chuyển (move_to) hoặc vài ô thay đổi (update_cells) chỉ những
+    đỉnh bị ảnh hưởng được tính lại, thay vì chạy lại A* từ đầu. Bên trong dùng chỉ số phẳng của GridMap.
+    """
+
+    def __init__(self, grid: GridMap, start: Cell, goal: Cell):
+        self.grid = grid
+        self.cols = grid.cols
+        size = grid.rows * grid.cols
+        self.start = start
+        self.goal = goal
+        self._start_i = start[0] * self.cols + start[1]
+        self._goal_i = goal[0] * self.cols + goal[1]
+        self._last = start
+        self.km = 0.0
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self.rhs[self._goal_i] = 0.0
+        self._queue: List[Tuple[float, float, int]] = []
+        self._queued: Dict[int, Key] = {}
+        self.expansions = 0
+        self._push(self._goal_i, self._key(self._goal_i))
+        self.compute_shortest_path()
+
+    def _key(self, index: int) -> Key:
+        best = min(self.g[index], self.rhs[index])
+        r, c = divmod(index, self.cols)
+        return (best + abs(r - self.start[0]) + abs(c - self.start[1]) + self.km, best)
+
+    def _push(self, index: int, key: Key):
+        self._queued[index] = key
+        heappush(self._queue, (key[0], key[1], index))
+
+    def _top(self):
+        # Bỏ các phần tử cũ (lazy deletion)
+        queue = self._queue
+        queued = self._queued
+        while queue:
+            k1, k2, index = queue[0]
+            if queued.get(index) == (k1, k2):
+                return (k1, k2), index
+            heappop(queue)
+        return (INF, INF), None
+
+    def _update_vertex(self, index: int):
+        g = self.g
+        if index != self._goal_i:
+            self.rhs[index] = min([g[n] for n in self.grid.adjacency[index]], default=INF) + 1
+        self._queued.pop(index, None)
+        if g[index] != self.rhs[index]:
+            self._push(index, self._key(index))
+
+    def compute_shortest_path(self):
+        g, rhs = self.g, self.rhs
+        adjacency = self.grid.adjacency
+        start_i = self._start_i
+        while True:
+            top_key, index = self._top()
+            if index is None:
+                break
+            if top_key >= self._key(start_i) and rhs[start_i] == g[start_i]:
+                break
+            self.expansions += 1
+            new_key = self._key(index)
+            if top_key < new_key:
+                self._push(index, new_key)
+                continue
+            heappop(self._queue)
+            del self._queued[index]
+            if g[index] > rhs[index]:
+                g[index] = rhs[index]
+                for n in adjacency[index]:
+                    self._update_vertex(n)
+            else:
+                g[index] = INF
+                self._update_vertex(index)
+                for n in adjacency[index]:
+                    self._update_vertex(n)
+
+    def move_to(self, cell: Cell):
+        """Cập nhật vị trí robot; không cần tính lại gì cho tới lần update_cells/path tiếp theo."""
+        self.km += abs(self._last[0] - cell[0]) + abs(self._last[1] - cell[1])
+        self._last = cell
+        self.start = cell
+        self._start_i = cell[0] * self.cols + cell[1]
+
+    def update_cells(self, cells: Iterable[Cell]):
+        """Gọi sau khi các ô trong cells đổi trạng thái vật cản trên grid."""
+        rows, cols = self.grid.rows, self.cols
+        for r, c in cells:
+            self._update_vertex(r * cols + c)
+            # Ô vừa bị chặn không còn trong adjacency nên phải duyệt mọi ô kề theo toạ độ
+            for dr, dc in DIRECTIONS:
+                if 0 <= r + dr < rows and 0 <= c + dc < cols:
+                    self._update_vertex((r + dr) * cols + c + dc)
+        self.compute_shortest_path()
+
+    def path(self) -> List[Cell]:
+        """Lộ trình hiện tại từ start tới goal; rỗng nếu không còn đường."""
+        g = self.g
+        if g[self._start_i] == INF or not self.grid.is_free(self.goal):
+            return []
+        adjacency = self.grid.adjacency
+        current = self._start_i
+        path = [current]
+        limit = len(g)
+        while current != self._goal_i and len(path) <= limit:
+            current = min(adjacency[current], key=g.__getitem__)
+            path.append(current)
+        if current != self._goal_i:
+            return []
+        return [divmod(i, self.cols) for i in path]
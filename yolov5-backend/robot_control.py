@@ -1,10 +1,19 @@
-from heapq import heappush, heappop
 import time
 import threading
-from typing import List, Tuple, Optional
-from .esp32_interface import control_robot, get_ultrasonic_distance, get_image_from_esp32
+from typing import Callable, Dict, List, Tuple, Optional
+from . import config
+from .esp32_interface import control_robot
 from .yolo_detection import YOLODetector
-import cv2
+from .frame_bus import FrameBus, FramePacket
+from .grid_map import OccupancyMap
+from .motion_plan import Segment, compile_plan
+from .perception_filter import PerceptionFilter, PerceptionState
+from .replanner import DStarLite
+from .scheduler import ControlScheduler
+from .metrics import metrics
+from .log import get_logger
+
+log = get_logger(__name__)
 
 # Cấu hình
 GRID_SIZE = (5, 7)
@@ -19,10 +28,17 @@ MAX_SPEED_CM_PER_SEC = 100
 CELL_SIZE_CM = 8
 TURN_90_DEGREE_TIME = 1
 MOVE_TIME = 0.008
+# Trạng thái cập nhật lộ trình kết thúc một lần điều hướng
+FINAL_ROUTE_STATUSES = ("arrived", "stopped", "no_route", "failed")
+# Bản đồ dùng chung: cache lộ trình và bảng next-hop giữ qua các lần /start-navigation,
+# cộng thêm vật cản tạm thời do YOLO / siêu âm phát hiện
+grid_map = OccupancyMap(GRID_SIZE, obstacles)
 
 class RobotController:
-    def __init__(self, yolo_detector: YOLODetector):
+    def __init__(self, yolo_detector: YOLODetector, frame_bus: FrameBus, grid: Optional[OccupancyMap] = None,
+                 control: Optional[Callable[[str, int], bool]] = None):
         self.current_speed = 120
+        self.last_speed_change = 0.0
         self.current_direction = "backward"
         self.current_position: Optional[Tuple[int, int]] = None
         self.goal_position: Optional[Tuple[int, int]] = None
@@ -33,267 +49,361 @@ class RobotController:
         self.stop_event = threading.Event()
         self.navigation_complete = threading.Event()
         self.traffic_light_state = "green"
+        # Trạng thái đèn / biển cấm / xe phía trước được xác nhận qua nhiều frame
+        self.perception = PerceptionFilter()
         self.yolo_detector = yolo_detector
+        self.frame_bus = frame_bus
+        self.grid_map = grid or grid_map
+        # Hàm gửi lệnh tới ESP32 của robot này (mặc định: client dùng chung của esp32_interface)
+        self.control_robot = control or control_robot
+        self.last_frame_seq = 0
+        self.replanner: Optional[DStarLite] = None
+        # Callback nhận các cập nhật lộ trình (bắt đầu, replan, kết thúc), gọi từ thread điều khiển
+        self.route_listeners: List[Callable[[Dict], None]] = []
+        self.last_command: Optional[str] = None
+        self.last_speed: Optional[int] = None
+        self.scheduler: Optional[ControlScheduler] = None
+        # Kế hoạch chuyển động của phần lộ trình còn lại: mỗi đoạn một lệnh ESP32
+        self.plan: List[Segment] = []
+        self.segment_index = 0
+        # Thời gian đã chạy của đoạn hiện tại (chỉ cộng khi xe được phép chạy) và số ô của đoạn đã đi qua
+        self.segment_progress = 0.0
+        self.cells_done = 0
+        # Tiến độ mà tại đó xe tới ô kế tiếp hoặc hết đoạn; follow_plan chỉ cần chạy khi vượt mốc này
+        self.next_event_progress = 0.0
+        self.last_tick: Optional[float] = None
 
     def manhattan_distance(self, pos1: Tuple[int, int], pos2: Tuple[int, int]) -> int:
         return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
     def a_star(self, start: Tuple[int, int], goal: Tuple[int, int]) -> List[Tuple[int, int]]:
-        if start in obstacles or goal in obstacles:
-            return []
-        open_set = []
-        heappush(open_set, (0, start))
-        came_from = {}
-        g_score = {start: 0}
-        f_score = {start: self.manhattan_distance(start, goal)}
-        while open_set:
-            _, current = heappop(open_set)
-            if current == goal:
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.append(start)
-                return path[::-1]
-            directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-            for dx, dy in directions:
-                next_pos = (current[0] + dx, current[1] + dy)
-                if (0 <= next_pos[0] < GRID_SIZE[0] and 0 <= next_pos[1] < GRID_SIZE[1] and
-                    next_pos not in obstacles):
-                    tentative_g_score = g_score[current] + 1
-                    if next_pos not in g_score or tentative_g_score < g_score[next_pos]:
-                        came_from[next_pos] = current
-                        g_score[next_pos] = tentative_g_score
-                        f_score[next_pos] = tentative_g_score + self.manhattan_distance(next_pos, goal)
-                        heappush(open_set, (f_score[next_pos], next_pos))
-        return []
-
-    def get_next_direction(self, current_pos: Tuple[int, int], next_pos: Tuple[int, int], current_dir: str) -> str:
-        dx = next_pos[0] - current_pos[0]
-        dy = next_pos[1] - current_pos[1]
-        if dx == 1 and dy == 0:
-            target_direction = "backward"
-        elif dx == -1 and dy == 0:
-            target_direction = "up"
-        elif dx == 0 and dy == 1:
-            target_direction = "right"
-        elif dx == 0 and dy == -1:
-            target_direction = "left"
-        else:
-            target_direction = current_dir
-        if current_dir == target_direction:
-            return "B"
-        if current_dir == "backward":
-            if target_direction == "right":
-                return "R"
-            elif target_direction == "left":
-                return "L"
-            elif target_direction == "up":
-                return "R"
-        if current_dir == "right":
-            if target_direction == "backward":
-                return "L"
-            elif target_direction == "up":
-                return "R"
-            elif target_direction == "left":
-                return "L"
-        if current_dir == "left":
-            if target_direction == "backward":
-                return "R"
-            elif target_direction == "up":
-                return "L"
-            elif target_direction == "right":
-                return "R"
-        if current_dir == "up":
-            if target_direction == "right":
-                return "L"
-            elif target_direction == "left":
-                return "R"
-            elif target_direction == "backward":
-                return "R"
-        return "B"
+        return self.grid_map.route(start, goal)
 
     def calculate_time_to_travel_cell(self) -> float:
-        if self.current_speed == 120:
-            return MOVE_TIME
-        return 0.01 * 120 / self.current_speed
+        # CELL_MIN_TRAVEL_TIME là thời gian đi một ô ở tốc độ chuẩn 120 (nhịp time.sleep(0.5) cũ của vòng lặp);
+        # tốc độ khác thì thời gian tỉ lệ nghịch với tốc độ
+        return max(MOVE_TIME, config.CELL_MIN_TRAVEL_TIME * 120 / self.current_speed)
+
+    def ramp_speed(self, delta: int) -> bool:
+        """Đổi tốc độ một nấc (giới hạn 80-140), tối đa một lần mỗi SPEED_RAMP_INTERVAL giây.
 
-    def turn_90_degrees(self, turn_direction: str):
-        print(f"Turning {turn_direction} for 90 degrees...")
-        control_robot(turn_direction, self.current_speed)
-        time.sleep(TURN_90_DEGREE_TIME)
-        control_robot("S", self.current_speed)
-        print(f"Finished turning {turn_direction}")
+        Trả về True nếu tốc độ thực sự đổi.
+        """
+        now = time.monotonic()
+        if now - self.last_speed_change < config.SPEED_RAMP_INTERVAL:
+            return False
+        speed = min(140, max(80, self.current_speed + delta))
+        if speed == self.current_speed:
+            return False
+        self.current_speed = speed
+        self.last_speed_change = now
+        return True
+
+    def current_segment(self) -> Optional[Segment]:
+        return self.plan[self.segment_index] if self.segment_index < len(self.plan) else None
+
+    def compile_motion_plan(self):
+        """Biên dịch phần lộ trình còn lại (từ ô hiện tại, theo hướng hiện tại) thành các đoạn chuyển động."""
+        previous = self.current_segment()
+        self.plan = compile_plan(self.path[self.path_index - 1:], self.current_direction,
+                                 self.calculate_time_to_travel_cell(), TURN_90_DEGREE_TIME)
+        self.segment_index = 0
+        if previous is not None and self.plan and self.plan[0].command == previous.command:
+            # Đang quay, hoặc đang đi giữa hai ô theo cùng hướng: giữ phần đã chạy (đổi sang cell_time của
+            # kế hoạch mới nếu tốc độ đã đổi)
+            self.segment_progress -= self.cells_done * previous.cell_time
+            if previous.cells:
+                self.segment_progress *= self.plan[0].cell_time / previous.cell_time
+        else:
+            self.segment_progress = 0.0
+        self.cells_done = 0
+        self.next_event_progress = 0.0
+        log.info("Kế hoạch chuyển động: %s", [(seg.command, len(seg.cells), seg.duration) for seg in self.plan])
 
     def start_navigation(self, start: Tuple[int, int], goal: Tuple[int, int]):
         self.current_position = start
         self.goal_position = goal
         self.current_direction = "backward"
+        # Gỡ vật cản đã hết hạn trước khi tìm đường để lộ trình đầu không vòng qua chúng
+        self.grid_map.clear_expired()
         self.path = self.a_star(start, goal)
-        self.path_index = 0
+        if not self.path:
+            # Đầu / đích là vật cản hoặc không có đường đi: không chạy vòng điều khiển
+            log.warning("Không có lộ trình từ %s tới %s", start, goal)
+            self.robot_running = False
+            self.plan = []
+            self.replanner = None
+            self.navigation_complete.set()
+            self.publish_route("no_route")
+            return self.path
+        # path_index trỏ tới ô kế tiếp, ô hiện tại là path[path_index - 1]
+        self.path_index = 1
         self.last_intersection_time = time.time()
         self.robot_running = True
         self.stop_event.clear()
         self.navigation_complete.clear()
-        print("Lộ trình A*:", self.path)
+        self.last_command = None
+        self.last_speed = None
+        self.plan = []
+        self.last_tick = None
+        self.compile_motion_plan()
+        use_dstar = self.grid_map.rows * self.grid_map.cols >= config.REPLAN_DSTAR_MIN_CELLS
+        self.replanner = DStarLite(self.grid_map, start, goal) if self.path and use_dstar else None
+        log.info("Lộ trình A*: %s", self.path)
+        self.publish_route("navigation_started")
         return self.path
 
     def stop_navigation(self):
         self.robot_running = False
         self.navigation_complete.set()
         self.stop_event.set()
-        control_robot("S", self.current_speed)
+        # Đánh thức vòng điều khiển đang chờ frame để nó thoát ngay
+        self.frame_bus.interrupt()
+        self.control_robot("S", self.current_speed)
+        self.publish_route("stopped")
 
-    def run(self):
-        while True:
-            if self.stop_event.is_set() or not self.robot_running:
-                print("Robot dừng hoặc không chạy")
-                time.sleep(1)
-                continue
-            try:
-                ultrasonic_distance = get_ultrasonic_distance()
-                frame = get_image_from_esp32()
-                if frame is None:
-                    print("Error: Could not decode frame.")
-                    time.sleep(2)
-                    continue
-
-                frame, detections = self.yolo_detector.detect(frame)
-                labels = [det['label'] for det in detections]
-                print("Phát hiện:", labels)
+    def publish_route(self, status: str):
+        update = {'status': status, 'path': list(self.path), 'position': self.current_position}
+        for listener in list(self.route_listeners):
+            listener(update)
 
-                command = "B"
-                command_sent = False
-
-                if 'Red-light' in labels:
-                    self.traffic_light_state = "red"
-                    command = "S"
-                    control_robot(command, self.current_speed)
-                    command_sent = True
-                    print("Dừng do đèn đỏ")
-                elif 'Green-light' in labels:
-                    self.traffic_light_state = "green"
-                elif self.traffic_light_state == "red":
-                    command = "S"
-                    control_robot(command, self.current_speed)
-                    command_sent = True
-                    print("Dừng do trạng thái đèn đỏ trước đó")
-
-                if not command_sent and 'No-entry' in labels:
-                    command = "S"
-                    control_robot(command, self.current_speed)
-                    command_sent = True
-                    print("Dừng do biển cấm")
-
-                if not command_sent:
-                    car_detected = False
-                    for det in detections:
-                        if det['label'] == 'Car':
-                            car_detected = True
-                            x1, y1, x2, y2 = det['x1'], det['y1'], det['x2'], det['y2']
-                            bbox_height = y2 - y1
-                            print(f"Phát hiện xe, bbox height: {bbox_height}")
-
-                            if ultrasonic_distance >= 0 and ultrasonic_distance < 10:
-                                if bbox_height > 300:
-                                    command = "S"
-                                    print(f"Xe quá gần (bbox height: {bbox_height}, siêu âm: {ultrasonic_distance} cm), dừng lại")
-                                elif bbox_height > 200:
-                                    self.current_speed = max(80, self.current_speed - 20)
-                                    command = "B"
-                                    print(f"Xe gần (bbox height: {bbox_height}, siêu âm: {ultrasonic_distance} cm), giảm tốc xuống {self.current_speed}")
-                                else:
-                                    command = "B"
-                            else:
-                                if bbox_height > 300:
-                                    command = "S"
-                                    print(f"Xe quá gần (bbox height: {bbox_height}), dừng lại")
-                                elif bbox_height > 200:
-                                    self.current_speed = max(80, self.current_speed - 20)
-                                    command = "B"
-                                    print(f"Xe gần (bbox_height: {bbox_height}), giảm tốc xuống {self.current_speed}")
-                                elif bbox_height < 100:
-                                    self.current_speed = min(140, self.current_speed + 20)
-                                    command = "B"
-                                    print(f"Xe xa (bbox height: {bbox_height}), tăng tốc lên {self.current_speed}")
-                            break
-
-                    if not car_detected and ultrasonic_distance >= 0 and ultrasonic_distance < 10:
-                        self.current_speed = max(80, self.current_speed - 20)
+    def next_cell(self) -> Optional[Tuple[int, int]]:
+        index = max(self.path_index, 1)
+        return self.path[index] if index < len(self.path) else None
+
+    def replan(self, changed_cells: List[Tuple[int, int]]):
+        """Sửa lộ trình từ vị trí hiện tại sau khi bản đồ thay đổi (D* Lite trên bản đồ lớn, A* trên bản đồ nhỏ)."""
+        if not self.path or self.current_position is None:
+            return
+        if self.replanner is not None:
+            self.replanner.move_to(self.current_position)
+            self.replanner.update_cells(changed_cells)
+            new_path = self.replanner.path()
+        else:
+            # Bản đồ nhỏ: A* đầy đủ nhanh hơn D* Lite
+            new_path = self.a_star(self.current_position, self.goal_position)
+        if not new_path:
+            # Không có đường vòng: giữ lộ trình cũ và chờ vật cản hết hạn
+            log.info("Không có đường vòng từ %s, chờ vật cản được gỡ", self.current_position)
+            return
+        remaining = self.path[max(self.path_index, 1) - 1:]
+        if new_path == remaining:
+            return
+        # path_index trỏ tới ô kế tiếp, ô hiện tại là path[path_index - 1]
+        self.path = new_path
+        self.path_index = 1
+        log.info("Replan từ %s: %s", self.current_position, self.path)
+        self.compile_motion_plan()
+        self.publish_route("replanned")
+
+    def update_occupancy(self, state: PerceptionState) -> bool:
+        """Đánh dấu ô phía trước bị chặn theo biển cấm, xe dừng hoặc siêu âm rồi replan nếu cần.
+
+        Trả về True nếu ô kế tiếp trên lộ trình vẫn bị chặn (không có đường vòng).
+        """
+        changed = self.grid_map.clear_expired()
+        ahead = self.next_cell()
+        if ahead is not None:
+            ttl = 0.0
+            if state.no_entry:
+                ttl = max(ttl, config.NO_ENTRY_BLOCK_TTL)
+            if state.car_height is not None and state.car_height > 300:
+                ttl = max(ttl, config.STOPPED_CAR_BLOCK_TTL)
+            if 0 <= state.distance < config.ULTRASONIC_BLOCK_DISTANCE_CM:
+                ttl = max(ttl, config.ULTRASONIC_BLOCK_TTL)
+            if ttl and ahead != self.goal_position and self.grid_map.mark_blocked(ahead, ttl):
+                changed.append(ahead)
+        if changed:
+            self.replan(changed)
+        ahead = self.next_cell()
+        return ahead is None or not self.grid_map.is_free(ahead)
+
+    def react_to_perception(self, packet: FramePacket) -> Tuple[str, bool]:
+        """Xử lý một frame mới: cập nhật bản đồ, đèn giao thông, biển cấm và tốc độ theo xe phía trước.
+
+        Trả về (lệnh, đã_gửi); lệnh đã gửi (dừng khẩn) không cần gửi lại ở bước điều hướng.
+        """
+        # Tuổi của dữ liệu nhận diện lúc vòng điều khiển dùng tới (từ lúc publish)
+        metrics.observe("perception_age", time.time() - packet.timestamp)
+        detections = packet.detections
+        log.debug("Phát hiện: %s", [det['label'] for det in detections], extra={'frame': packet.seq})
+        # Quyết định theo trạng thái đã lọc qua nhiều frame, không theo nhãn của riêng frame này
+        state = self.perception.update(detections, packet.ultrasonic_distance)
+        ultrasonic_distance = state.distance
+        # Cập nhật bản đồ theo biển cấm / xe dừng / siêu âm và sửa lộ trình nếu có đường vòng
+        blocked_ahead = self.update_occupancy(state)
+
+        command = "B"
+        command_sent = False
+
+        self.traffic_light_state = state.light
+        if state.light == "red":
+            command = "S"
+            command_sent = True
+            # Lệnh dừng chỉ gửi một lần khi vào trạng thái đỏ, không gửi lại mỗi frame
+            if self.last_command != "S":
+                self.control_robot(command, self.current_speed)
+                log.info("Dừng do đèn đỏ", extra={'frame': packet.seq})
+
+        if not command_sent and state.no_entry and blocked_ahead:
+            command = "S"
+            command_sent = True
+            if self.last_command != "S":
+                self.control_robot(command, self.current_speed)
+                log.info("Dừng do biển cấm", extra={'frame': packet.seq})
+
+        if not command_sent:
+            bbox_height = state.car_height
+            car_detected = state.car_ahead and bbox_height is not None
+            if car_detected:
+                log.debug("Phát hiện xe, bbox height: %.0f", bbox_height, extra={'frame': packet.seq})
+
+                if ultrasonic_distance >= 0 and ultrasonic_distance < 10:
+                    if bbox_height > 300:
+                        command = "S"
+                        log.info("Xe quá gần (bbox height: %.0f, siêu âm: %.1f cm), dừng lại", bbox_height, ultrasonic_distance, extra={'frame': packet.seq})
+                    elif bbox_height > 200:
+                        command = "B"
+                        if self.ramp_speed(-20):
+                            log.info("Xe gần (bbox height: %.0f, siêu âm: %.1f cm), giảm tốc xuống %s", bbox_height,
+                                     ultrasonic_distance, self.current_speed, extra={'frame': packet.seq})
+                    else:
+                        command = "B"
+                else:
+                    if bbox_height > 300:
+                        command = "S"
+                        log.info("Xe quá gần (bbox height: %.0f), dừng lại", bbox_height, extra={'frame': packet.seq})
+                    elif bbox_height > 200:
                         command = "B"
-                        print(f"Vật cản gần (siêu âm: {ultrasonic_distance} cm), giảm tốc xuống {self.current_speed}")
-
-                if not command_sent and self.traffic_light_state == "green":
-                    time_to_travel_cell = self.calculate_time_to_travel_cell()
-                    if time.time() - self.last_intersection_time > time_to_travel_cell:
-                        if self.path_index < len(self.path):
-                            self.path_index += 1
-                            self.current_position = self.path[self.path_index - 1]
-                            print(f"Giả định đã đến ô: {self.current_position} (dựa trên dead reckoning)")
-                            self.last_intersection_time = time.time()
-                        if self.current_position == self.goal_position:
-                            print("Đã đến đích!")
-                            command = "S"
-                            control_robot(command, self.current_speed)
-                            self.robot_running = False
-                            self.navigation_complete.set()
-                            break
-                        if self.current_position is None:
-                            print("Lỗi: current_position không được định nghĩa!")
-                            self.robot_running = False
-                            self.navigation_complete.set()
-                            break
-                        next_pos = self.path[self.path_index]
-                        command = self.get_next_direction(self.current_position, next_pos, self.current_direction)
-                        print(f"Đi từ {self.current_position} đến {next_pos}, lệnh: {command}, hướng hiện tại: {self.current_direction}")
-                        dx = next_pos[0] - self.current_position[0]
-                        dy = next_pos[1] - self.current_position[1]
-                        if dx == 1 and dy == 0:
-                            target_direction = "backward"
-                        elif dx == -1 and dy == 0:
-                            target_direction = "up"
-                        elif dx == 0 and dy == 1:
-                            target_direction = "right"
-                        elif dx == 0 and dy == -1:
-                            target_direction = "left"
-                        else:
-                            target_direction = self.current_direction
-                        if command == "B":
-                            control_robot(command, self.current_speed)
-                        elif command in ["R", "L"]:
-                            self.turn_90_degrees(command)
-                            if (self.current_direction == "backward" and target_direction == "up") or \
-                               (self.current_direction == "up" and target_direction == "backward") or \
-                               (self.current_direction == "right" and target_direction == "left") or \
-                               (self.current_direction == "left" and target_direction == "right"):
-                                print("Cần quay 180 độ, thực hiện quay 90 độ lần 2...")
-                                self.turn_90_degrees(command)
-                        if command == "R":
-                            if self.current_direction == "backward":
-                                self.current_direction = "right"
-                            elif self.current_direction == "right":
-                                self.current_direction = "up"
-                            elif self.current_direction == "up":
-                                self.current_direction = "left"
-                            elif self.current_direction == "left":
-                                self.current_direction = "backward"
-                        elif command == "L":
-                            if self.current_direction == "backward":
-                                self.current_direction = "left"
-                            elif self.current_direction == "left":
-                                self.current_direction = "up"
-                            elif self.current_direction == "up":
-                                self.current_direction = "right"
-                            elif self.current_direction == "right":
-                                self.current_direction = "backward"
-
-                if not command_sent:
-                    control_robot(command, self.current_speed)
-                    command_sent = True
-
-                time.sleep(0.5)
-            except Exception as e:
-                print("Lỗi:", e)
-                time.sleep(2)
-                continue
-        cv2.destroyAllWindows()
\ No newline at end of file
+                        if self.ramp_speed(-20):
+                            log.info("Xe gần (bbox_height: %.0f), giảm tốc xuống %s", bbox_height, self.current_speed, extra={'frame': packet.seq})
+                    elif bbox_height < 100:
+                        command = "B"
+                        if self.ramp_speed(20):
+                            log.info("Xe xa (bbox height: %.0f), tăng tốc lên %s", bbox_height, self.current_speed, extra={'frame': packet.seq})
+
+            if not car_detected and ultrasonic_distance >= 0 and ultrasonic_distance < 10:
+                command = "B"
+                if self.ramp_speed(-20):
+                    log.info("Vật cản gần (siêu âm: %.1f cm), giảm tốc xuống %s", ultrasonic_distance, self.current_speed, extra={'frame': packet.seq})
+        return command, command_sent
+
+    def follow_plan(self):
+        """Dead reckoning theo kế hoạch: cập nhật ô hiện tại / hướng xe theo thời gian đã chạy của các đoạn."""
+        segment = self.current_segment()
+        while segment is not None:
+            finished = self.segment_progress >= segment.duration
+            if finished:
+                reached = len(segment.cells)
+            else:
+                reached = int(self.segment_progress / segment.cell_time) if segment.cells else 0
+            while self.cells_done < reached:
+                self.cells_done += 1
+                self.path_index += 1
+                self.current_position = segment.cells[self.cells_done - 1]
+                self.last_intersection_time = time.time()
+                log.debug("Giả định đã đến ô: %s (dựa trên dead reckoning)", self.current_position)
+            if not finished:
+                if segment.cells:
+                    self.next_event_progress = min(segment.duration, (self.cells_done + 1) * segment.cell_time)
+                else:
+                    self.next_event_progress = segment.duration
+                return
+            self.segment_progress -= segment.duration
+            self.current_direction = segment.heading
+            self.segment_index += 1
+            self.cells_done = 0
+            segment = self.current_segment()
+        self.next_event_progress = 0.0
+
+    def pause_motion(self):
+        """Dừng xe và ngừng cộng tiến độ khi dữ liệu cảm biến quá cũ để tin vào dead reckoning."""
+        self.last_tick = None
+        if self.last_command not in (None, "S"):
+            self.control_robot("S", self.current_speed)
+            self.last_command = "S"
+            log.warning("Dữ liệu nhận diện quá cũ, dừng xe tại %s", self.current_position)
+
+    def advance_navigation(self, command: str, command_sent: bool) -> bool:
+        """Một bước thực thi kế hoạch chuyển động. Trả về False khi điều hướng kết thúc.
+
+        Lệnh của đoạn chỉ được gửi khi chuyển sang đoạn mới hoặc khi tốc độ đổi; tiến độ của đoạn chỉ tăng
+        trong các tick xe được phép chạy (không dừng vì đèn đỏ, biển cấm hay xe phía trước). Đoạn đi thẳng
+        được biên dịch theo tốc độ lúc lập kế hoạch nên tiến độ được quy đổi theo tốc độ hiện tại.
+        """
+        if command_sent or command == "S" or self.traffic_light_state != "green":
+            self.last_tick = None
+            if not command_sent and command != self.last_command:
+                self.control_robot(command, self.current_speed)
+            self.last_command = command
+            return True
+
+        now = time.monotonic()
+        segment = self.current_segment()
+        if self.last_tick is not None and segment is not None:
+            elapsed = now - self.last_tick
+            if segment.cells:
+                elapsed *= segment.cell_time / self.calculate_time_to_travel_cell()
+            self.segment_progress += elapsed
+        self.last_tick = now
+        if self.segment_progress >= self.next_event_progress:
+            self.follow_plan()
+            segment = self.current_segment()
+        if self.current_position == self.goal_position:
+            log.info("Đã đến đích!")
+            self.control_robot("S", self.current_speed)
+            self.last_command = "S"
+            self.robot_running = False
+            self.navigation_complete.set()
+            self.publish_route("arrived")
+            return False
+        if segment is None:
+            log.error("Hết kế hoạch chuyển động tại %s nhưng chưa tới đích %s", self.current_position,
+                      self.goal_position)
+            self.robot_running = False
+            self.navigation_complete.set()
+            self.publish_route("failed")
+            return False
+        if segment.command != self.last_command or self.current_speed != self.last_speed:
+            log.info("Đoạn %d/%d: lệnh %s, %d ô, %.2f s, hướng sau đoạn: %s", self.segment_index + 1,
+                     len(self.plan), segment.command, len(segment.cells), segment.duration, segment.heading)
+            self.control_robot(segment.command, self.current_speed)
+            self.last_speed = self.current_speed
+        self.last_command = segment.command
+        return True
+
+    def run(self):
+        """Vòng điều khiển: thức dậy khi frame bus có dữ liệu mới hoặc tới tick cố định, tuỳ cái nào đến trước.
+
+        Thoát khi tới đích hoặc khi stop_navigation() được gọi, để /start-navigation có thể join thread cũ.
+        """
+        scheduler = ControlScheduler(self.frame_bus, self.stop_event)
+        self.scheduler = scheduler
+        perception = ("B", False)
+        last_perception_time: Optional[float] = None
+        while self.robot_running and not self.stop_event.is_set():
+            # Dùng chung kết quả nhận diện với WebSocket thay vì tự lấy frame và chạy YOLO lần nữa
+            packet = scheduler.wait(self.last_frame_seq)
+            if self.stop_event.is_set() or not self.robot_running:
+                break
+            with scheduler.iteration():
+                try:
+                    if packet is not None:
+                        self.last_frame_seq = packet.seq
+                        perception = self.react_to_perception(packet)
+                        last_perception_time = time.monotonic()
+                    elif last_perception_time is None or \
+                            time.monotonic() - last_perception_time > config.CONTROL_STALE_TIMEOUT:
+                        # Dữ liệu nhận diện quá cũ: không đi tiếp dựa trên nó
+                        self.pause_motion()
+                        continue
+                    running = self.advance_navigation(*perception)
+                    if packet is not None:
+                        # Từ lúc bắt đầu lấy frame tới khi quyết định điều khiển cho frame đó được đưa ra
+                        metrics.observe("decision_latency", time.time() - packet.captured_at)
+                    if not running:
+                        break
+                except Exception as e:
+                    log.exception("Lỗi trong vòng điều khiển: %s", e)
+                    self.stop_event.wait(2)
+        log.info("Vòng điều khiển kết thúc: %s", scheduler.stats())
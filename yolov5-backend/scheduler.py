@@ -0,0 +1,74 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from . import config
+from .frame_bus import FrameBus, FramePacket
+from .metrics import metrics
+from .log import get_logger
+
+log = get_logger(__name__)
+
+
+class ControlScheduler:
+    """Nhịp cho vòng điều khiển: thức dậy khi frame bus có dữ liệu nhận diện mới hoặc tới tick cố định,
+    tuỳ cái nào đến trước, và theo dõi deadline của từng vòng.
+
+    Mỗi vòng có deadline bằng một chu kỳ; vòng chạy quá deadline được tính là overrun.
+    """
+
+    def __init__(self, frame_bus: FrameBus, stop_event: threading.Event, period: float = config.CONTROL_PERIOD):
+        self.frame_bus = frame_bus
+        self.stop_event = stop_event
+        self.period = period
+        self._next_tick = time.monotonic() + period
+        self.frame_wakeups = 0
+        self.tick_wakeups = 0
+        self.iterations = 0
+        self.overruns = 0
+        self.max_iteration_time = 0.0
+        self.last_iteration_time = 0.0
+
+    def wait(self, last_seq: int) -> Optional[FramePacket]:
+        """Chờ tới frame mới (trả về packet) hoặc tới tick (trả về None). Thoát ngay khi stop_event được set."""
+        timeout = max(0.0, self._next_tick - time.monotonic())
+        packet = self.frame_bus.wait_for_next(last_seq, timeout=timeout, cancel=self.stop_event)
+        now = time.monotonic()
+        if packet is not None:
+            self.frame_wakeups += 1
+        elif not self.stop_event.is_set():
+            self.tick_wakeups += 1
+        if now >= self._next_tick:
+            # Bỏ các tick đã lỡ thay vì chạy dồn
+            missed = int((now - self._next_tick) // self.period)
+            self._next_tick += (missed + 1) * self.period
+        return packet
+
+    @contextmanager
+    def iteration(self):
+        """Bao một vòng điều khiển để đo thời gian và đếm overrun."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.iterations += 1
+            self.last_iteration_time = elapsed
+            self.max_iteration_time = max(self.max_iteration_time, elapsed)
+            metrics.observe("control_iteration", elapsed)
+            if elapsed > self.period:
+                self.overruns += 1
+                metrics.count("control_overruns")
+                log.warning("Control loop overrun: %.0f ms > deadline %.0f ms", elapsed * 1000, self.period * 1000,
+                            extra={'stage': 'control_iteration', 'latency_ms': round(elapsed * 1000, 1)})
+
+    def stats(self) -> Dict:
+        return {
+            'period_s': self.period,
+            'iterations': self.iterations,
+            'frame_wakeups': self.frame_wakeups,
+            'tick_wakeups': self.tick_wakeups,
+            'overruns': self.overruns,
+            'last_iteration_ms': self.last_iteration_time * 1000,
+            'max_iteration_ms': self.max_iteration_time * 1000
+        }
@@ -1,62 +1,247 @@
 import base64
+import json
+import struct
 import cv2
 import time
 import asyncio
+import numpy as np
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple, Union
 from fastapi import WebSocket
-from .esp32_interface import get_image_from_esp32, get_ultrasonic_distance
-from .yolo_detection import YOLODetector
+from . import config
+from .frame_bus import FrameBus, FramePacket
+from .image_codec import JpegCodec
+from .metrics import metrics
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# Header của message binary: số thứ tự frame (uint32 big-endian), theo sau là các byte JPEG
+BINARY_HEADER = struct.Struct(">I")
+
+
+@dataclass
+class StreamOptions:
+    """Tuỳ chọn stream của từng client, lấy từ query string của /ws hoặc message JSON gửi lên sau đó."""
+    protocol: str = "json"  # "json" (base64 trong JSON, client cũ) hoặc "binary"
+    quality: int = config.WS_JPEG_QUALITY
+    scale: float = 1.0
+
+    def update(self, params: Mapping[str, str]):
+        if "protocol" in params:
+            if params["protocol"] not in ("json", "binary"):
+                raise ValueError(f"Unknown protocol: {params['protocol']}")
+            self.protocol = params["protocol"]
+        if "quality" in params:
+            self.quality = min(100, max(1, int(params["quality"])))
+        if "scale" in params:
+            self.scale = min(1.0, max(0.1, float(params["scale"])))
+
+    @property
+    def encoding(self) -> Tuple[int, float]:
+        return self.quality, self.scale
+
+
+def encode_jpeg(frame: np.ndarray, quality: int, scale: float) -> bytes:
+    if scale < 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+# Một payload là danh sách message gửi liên tiếp: str gửi dạng text, bytes gửi dạng binary
+Payload = List[Union[str, bytes]]
+
+
+def build_payload(packet: FramePacket, options: StreamOptions, jpeg: bytes) -> Payload:
+    # Tỉ lệ ảnh gửi đi / toạ độ detections (theo ảnh gốc của camera)
+    scale = options.scale * packet.image_scale
+    if options.protocol == "binary":
+        # Metadata gửi trước dạng text, ảnh gửi sau dạng binary; hai message khớp nhau bằng seq
+        meta = json.dumps({
+            'type': 'frame',
+            'seq': packet.seq,
+            'timestamp': packet.timestamp,
+            'scale': scale,
+            'detections': packet.detections,
+            'ultrasonic_distance': packet.ultrasonic_distance
+        })
+        return [meta, BINARY_HEADER.pack(packet.seq & 0xFFFFFFFF) + jpeg]
+    message = {
+        'image': base64.b64encode(jpeg).decode('utf-8'),
+        'detections': packet.detections,
+        'ultrasonic_distance': packet.ultrasonic_distance
+    }
+    if scale != 1.0:
+        message['scale'] = scale
+    return [json.dumps(message)]
+
+
+class ClientSession:
+    """Một client WebSocket với hàng đợi gửi riêng (giới hạn) và task gửi riêng.
+
+    Khi client chậm, frame cũ nhất trong hàng đợi bị bỏ để client luôn nhận frame mới nhất,
+    và các client khác không phải chờ.
+    """
+
+    def __init__(self, websocket: WebSocket, options: StreamOptions,
+                 queue_size: int = config.WS_CLIENT_QUEUE_SIZE, latency_window: int = 256):
+        self.websocket = websocket
+        self.options = options
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sent = 0
+        self.dropped = 0
+        self.send_latencies = deque(maxlen=latency_window)
+        self.closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, on_error):
+        self._task = asyncio.create_task(self._sender(on_error))
+
+    def offer(self, payload: Payload, captured_at: Optional[float] = None):
+        """Đưa payload vào hàng đợi không chặn; nếu đầy thì bỏ payload cũ nhất."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            metrics.count("ws_frames_dropped")
+        self.queue.put_nowait((time.perf_counter(), captured_at, payload))
+
+    async def _sender(self, on_error):
+        try:
+            while True:
+                queued_at, captured_at, payload = await self.queue.get()
+                for message in payload:
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                self.sent += 1
+                latency = time.perf_counter() - queued_at
+                self.send_latencies.append(latency)
+                metrics.observe("ws_send", latency)
+                if captured_at:
+                    # Từ lúc lấy frame ở ESP32 tới khi client nhận xong
+                    metrics.observe("ws_end_to_end", time.time() - captured_at)
+                metrics.mark("ws_frames_sent")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("Error sending to client: %s", e, extra={'client': self.websocket.client})
+            on_error(self.websocket)
+
+    def close(self):
+        self.closed = True
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def stats(self) -> Dict:
+        latencies = sorted(self.send_latencies)
+        return {
+            'client': str(self.websocket.client),
+            'protocol': self.options.protocol,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'send_latency_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+            'send_latency_p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None
+        }
+
 
 class WebSocketHandler:
-    def __init__(self, yolo_detector: YOLODetector, navigation_complete: asyncio.Event, robot_controller):  # Thêm robot_controller
-        self.yolo_detector = yolo_detector
+    def __init__(self, frame_bus: FrameBus, navigation_complete: asyncio.Event, robot_controller):  # Thêm robot_controller
+        self.frame_bus = frame_bus
         self.navigation_complete = navigation_complete
-        self.active_connections: list[WebSocket] = []
+        self.sessions: Dict[WebSocket, ClientSession] = {}
         self.robot_controller = robot_controller  # Lưu tham chiếu đến RobotController
+        # build_payloads chỉ chạy trong một thread tại một thời điểm (broadcast được await tuần tự)
+        self.codec = JpegCodec()
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.sessions)
 
     async def connect(self, websocket: WebSocket):
+        options = StreamOptions()
+        try:
+            options.update(websocket.query_params)
+        except ValueError as e:
+            await websocket.close(code=1003, reason=str(e))
+            raise
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"WebSocket connected: {websocket.client}")
+        session = ClientSession(websocket, options)
+        self.sessions[websocket] = session
+        session.start(self.disconnect)
+        log.info("WebSocket connected (%s)", options, extra={'client': websocket.client})
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print(f"WebSocket disconnected: {websocket.client}")
+        session = self.sessions.pop(websocket, None)
+        if session is None:
+            return
+        session.close()
+        log.info("WebSocket disconnected", extra={'client': websocket.client})
+
+    def handle_message(self, websocket: WebSocket, message: str):
+        """Client có thể đổi protocol/quality/scale bằng message JSON, ví dụ {"quality": 60, "scale": 0.5}."""
+        try:
+            params = json.loads(message)
+            if isinstance(params, dict) and websocket in self.sessions:
+                self.sessions[websocket].options.update(params)
+        except (ValueError, TypeError, KeyError) as e:
+            log.warning("Ignoring invalid WebSocket options: %s", e, extra={'client': websocket.client})
+
+    def client_stats(self) -> List[Dict]:
+        return [session.stats() for session in self.sessions.values()]
+
+    def encode(self, packet: FramePacket, quality: int, scale: float) -> bytes:
+        """JPEG cho một (quality, scale). Frame không có box nào được vẽ thì gửi lại nguyên JPEG từ ESP32 cho client
+        dùng chất lượng mặc định (client xin chất lượng khác thì vẫn được encode riêng)."""
+        if (packet.jpeg is not None and not packet.detections and scale == 1.0
+                and quality == config.WS_JPEG_QUALITY):
+            metrics.count("imencode_skipped")
+            return packet.jpeg
+        with metrics.timed("imencode"):
+            return self.codec.encode(packet.frame, quality, scale)
+
+    def build_payloads(self, packet: FramePacket, sessions: List[ClientSession]) -> Dict[Tuple, Payload]:
+        """Encode JPEG một lần cho mỗi (quality, scale) và serialize một lần cho mỗi tổ hợp protocol."""
+        jpegs: Dict[Tuple[int, float], bytes] = {}
+        payloads: Dict[Tuple, Payload] = {}
+        for session in sessions:
+            options = session.options
+            key = (options.protocol,) + options.encoding
+            if key in payloads:
+                continue
+            if options.encoding not in jpegs:
+                jpegs[options.encoding] = self.encode(packet, *options.encoding)
+            with metrics.timed("ws_serialize"):
+                payloads[key] = build_payload(packet, options, jpegs[options.encoding])
+        return payloads
+
+    async def broadcast(self, packet: FramePacket):
+        sessions = [session for session in self.sessions.values() if not session.closed]
+        if not sessions:
+            return
+        # Encode ngoài event loop để không chặn các kết nối khác
+        payloads = await asyncio.to_thread(self.build_payloads, packet, sessions)
+        for session in sessions:
+            options = session.options
+            payload = payloads.get((options.protocol,) + options.encoding)
+            if payload is not None:
+                session.offer(payload, packet.captured_at)
 
 # Trong websocket_handler.py
     async def stream_video(self):
+        last_seq = 0
         while True:
             if not self.robot_controller.robot_running:
                 await asyncio.sleep(0.1)
                 continue
 
             try:
-                frame = get_image_from_esp32()
-                if frame is None:
-                    print("No frame from ESP32-CAM, skipping...")
-                    await asyncio.sleep(1)
-                    continue
-
-                ultrasonic_distance = get_ultrasonic_distance()
-                frame, detections = self.yolo_detector.detect(frame)
-
-                _, buffer = cv2.imencode('.jpg', frame)
-                img_str = base64.b64encode(buffer).decode('utf-8')
-                #print("Base64 length:", len(img_str), "Sample:", img_str[:50])
-
-                data = {
-                    'image': img_str,
-                    'detections': detections,
-                    'ultrasonic_distance': ultrasonic_distance
-                }
-
-                for connection in self.active_connections:
-                    try:
-                        await connection.send_json(data)
-                        print(f"Sent data to {connection.client}")
-                    except Exception as e:
-                        print(f"Error sending to {connection.client}: {e}")
-                        self.active_connections.remove(connection)
-                await asyncio.sleep(0.1)
+                # Chỉ subscribe frame bus: việc lấy ảnh và chạy YOLO đã được producer làm một lần
+                packet = await self.frame_bus.next_frame(last_seq)
+                last_seq = packet.seq
+                await self.broadcast(packet)
             except Exception as e:
-                print(f"Error in stream_video: {e}")
-                await asyncio.sleep(1)
\ No newline at end of file
+                log.exception("Error in stream_video: %s", e)
+                await asyncio.sleep(1)
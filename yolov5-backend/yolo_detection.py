@@ -1,28 +1,209 @@
-import torch
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 import numpy as np
 import cv2
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional, Sequence, Union
+from . import config
+from .inference_backends import load_backend
+from .metrics import metrics
+from .log import get_logger
+
+log = get_logger(__name__)
+
+
+class Detections:
+    """Kết quả nhận diện của một frame dạng mảng: mỗi hàng là [x1, y1, x2, y2, confidence, class_id]."""
+    __slots__ = ("data", "names")
+
+    def __init__(self, data: np.ndarray, names: Sequence[str]):
+        self.data = data
+        self.names = names
+
+    @classmethod
+    def empty(cls, names: Sequence[str]) -> "Detections":
+        return cls(np.zeros((0, 6), dtype=np.float32), names)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def boxes(self) -> np.ndarray:
+        return self.data[:, :4]
+
+    @property
+    def confidences(self) -> np.ndarray:
+        return self.data[:, 4]
+
+    @property
+    def class_ids(self) -> np.ndarray:
+        return self.data[:, 5].astype(np.int32)
+
+    @property
+    def labels(self) -> List[str]:
+        return [self.names[i] for i in self.class_ids]
+
+    def filter(self, conf_threshold: float = 0.0, class_ids: Optional[np.ndarray] = None) -> "Detections":
+        mask = self.data[:, 4] >= conf_threshold
+        if class_ids is not None:
+            mask &= np.isin(self.data[:, 5].astype(np.int32), class_ids)
+        return Detections(self.data[mask], self.names)
+
+    def to_dicts(self) -> List[Dict]:
+        """Chuyển sang dạng list dict như trước đây để gửi JSON và dùng trong RobotController."""
+        return [
+            {'label': self.names[int(cls)], 'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'confidence': conf}
+            for x1, y1, x2, y2, conf, cls in self.data.tolist()
+        ]
+
+
+def draw_detections(frame: np.ndarray, detections: Union[Detections, List[Dict]]) -> np.ndarray:
+    """Vẽ box + nhãn lên frame (tại chỗ); nhận Detections hoặc list dict như Detections.to_dicts()."""
+    if isinstance(detections, Detections):
+        boxes, labels = detections.boxes.astype(np.int32).tolist(), detections.labels
+    else:
+        boxes = [[int(det[k]) for k in ('x1', 'y1', 'x2', 'y2')] for det in detections]
+        labels = [det['label'] for det in detections]
+    for (x1, y1, x2, y2), label in zip(boxes, labels):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+    return frame
+
 
 class YOLODetector:
-    def __init__(self, model_path: str = "/home/thanhkhaii/pbl5/yolov5/best.pt"):  # Sử dụng đường dẫn tuyệt đối
-        """Khởi tạo YOLOv5 model."""
-        self.model = torch.hub.load('ultralytics/yolov5', 'custom', path=model_path, force_reload=True)
-        print("YOLOv5 model loaded successfully")
+    def __init__(self, model_path: str = config.YOLO_MODEL_PATH,
+                 conf_threshold: float = config.YOLO_CONF_THRESHOLD,
+                 classes: Optional[List[str]] = None,
+                 backend: str = config.YOLO_BACKEND,
+                 img_size: int = config.YOLO_IMG_SIZE,
+                 threads: int = config.YOLO_THREADS):
+        """Khởi tạo backend inference (torch / ONNX Runtime) và warm-up trước khi nhận frame đầu tiên."""
+        self.backend, self.load_time, self.first_inference_time = load_backend(backend, model_path, img_size, threads)
+        self.names = self.backend.names
+        self.conf_threshold = conf_threshold
+        self.backend.set_thresholds(conf_threshold, config.YOLO_IOU_THRESHOLD)
+        self.class_ids: Optional[np.ndarray] = None
+        self.set_classes(classes if classes is not None else config.YOLO_CLASSES)
+        log.info("YOLOv5 model loaded successfully")
+
+    def set_classes(self, classes: Optional[List[str]]):
+        """Chỉ giữ các lớp có tên trong classes; None hoặc rỗng = giữ tất cả."""
+        if not classes:
+            self.class_ids = None
+            return
+        self.class_ids = np.array([self.names.index(name) for name in classes], dtype=np.int32)
+
+    def infer_batch(self, frames: List[np.ndarray]) -> List[Detections]:
+        """Chạy một lượt forward cho nhiều frame và đọc thẳng mảng kết quả, không qua pandas."""
+        return [
+            Detections(pred, self.names).filter(self.conf_threshold, self.class_ids)
+            for pred in self.backend.infer_batch(frames)
+        ]
+
+    def infer(self, frame: np.ndarray) -> Detections:
+        return self.infer_batch([frame])[0]
+
+    def draw(self, frame: np.ndarray, detections: Detections) -> np.ndarray:
+        return draw_detections(frame, detections)
 
     def detect(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
         """Phát hiện đối tượng trong frame và trả về frame đã vẽ và detections."""
-        results = self.model(frame)
-        detections = results.pandas().xyxy[0]
-        labels = detections['name'].tolist()
-        print("Phát hiện:", labels)
-
-        for _, det in detections.iterrows():
-            x1, y1, x2, y2 = int(det['xmin']), int(det['ymin']), int(det['xmax']), int(det['ymax'])
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(frame, det['name'], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-
-        detection_data = [
-            {'label': row['name'], 'x1': row['xmin'], 'y1': row['ymin'], 'x2': row['xmax'], 'y2': row['ymax']}
-            for _, row in detections.iterrows()
-        ]
-        return frame, detection_data
\ No newline at end of file
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[Tuple[np.ndarray, List[Dict]]]:
+        """Giống detect nhưng gộp nhiều frame vào một lượt inference."""
+        outputs = []
+        with metrics.timed("detect"):
+            results = self.infer_batch(frames)
+        for frame, detections in zip(frames, results):
+            log.debug("Phát hiện: %s", detections.labels, extra={'stage': 'detect'})
+            with metrics.timed("draw"):
+                frame = self.draw(frame, detections)
+            outputs.append((frame, detections.to_dicts()))
+        return outputs
+
+
+class BatchingDetector:
+    """Gộp frame từ nhiều frame bus (mỗi xe một bus) vào một lượt detect_batch của detector dùng chung.
+
+    Thread gọi detect() chờ tới khi batch chứa frame của nó chạy xong. Worker lấy frame đầu tiên rồi chờ thêm
+    tối đa max_wait giây để gom đủ batch; biết số producer (số xe) thì không chờ quá số đó.
+    """
+
+    def __init__(self, detector: YOLODetector, max_batch: int = config.FLEET_MAX_BATCH,
+                 max_wait: float = config.FLEET_BATCH_WAIT):
+        self.detector = detector
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        # Số frame bus đang gửi frame vào; 0 = không biết, luôn chờ đủ max_wait
+        self.producers = 0
+        self._pending: "deque[Tuple[np.ndarray, Future]]" = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.frames = 0
+        threading.Thread(target=self._worker, name="batching-detector", daemon=True).start()
+
+    @property
+    def names(self):
+        return getattr(self.detector, 'names', None)
+
+    def detect(self, frame: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((frame, future))
+            self._cond.notify()
+        return future.result()
+
+    def _batch_target(self) -> int:
+        return min(self.max_batch, self.producers) if self.producers > 0 else self.max_batch
+
+    def _next_batch(self) -> List[Tuple[np.ndarray, Future]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self._batch_target() and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            frames = [frame for frame, _ in batch]
+            try:
+                if hasattr(self.detector, 'detect_batch'):
+                    outputs = self.detector.detect_batch(frames)
+                else:
+                    outputs = [self.detector.detect(frame) for frame in frames]
+            except Exception as e:
+                log.error("Lỗi inference batch %d frame: %s", len(batch), e)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            metrics.count("detect_batches")
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def close(self):
+        """Dừng worker sau khi chạy nốt các frame đang chờ."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': self.frames / self.batches if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000
+        }